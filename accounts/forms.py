@@ -4,6 +4,9 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 import re
 
+from .throttling import get_client_ip, is_locked, record_failure, reset_failures
+from .usernames import USERNAME_TAKEN_MESSAGE, is_known_taken
+
 
 class SignupForm(forms.ModelForm):
     """ユーザー新規登録フォーム"""
@@ -47,13 +50,15 @@ class SignupForm(forms.ModelForm):
         if not re.match(r'^[a-zA-Z0-9]+$', username):
             raise ValidationError('ユーザー名は半角英数字のみ有効です。')
         
-        if User.objects.filter(username=username).exists():
-            raise ValidationError(
-                'このユーザー名は既に使用されています。別のユーザー名を選択してください。'
-            )
+        # 重複はデータベースの一意インデックスで検出する（使用済みと分かっている場合のみここで拒否）
+        if is_known_taken(username):
+            raise ValidationError(USERNAME_TAKEN_MESSAGE)
         
         return username
 
+    def validate_unique(self):
+        """ユーザー名の重複確認のクエリを省略する（保存時に IntegrityError で検出する）"""
+
     def clean_password(self):
         """パスワードのバリデーション"""
         password = self.cleaned_data.get('password')
@@ -95,6 +100,11 @@ class LoginForm(forms.Form):
         })
     )
 
+    def __init__(self, *args, request=None, **kwargs):
+        self.request = request
+        self.user_cache = None
+        super().__init__(*args, **kwargs)
+
     def clean(self):
         """ログイン認証のバリデーション"""
         cleaned_data = super().clean()
@@ -102,12 +112,25 @@ class LoginForm(forms.Form):
         password = cleaned_data.get('password')
 
         if username and password:
-            user = authenticate(username=username, password=password)
-            if user is None:
+            ip = get_client_ip(self.request)
+            # 失敗回数が上限に達している場合はハッシュ計算を行わない
+            if is_locked(ip, username):
+                raise forms.ValidationError(
+                    'ログインの試行回数が上限に達しました。しばらくしてから再度お試しください。'
+                )
+
+            self.user_cache = authenticate(self.request, username=username, password=password)
+            if self.user_cache is None:
+                record_failure(ip, username)
                 raise forms.ValidationError('ユーザー名かパスワードが間違っています。')
+            reset_failures(ip, username)
 
         return cleaned_data
 
+    def get_user(self):
+        """認証済みのユーザーを返す（clean で認証した結果を再利用する）"""
+        return self.user_cache
+
 
 class RenameForm(forms.Form):
     """ユーザー名変更フォーム"""
@@ -129,9 +152,8 @@ class RenameForm(forms.Form):
         if not re.match(r'^[a-zA-Z0-9]+$', username):
             raise ValidationError('ユーザー名は半角英数字のみ有効です。')
 
-        if User.objects.filter(username=username).exists():
-            raise ValidationError(
-                'このユーザー名は既に使用されています。別のユーザー名を選択してください。'
-            )
+        # 重複はデータベースの一意インデックスで検出する（使用済みと分かっている場合のみここで拒否）
+        if is_known_taken(username):
+            raise ValidationError(USERNAME_TAKEN_MESSAGE)
 
         return username
@@ -0,0 +1,60 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import base_user
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from accounts.throttling import get_failure_keys
+from accounts.views import LoginView
+
+USERNAME = 'benchmarkuser'
+PASSWORD = 'benchmark123'
+IP = '192.0.2.1'
+
+
+class Command(BaseCommand):
+    help = 'Measure login throughput and password hashes per login (test user is rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Number of login requests per scenario')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        keys = list(get_failure_keys(IP, USERNAME).values())
+        cache.delete_many(keys)
+
+        with transaction.atomic():
+            User.objects.create_user(username=USERNAME, password=PASSWORD)
+
+            self.stdout.write(f'{"scenario":<16} {"req/s":>8} {"ms/req":>8} {"hashes/req":>11}')
+            # 計測中は試行回数の制限を受けないようにする
+            with override_settings(LOGIN_FAILURE_LIMIT=count * 2 + 1, LOGIN_IP_FAILURE_LIMIT=count * 2 + 1):
+                self.measure('success', PASSWORD, count)
+                self.measure('wrong password', 'wrong123', count)
+            # 失敗回数が上限に達した後はハッシュ計算を行わない
+            self.measure('locked out', 'wrong123', count)
+
+            transaction.set_rollback(True)
+        cache.delete_many(keys)
+
+    def measure(self, label, password, count):
+        view = LoginView.as_view()
+        factory = RequestFactory()
+        with mock.patch.object(base_user, 'check_password', wraps=base_user.check_password) as check:
+            started = time.perf_counter()
+            for _ in range(count):
+                request = factory.post(
+                    '/accounts/login/', {'username': USERNAME, 'password': password}, REMOTE_ADDR=IP
+                )
+                SessionMiddleware(lambda r: None).process_request(request)
+                view(request)
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label:<16} {count / elapsed:>8.1f} {elapsed / count * 1000:>8.1f} '
+            f'{check.call_count / count:>11.1f}'
+        )
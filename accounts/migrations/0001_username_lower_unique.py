@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    ユーザー名の大文字小文字を区別しない一意インデックス
+
+    auth.User は他アプリのモデルのため、インデックスはSQLで作成する。
+    既に大文字小文字違いの重複がある場合は、先に解消してから適用すること。
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE UNIQUE INDEX accounts_user_username_lower_uniq ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX accounts_user_username_lower_uniq;',
+        ),
+    ]
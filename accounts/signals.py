@@ -0,0 +1,12 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .usernames import forget
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_username(sender, instance, **kwargs):
+    """削除されたユーザーのユーザー名を再び使用できるようにする"""
+    transaction.on_commit(lambda: forget(instance.username))
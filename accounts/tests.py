@@ -1,3 +1,131 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import base_user
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .usernames import is_known_taken
+
+
+@override_settings(LOGIN_FAILURE_LIMIT=3, LOGIN_IP_FAILURE_LIMIT=5)
+class LoginViewTests(TestCase):
+    """ログインビューのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password123')
+
+    def login(self, password, ip='192.0.2.1', username='testuser1'):
+        return self.client.post(
+            reverse('accounts:login'),
+            {'username': username, 'password': password},
+            REMOTE_ADDR=ip,
+        )
+
+    def test_login_hashes_password_once(self):
+        with mock.patch.object(base_user, 'check_password', wraps=base_user.check_password) as check:
+            response = self.login('password123')
+
+        self.assertRedirects(response, reverse('accounts:login_complete'), fetch_redirect_response=False)
+        self.assertEqual(check.call_count, 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+
+    def test_repeated_failures_lock_out_before_hashing(self):
+        for _ in range(3):
+            self.assertContains(self.login('wrong123'), 'ユーザー名かパスワードが間違っています。')
+
+        # 正しいパスワードでもハッシュ計算を行わずに拒否する
+        with mock.patch.object(base_user, 'check_password', wraps=base_user.check_password) as check:
+            response = self.login('password123', ip='192.0.2.2')
+        self.assertContains(response, '試行回数が上限に達しました')
+        self.assertEqual(check.call_count, 0)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_failures_are_counted_per_ip(self):
+        # 同じIPアドレスから複数のユーザー名を試した場合も制限する
+        for i in range(5):
+            self.login('wrong123', username=f'unknown{i}')
+        self.assertContains(self.login('password123'), '試行回数が上限に達しました')
+        # 別のIPアドレスからはログインできる
+        response = self.login('password123', ip='192.0.2.2')
+        self.assertRedirects(response, reverse('accounts:login_complete'), fetch_redirect_response=False)
+
+    def test_success_resets_username_failures(self):
+        self.login('wrong123')
+        self.login('wrong123')
+        self.login('password123')
+        self.client.logout()
+        self.login('wrong123')
+        self.login('wrong123')
+        response = self.login('password123')
+        self.assertRedirects(response, reverse('accounts:login_complete'), fetch_redirect_response=False)
+
+
+class UsernameTests(TestCase):
+    """ユーザー名の重複確認のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='existinguser', password='password123')
+
+    def signup(self, username):
+        return self.client.post(reverse('accounts:signup'), {
+            'username': username,
+            'password': 'password123',
+            'confirm_password': 'password123',
+        })
+
+    def test_signup_detects_duplicate_on_insert(self):
+        # 大文字小文字が異なるだけのユーザー名も重複として扱う
+        response = self.signup('ExistingUser')
+        self.assertContains(response, 'このユーザー名は既に使用されています。')
+        self.assertEqual(User.objects.count(), 1)
+        self.assertTrue(is_known_taken('existinguser'))
+
+        # 使用済みと分かったユーザー名は保存を試みずに拒否する
+        with self.assertNumQueries(0):
+            response = self.signup('existingUSER')
+        self.assertContains(response, 'このユーザー名は既に使用されています。')
+
+    def test_signup_does_not_query_for_duplicates(self):
+        # 重複確認のSELECTを行わずにINSERTする
+        with CaptureQueriesContext(connection) as queries:
+            response = self.signup('newuser1')
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('SELECT') and '"auth_user"' in q['sql']])
+        self.assertRedirects(response, reverse('accounts:signup_complete'), fetch_redirect_response=False)
+        self.assertTrue(User.objects.filter(username='newuser1').exists())
+
+    def test_rename_conflict_keeps_current_username(self):
+        user = User.objects.create_user(username='renameuser', password='password123')
+        self.client.force_login(user)
+        response = self.client.post(reverse('accounts:account'), {'username': 'EXISTINGUSER'})
+        self.assertContains(response, 'このユーザー名は既に使用されています。')
+        user.refresh_from_db()
+        self.assertEqual(user.username, 'renameuser')
+
+        response = self.client.post(reverse('accounts:account'), {'username': 'renamed01'})
+        self.assertRedirects(response, reverse('accounts:rename_complete'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertEqual(user.username, 'renamed01')
+
+    def test_availability_endpoint(self):
+        url = reverse('accounts:username_availability')
+        self.assertTrue(self.client.get(url, {'username': 'freeuser'}).json()['available'])
+        self.assertFalse(self.client.get(url, {'username': 'EXISTINGuser'}).json()['available'])
+        # 使用済みの結果はキャッシュから返す
+        with self.assertNumQueries(0):
+            self.assertFalse(self.client.get(url, {'username': 'existinguser'}).json()['available'])
+        data = self.client.get(url, {'username': 'ab'}).json()
+        self.assertFalse(data['available'])
+        self.assertIn('6', data['message'])
+
+    def test_deleted_username_becomes_available(self):
+        url = reverse('accounts:username_availability')
+        self.assertFalse(self.client.get(url, {'username': 'existinguser'}).json()['available'])
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(username='existinguser').delete()
+        self.assertTrue(self.client.get(url, {'username': 'existinguser'}).json()['available'])
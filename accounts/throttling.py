@@ -0,0 +1,61 @@
+"""
+ログイン試行回数の管理
+
+失敗回数をIPアドレスごと・ユーザー名ごとにキャッシュへ記録し、
+上限に達した場合はパスワードのハッシュ計算を行う前にログインを拒否する。
+複数ワーカー間で共有するには、共有キャッシュ（DJANGO_CACHE_LOCATION の Redis 等）を設定する。
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+
+
+def get_client_ip(request: HttpRequest | None) -> str:
+    """リクエスト元のIPアドレスを返す"""
+    if request is None:
+        return ''
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_failure_keys(ip: str, username: str) -> dict[str, str]:
+    """失敗回数を記録するキャッシュキーを返す"""
+    # ユーザー名は大文字小文字を区別せず、キーに使えるようハッシュ化する
+    digest = hashlib.md5(username.lower().encode()).hexdigest()
+    keys = {'username': f'accounts:login-failures:username:{digest}'}
+    if ip:
+        keys['ip'] = f'accounts:login-failures:ip:{ip}'
+    return keys
+
+
+def _limits() -> dict[str, int]:
+    return {
+        'username': settings.LOGIN_FAILURE_LIMIT,
+        'ip': settings.LOGIN_IP_FAILURE_LIMIT,
+    }
+
+
+def is_locked(ip: str, username: str) -> bool:
+    """失敗回数が上限に達しているかどうか"""
+    keys = get_failure_keys(ip, username)
+    counts = cache.get_many(keys.values())
+    limits = _limits()
+    return any(counts.get(key, 0) >= limits[kind] for kind, key in keys.items())
+
+
+def record_failure(ip: str, username: str) -> None:
+    """ログインの失敗を記録する（最初の失敗から LOGIN_LOCKOUT_SECONDS で解除）"""
+    for key in get_failure_keys(ip, username).values():
+        if not cache.add(key, 1, settings.LOGIN_LOCKOUT_SECONDS):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # 期限切れと競合した場合は数え直す
+                cache.set(key, 1, settings.LOGIN_LOCKOUT_SECONDS)
+
+
+def reset_failures(ip: str, username: str) -> None:
+    """ログイン成功時にユーザー名の失敗回数を消去する"""
+    # IPアドレスの失敗回数は、同じIPから別ユーザーを総当たりされないよう残す
+    cache.delete(get_failure_keys(ip, username)['username'])
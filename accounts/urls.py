@@ -15,6 +15,7 @@ urlpatterns = [
     # 新規登録
     path('signup/', views.SignupView.as_view(), name='signup'),
     path('signup/complete/', views.SignupCompleteView.as_view(), name='signup_complete'),
+    path('signup/username/', views.UsernameAvailabilityView.as_view(), name='username_availability'),
     
     # アカウント設定
     path('settings/', views.AccountEditView.as_view(), name='account'),
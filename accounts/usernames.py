@@ -0,0 +1,68 @@
+"""
+ユーザー名の重複確認
+
+ユーザー名の一意性はデータベースの大文字小文字を区別しない一意インデックスで保証し、
+保存時の IntegrityError で重複を検出する。使用済みと分かったユーザー名は
+キャッシュに記録し、フォームの検証や空き状況APIではクエリを実行せずに判定する。
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+USERNAME_TAKEN_MESSAGE = 'このユーザー名は既に使用されています。別のユーザー名を選択してください。'
+
+
+class UsernameTaken(Exception):
+    """ユーザー名が既に使用されている"""
+
+
+def _key(username: str) -> str:
+    return f'accounts:username-taken:{username.lower()}'
+
+
+def is_known_taken(username: str) -> bool:
+    """使用済みとしてキャッシュされているかどうか（クエリを実行しない）"""
+    return cache.get(_key(username), False)
+
+
+def mark_taken(username: str) -> None:
+    """ユーザー名を使用済みとしてキャッシュする"""
+    cache.set(_key(username), True, settings.USERNAME_TAKEN_CACHE_TIMEOUT)
+
+
+def forget(username: str) -> None:
+    """ユーザー名の変更・削除時にキャッシュを消去する"""
+    cache.delete(_key(username))
+
+
+def is_username_available(username: str) -> bool:
+    """
+    ユーザー名が使用可能かどうか
+
+    使用済みの結果のみキャッシュする（使用可能な結果は直後に登録される可能性があるため）。
+    """
+    if is_known_taken(username):
+        return False
+    taken = User.objects.alias(username_lower=Lower('username')).filter(
+        username_lower=username.lower()
+    ).exists()
+    if taken:
+        mark_taken(username)
+    return not taken
+
+
+def save_user(user: User, **kwargs) -> None:
+    """
+    ユーザーを保存する
+
+    事前に重複を確認せず、一意インデックスの違反を UsernameTaken として返す。
+    """
+    try:
+        with transaction.atomic():
+            user.save(**kwargs)
+    except IntegrityError as e:
+        mark_taken(user.username)
+        raise UsernameTaken(user.username) from e
+    mark_taken(user.username)
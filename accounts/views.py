@@ -1,11 +1,12 @@
 from typing import Any
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import login
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import Http404, HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.views import generic
 
 from .forms import SignupForm, LoginForm, RenameForm
+from .usernames import USERNAME_TAKEN_MESSAGE, UsernameTaken, forget, is_username_available, save_user
 
 
 class ReferrerRequiredMixin:
@@ -33,9 +34,13 @@ class SignupView(generic.View):
         if form.is_valid():
             user = form.save(commit=False)
             user.set_password(form.cleaned_data['password'])
-            user.save()
-            login(request, user)
-            return redirect('accounts:signup_complete')
+            try:
+                save_user(user)
+            except UsernameTaken:
+                form.add_error('username', USERNAME_TAKEN_MESSAGE)
+            else:
+                login(request, user)
+                return redirect('accounts:signup_complete')
         return render(request, self.template_name, {'form': form})
 
 
@@ -56,16 +61,11 @@ class LoginView(generic.View):
         return render(request, self.template_name, {'form': form})
 
     def post(self, request: HttpRequest) -> HttpResponse:
-        form = LoginForm(request.POST)
+        form = LoginForm(request.POST, request=request)
         if form.is_valid():
-            username = form.cleaned_data['username']
-            password = form.cleaned_data['password']
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                return redirect('accounts:login_complete')
-            else:
-                form.add_error(None, 'ユーザー名かパスワードが間違っています。')
+            # フォームの検証時に認証したユーザーを使う（パスワードのハッシュ計算は1回）
+            login(request, form.get_user())
+            return redirect('accounts:login_complete')
         return render(request, self.template_name, {'form': form})
 
 
@@ -91,14 +91,42 @@ class AccountEditView(LoginRequiredMixin, generic.View):
     def post(self, request: HttpRequest) -> HttpResponse:
         form = RenameForm(request.POST)
         if form.is_valid():
-            new_username = form.cleaned_data['username']
-            request.user.username = new_username
-            request.user.save()
-            return redirect('accounts:rename_complete')
+            old_username = request.user.username
+            request.user.username = form.cleaned_data['username']
+            try:
+                save_user(request.user, update_fields=['username'])
+            except UsernameTaken:
+                request.user.username = old_username
+                form.add_error('username', USERNAME_TAKEN_MESSAGE)
+            else:
+                forget(old_username)
+                return redirect('accounts:rename_complete')
 
         return render(request, self.template_name, {'form': form})
 
 
+class UsernameAvailabilityView(generic.View):
+    """ユーザー名の使用可否を返すAPI（新規登録フォームの入力中の確認用）"""
+
+    def get(self, request: HttpRequest) -> JsonResponse:
+        username = request.GET.get('username', '')
+        # 文字種・文字数は変更フォームと同じ検証を行う
+        form = RenameForm({'username': username})
+        if not form.is_valid():
+            return JsonResponse({
+                'username': username,
+                'available': False,
+                'message': form.errors['username'][0],
+            })
+
+        available = is_username_available(username)
+        return JsonResponse({
+            'username': username,
+            'available': available,
+            'message': '使用できるユーザー名です。' if available else USERNAME_TAKEN_MESSAGE,
+        })
+
+
 class RenameCompleteView(ReferrerRequiredMixin, generic.TemplateView):
     """ユーザー名変更完了ビュー"""
     template_name = 'accounts/rename_complete.html'
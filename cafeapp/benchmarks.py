@@ -0,0 +1,431 @@
+"""
+HTTPベンチマークのシナリオとベンチマーク用データの作成
+
+シナリオは「訪問者1人分」のリクエストの流れを、テストクライアント（同じプロセス内、
+SQLの件数も計測）または起動中のサーバー（HTTP）のどちらに対しても同じ手順で送る。
+リクエストごとの所要時間とSQLの件数をURL名ごとに集計し、保存したベースラインと比較する。
+"""
+import http.cookiejar
+import io
+import random
+import re
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from pages.availability import invalidate_availability
+from pages.caching import bump_generation
+from pages.feeds import invalidate_feeds
+from pages.forms import BookingForm
+from pages.images import delete_derivatives
+from pages.models import Booking, Menu, MenuRating, News, OutgoingMail, Review
+from pages.pagination import invalidate_counts
+from pages.search import build_search_document
+
+# ベンチマーク用のデータ・シナリオで作成するデータの目印
+SEED_PREFIX = '【ベンチマーク】'
+SEED_USERNAME_PREFIX = 'benchseed'
+SCENARIO_USERNAME_PREFIX = 'benchuser'
+SCENARIO_PASSWORD = 'benchpass1'
+SEED_IMAGE = 'menu/benchmark-seed.jpg'
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+PAGE_LINK = re.compile(r'href="(\?[^"]+)"[^>]*>\s*<span>(\d+)</span>')
+
+# seed_benchmark_data と run_benchmarks --seed で作成する件数
+SEED_VOLUMES = {
+    'news': 200,
+    'menus': 30,
+    'users': 50,
+    'reviews': 500,
+    'bookings': 2000,
+}
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+class BenchmarkError(Exception):
+    """シナリオの途中で想定外のレスポンスが返された"""
+
+
+def get_label(method: str, path: str) -> str:
+    """集計に使うラベル（メソッドとURL名）"""
+    try:
+        name = resolve(urllib.parse.urlsplit(path).path).view_name
+    except Resolver404:
+        name = path
+    return f'{method} {name}'
+
+
+class Recorder:
+    """ラベルごとの所要時間とSQLの件数"""
+
+    def __init__(self):
+        self.samples: dict[str, list[tuple[float, int | None]]] = {}
+
+    def add(self, label: str, seconds: float, queries: int | None) -> None:
+        self.samples.setdefault(label, []).append((seconds, queries))
+
+    def summary(self) -> dict[str, dict]:
+        results = {}
+        for label, samples in self.samples.items():
+            timings = sorted(seconds for seconds, _ in samples)
+            quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+            queries = [n for _, n in samples if n is not None]
+            results[label] = {
+                'requests': len(samples),
+                'p50_ms': round(quantiles[49] * 1000, 2),
+                'p95_ms': round(quantiles[94] * 1000, 2),
+                'p99_ms': round(quantiles[98] * 1000, 2),
+                'queries': round(statistics.mean(queries), 2) if queries else None,
+            }
+        return results
+
+
+class TestClientSession:
+    """テストクライアントで同じプロセス内のビューを呼び出す（SQLの件数も計測する）"""
+
+    def __init__(self, recorder: Recorder):
+        self.recorder = recorder
+        self.client = Client()
+
+    def request(self, method: str, path: str, data=None, referer=None) -> tuple[int, str, str]:
+        extra = {'HTTP_REFERER': f'http://testserver{referer}'} if referer else {}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            # run_benchmarks はロールバックするトランザクション内で実行するため、
+            # コミット後の処理（キャッシュの破棄等）は本番と同じくリクエストごとに実行して計測に含める
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                response = self.client.generic(
+                    method, path, urllib.parse.urlencode(data or {}),
+                    content_type='application/x-www-form-urlencoded', **extra,
+                )
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+        self.recorder.add(get_label(method, path), elapsed, len(queries))
+        return response.status_code, response.get('Location', ''), body.decode()
+
+    def clear_cookies(self) -> None:
+        self.client.cookies.clear()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """起動中のサーバーにHTTPでリクエストを送る（Cookieは訪問者ごとに保持する）"""
+
+    def __init__(self, recorder: Recorder, base_url: str, timeout: float = 30.0):
+        self.recorder = recorder
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def request(self, method: str, path: str, data=None, referer=None) -> tuple[int, str, str]:
+        headers = {'Referer': self.base_url + referer} if referer else {}
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, body, headers, method=method)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, location, content = response.status, '', response.read()
+        except urllib.error.HTTPError as e:
+            status, location, content = e.code, e.headers.get('Location', ''), e.read()
+        self.recorder.add(get_label(method, path), time.perf_counter() - started, None)
+        return status, urllib.parse.urlsplit(location).path, content.decode()
+
+    def clear_cookies(self) -> None:
+        self.cookies.clear()
+
+
+def _get(session, path, referer=None) -> str:
+    status, _, html = session.request('GET', path, referer=referer)
+    if status != 200:
+        raise BenchmarkError(f'GET {path} returned {status}')
+    return html
+
+
+def _submit(session, path, html, data, expected) -> str:
+    """フォームを送信し、expected へのリダイレクトを確認して、リダイレクト先を返す"""
+    match = CSRF_TOKEN.search(html)
+    if match is None:
+        raise BenchmarkError(f'CSRF token not found on {path}')
+    status, location, _ = session.request(
+        'POST', path, {'csrfmiddlewaretoken': match.group(1), **data}, referer=path,
+    )
+    if status != 302 or urllib.parse.urlsplit(location).path != expected:
+        raise BenchmarkError(f'POST {path} returned {status} {location or ""}'.strip())
+    return expected
+
+
+@scenario
+def menu_browse(session, index):
+    """メニュー一覧と詳細を閲覧する（ログインなし）"""
+    _get(session, reverse('pages:menu'))
+    _get(session, reverse('pages:menu-detail'))
+
+
+@scenario
+def news_paging(session, index):
+    """カテゴリー別のニュース一覧を3ページ目まで順に閲覧する"""
+    categories = [value for value, _ in News.Category.choices if value]
+    path = reverse('pages:news-category', kwargs={'category': categories[index % len(categories)]})
+    html = _get(session, path)
+    for number in (2, 3):
+        links = {int(num): url for url, num in PAGE_LINK.findall(html)}
+        if number not in links:
+            return
+        html = _get(session, path + links[number].replace('&amp;', '&'))
+
+
+@scenario
+def booking_funnel(session, index):
+    """予約フォーム → 確認 → 完了"""
+    # 予約枠が満席にならないよう、遠い将来の日付と時間に分散させる
+    slots = [value for value, _ in BookingForm.HOURS_CHOICES]
+    day = date.today() + timedelta(days=3650 + index // len(slots))
+    path = reverse('pages:booking')
+    confirm = _submit(session, path, _get(session, path), {
+        'name': SEED_PREFIX,
+        'date': day.strftime('%Y/%m/%d'),
+        'time': slots[index % len(slots)],
+        'email': 'benchmark@example.invalid',
+        'phone_number': '0312345678',
+        'number_of_people': 1,
+    }, reverse('pages:booking-confirm'))
+    complete = _submit(session, confirm, _get(session, confirm, referer=path), {},
+                       reverse('pages:booking-complete'))
+    _get(session, complete, referer=confirm)
+
+
+@scenario
+def contact(session, index):
+    """お問い合わせフォームの送信"""
+    path = reverse('pages:contact')
+    complete = _submit(session, path, _get(session, path), {
+        'subject': f'{SEED_PREFIX}お問い合わせ',
+        'message': 'ベンチマークからの送信です。',
+        'full_name': SEED_PREFIX,
+        'email': 'benchmark@example.invalid',
+    }, reverse('pages:contact-complete'))
+    _get(session, complete, referer=path)
+
+
+_usernames = count()
+
+
+@scenario
+def signup_login(session, index):
+    """新規登録 → 新しいセッションでログイン"""
+    username = f'{SCENARIO_USERNAME_PREFIX}{time.time_ns() % 10**8}{next(_usernames)}'[:18]
+    path = reverse('accounts:signup')
+    complete = _submit(session, path, _get(session, path), {
+        'username': username,
+        'password': SCENARIO_PASSWORD,
+        'confirm_password': SCENARIO_PASSWORD,
+    }, reverse('accounts:signup_complete'))
+    _get(session, complete, referer=path)
+
+    # 別の訪問者（ログインしていないCookie）としてログインする
+    session.clear_cookies()
+    path = reverse('accounts:login')
+    complete = _submit(session, path, _get(session, path), {
+        'username': username,
+        'password': SCENARIO_PASSWORD,
+    }, reverse('accounts:login_complete'))
+    _get(session, complete, referer=path)
+
+
+def run_scenario(name: str, make_session, iterations: int, warmup: int = 1) -> Recorder:
+    """シナリオを iterations 回実行する（最初の warmup 回はキャッシュの準備として集計しない）"""
+    func = SCENARIOS[name]
+    for index in range(warmup):
+        func(make_session(Recorder()), index)
+    recorder = Recorder()
+    for index in range(warmup, warmup + iterations):
+        # 訪問者ごとに新しいセッション（Cookie）を使う
+        func(make_session(recorder), index)
+    return recorder
+
+
+def compare(results: dict, baseline: dict, tolerance: float, queries_only: bool = False) -> list[str]:
+    """ベースラインより悪化した項目を返す（SQLの件数は1件でも増えれば悪化とする）"""
+    regressions = []
+    for scenario_name, labels in results.items():
+        for label, result in labels.items():
+            base = baseline.get(scenario_name, {}).get(label)
+            if base is None:
+                continue
+            if result['queries'] is not None and base.get('queries') is not None \
+                    and result['queries'] > base['queries']:
+                regressions.append(
+                    f'{scenario_name} {label}: {result["queries"]} queries (baseline {base["queries"]})'
+                )
+            if not queries_only and result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{scenario_name} {label}: p95 {result["p95_ms"]} ms (baseline {base["p95_ms"]} ms)'
+                )
+    return regressions
+
+
+def _seed_image() -> str:
+    """メニュー用の画像（既にあれば再利用する）"""
+    if not default_storage.exists(SEED_IMAGE):
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), (180, 140, 100)).save(buffer, 'JPEG')
+        default_storage.save(SEED_IMAGE, ContentFile(buffer.getvalue()))
+    return SEED_IMAGE
+
+
+def _delete(queryset) -> int:
+    """削除した件数（CASCADE で削除された関連データを除く）"""
+    return queryset.delete()[1].get(queryset.model._meta.label, 0)
+
+
+def clear_scenario_data() -> dict[str, int]:
+    """シナリオで作成した予約・メール・ユーザーを削除する"""
+    return {
+        'bookings': _delete(Booking.objects.filter(name__startswith=SEED_PREFIX, date__gte=date.today())),
+        'mails': _delete(OutgoingMail.objects.filter(body__contains=SEED_PREFIX)),
+        'users': _delete(User.objects.filter(username__startswith=SCENARIO_USERNAME_PREFIX)),
+    }
+
+
+def clear_seed_data() -> dict[str, int]:
+    """ベンチマーク用のデータとシナリオで作成したデータを削除する"""
+    deleted = clear_scenario_data()
+    deleted['news'] = _delete(News.objects.filter(title__startswith=SEED_PREFIX))
+    menus = Menu.objects.filter(title__startswith=SEED_PREFIX)
+    variants = list(menus.exclude(img_variants={}).values_list('img_variants', flat=True).distinct())
+    deleted['menus'] = _delete(menus)
+    deleted['bookings'] += _delete(Booking.objects.filter(name__startswith=SEED_PREFIX))
+    deleted['users'] += _delete(User.objects.filter(username__startswith=SEED_USERNAME_PREFIX))
+
+    def delete_files():
+        for item in variants:
+            delete_derivatives(item)
+        if not Menu.objects.filter(img=SEED_IMAGE).exists():
+            default_storage.delete(SEED_IMAGE)
+
+    transaction.on_commit(delete_files)
+    transaction.on_commit(invalidate_caches)
+    return deleted
+
+
+def seed(news=0, menus=0, users=0, reviews=0, bookings=0, random_seed=0, batch_size=1000) -> dict[str, int]:
+    """
+    ベンチマーク用のデータを作成する（random_seed が同じなら同じ内容になる）
+
+    シグナルを経由しない bulk_create で作成し、最後に予約枠を更新してコミット後にキャッシュを破棄する。
+    過去の日付の予約のみ作成し、シナリオで使う将来の予約枠は空けておく。
+    """
+    # 種類ごとに乱数列を分け、他の件数を変えても同じ内容になるようにする
+    rng = {name: random.Random(f'{random_seed}:{name}') for name in ('news', 'menus', 'reviews', 'bookings')}
+    now = timezone.now()
+    categories = [value for value, _ in News.Category.choices if value]
+
+    def make_news(i):
+        title = f'{SEED_PREFIX}ニュース{i}'
+        text = 'ベンチマーク用のニュースです。' * rng['news'].randint(1, 20)
+        # bulk_create では save() を経由しないため、検索用文書もここで作成する
+        return News(
+            category=categories[i % len(categories)],
+            title=title,
+            text=text,
+            search_document=build_search_document(title, text),
+            created_at=now - timedelta(minutes=i),
+        )
+
+    News.objects.bulk_create((make_news(i) for i in range(news)), batch_size=batch_size)
+
+    image = _seed_image() if menus else None
+    Menu.objects.bulk_create((
+        Menu(
+            title=f'{SEED_PREFIX}メニュー{i}'[:50],
+            img=image,
+            alt=f'メニュー{i}',
+            price=rng['menus'].randrange(300, 1500, 50),
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(menus)
+    ), batch_size=batch_size)
+
+    existing = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).count()
+    new_users = []
+    for i in range(existing, max(users, 1 if reviews else 0)):
+        user = User(username=f'{SEED_USERNAME_PREFIX}{i:05d}')
+        user.set_unusable_password()
+        new_users.append(user)
+    User.objects.bulk_create(new_users, batch_size=batch_size)
+
+    if reviews:
+        user_ids = list(User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).values_list('pk', flat=True))
+        menu_ids = list(Menu.objects.values_list('pk', flat=True))
+        if not menu_ids:
+            raise ValueError('Reviews need at least one menu')
+        Review.objects.bulk_create((
+            Review(
+                user_id=rng['reviews'].choice(user_ids),
+                product_id=rng['reviews'].choice(menu_ids),
+                rating=rng['reviews'].randint(1, 5),
+                title=f'{SEED_PREFIX}レビュー{i}',
+                content='ベンチマーク用のレビューです。',
+            )
+            for i in range(reviews)
+        ), batch_size=batch_size)
+        # bulk_create ではシグナルと save() を経由しないため、評価の集計を作り直す
+        MenuRating.objects.rebuild()
+
+    slots = [value for value, _ in BookingForm.HOURS_CHOICES]
+    today = date.today()
+    Booking.objects.bulk_create((
+        Booking(
+            name=f'{SEED_PREFIX}{i}',
+            date=today - timedelta(days=1 + i % 365),
+            time=slots[i % len(slots)],
+            email='seed@example.invalid',
+            phone_number='0312345678',
+            number_of_people=rng['bookings'].randint(1, 4),
+            created_at=now - timedelta(seconds=i),
+        )
+        for i in range(bookings)
+    ), batch_size=batch_size)
+    if bookings:
+        call_command('rebuild_booking_slots', stdout=io.StringIO())
+
+    transaction.on_commit(invalidate_caches)
+    return {'news': news, 'menus': menus, 'users': len(new_users), 'reviews': reviews, 'bookings': bookings}
+
+
+def invalidate_caches() -> None:
+    """ベンチマーク用のデータを作成・削除した一覧・フィード・件数・予約枠のキャッシュを破棄する"""
+    bump_generation('news')
+    bump_generation('menu')
+    invalidate_feeds()
+    invalidate_counts(News)
+    invalidate_counts(Review)
+    invalidate_counts(Booking)
+    invalidate_availability()
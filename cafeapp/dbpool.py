@@ -0,0 +1,27 @@
+"""
+データベース接続プールの状態
+"""
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+
+
+def get_pool_stats() -> dict[str, dict]:
+    """
+    接続プールの統計情報をデータベースごとに返す
+
+    プールはワーカープロセスごとに作成されるため、値はこのプロセスのもの。
+    プールを使用していないデータベースは含めない。
+    """
+    stats = {}
+    for connection in connections.all():
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            stats[connection.alias] = pool.get_stats()
+    return stats
+
+
+@staff_member_required
+def pool_stats(request):
+    """接続プールの統計情報（管理者のみ）"""
+    return JsonResponse({'pools': get_pool_stats()})
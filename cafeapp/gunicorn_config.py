@@ -0,0 +1,51 @@
+"""
+gunicorn の設定（python manage.py serve から使用する）
+
+環境変数で調整できる:
+    PORT                      待ち受けポート（デフォルト: 8000）
+    GUNICORN_WORKERS          ワーカー数（デフォルト: CPU数 × 2 + 1）
+    GUNICORN_WORKER_CLASS     gthread（WSGI、デフォルト）または uvicorn（ASGI）
+    GUNICORN_THREADS          gthread のワーカーごとのスレッド数（デフォルト: 4）
+    GUNICORN_PRELOAD          アプリケーションを事前に読み込むか（デフォルト: True）
+    GUNICORN_MAX_REQUESTS     ワーカーを再起動するまでのリクエスト数（デフォルト: 1000）
+    GUNICORN_TIMEOUT          応答しないワーカーを再起動するまでの時間（秒、デフォルト: 30）
+    GUNICORN_GRACEFUL_TIMEOUT 停止時に処理中のリクエストを待つ時間（秒、デフォルト: 30）
+"""
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+}
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# ミドルウェア（WhiteNoise 等）が同期のみのため、ASGI では全リクエストが sync_to_async を経由して
+# かえって遅くなる（benchmark_booking_funnel で確認）。ミドルウェアがすべて非同期に対応するまでは WSGI を使う
+worker_class = WORKER_CLASSES[os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')]
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# uvicorn ワーカーはイベントループで並行処理するためスレッドを使用しない
+threads = int(os.environ.get('GUNICORN_THREADS', '4')) if worker_class == 'gthread' else 1
+
+# マスタープロセスでアプリケーションを読み込み、ワーカーの起動を速くしてメモリを共有する
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 'yes')
+
+# メモリリーク対策としてワーカーを定期的に再起動する（全ワーカーが同時に再起動しないよう揺らす）
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max(max_requests // 10, 1) if max_requests else 0
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# ログは標準出力・標準エラー出力へ
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """ワーカーの起動時に、マスタープロセスから引き継いだDB接続を閉じる"""
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
@@ -1,39 +1,211 @@
 """
 ヘルスチェック用のビュー
+
+チェック項目は HEALTH_CHECKS で設定し、項目ごとのタイムアウトを付けて並行に実行する。
+タイムアウトはチェック関数にも渡し、接続のタイムアウトとして使う。
+結果はプロセス内に HEALTH_CHECK_CACHE_TTL 秒保持し、短い間隔のプローブで
+データベース等に負荷をかけないようにする。
+外部のSMTPサーバーの確認（check_smtp）はプローブごと・ワーカーごとに接続することになるため、
+デフォルトの HEALTH_CHECKS には含めない。
 """
-from django.http import JsonResponse
-from django.db import connection
+import math
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+# チェックを実行するスレッド（DB接続をスレッドごとに再利用する）
+# 実行中のスレッドは中断できないため、同じ項目は前回の実行が終わるまで再実行しない
+# （応答しない依存先があっても、スレッドは項目ごとに1つまでしか使わない）
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='health-check')
+_running: dict = {}
+_lock = threading.Lock()
+_ready_lock = threading.Lock()
+_state: dict = {}
+
+
+def check_database(timeout: float | None = None):
+    """
+    データベースに接続できるかを確認する（接続できない場合は例外を送出）
+
+    PostgreSQLでは接続のタイムアウト（connect_timeout、2秒以上）を timeout 秒にする。
+    設定はこのスレッドの接続だけに適用し、接続プールを使う場合はプールのタイムアウトに従う。
+    """
+    options = connection.settings_dict.get('OPTIONS', {})
+    if connection.vendor == 'postgresql' and 'pool' not in options:
+        connect_timeout = max(math.ceil(timeout or settings.HEALTH_CHECK_TIMEOUT), 2)
+        if options.get('connect_timeout') != connect_timeout:
+            # 設定の辞書は全スレッドの接続で共有されているため、コピーを変更する
+            connection.settings_dict = {
+                **connection.settings_dict, 'OPTIONS': {**options, 'connect_timeout': connect_timeout},
+            }
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def check_cache(timeout: float | None = None):
+    """キャッシュに書き込み・読み込みできるかを確認する"""
+    key = f'health-check:{uuid.uuid4().hex}'
+    cache.set(key, 'ok', 10)
+    try:
+        if cache.get(key) != 'ok':
+            raise RuntimeError('cache did not return the stored value')
+    finally:
+        cache.delete(key)
+
+
+def check_media_storage(timeout: float | None = None):
+    """アップロード先のストレージに書き込めるかを確認する"""
+    name = default_storage.save(f'health-check/{uuid.uuid4().hex}.txt', ContentFile(b'ok'))
+    default_storage.delete(name)
+
+
+def check_smtp(timeout: float | None = None):
+    """
+    SMTPサーバーに接続できるかを確認する（メールは送信せず、接続・EHLOのみ）
+
+    SMTP以外のメールバックエンド（開発環境のconsole等）では確認しない。
+    プローブのたびに外部のサーバーへ接続するため、デフォルトの HEALTH_CHECKS には含めない。
+    """
+    if settings.EMAIL_BACKEND != 'django.core.mail.backends.smtp.EmailBackend':
+        return {'skipped': settings.EMAIL_BACKEND}
+    with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT,
+                      timeout=timeout or settings.HEALTH_CHECK_TIMEOUT) as smtp:
+        code, _ = smtp.ehlo()
+        if code != 250:
+            raise RuntimeError(f'EHLO returned {code}')
+
+
+def _run(func, timeout: float):
+    try:
+        return func(timeout=timeout)
+    finally:
+        # スレッドの接続は永続接続として再利用し、切断されている場合のみ閉じる
+        for conn in connections.all(initialized_only=True):
+            conn.close_if_unusable_or_obsolete()
+
+
+def run_checks() -> dict:
+    """HEALTH_CHECKS のチェックを並行に実行し、チェックごとの結果と所要時間を返す"""
+    started = {}
+    futures = {}
+    for name, options in settings.HEALTH_CHECKS.items():
+        started[name] = time.perf_counter()
+        timeout = options.get('timeout', settings.HEALTH_CHECK_TIMEOUT)
+        key = (name, options['check'])
+        previous = _running.get(key)
+        if previous is not None and not previous.done():
+            # 前回の実行がまだ応答していない
+            futures[name] = previous
+            continue
+        futures[name] = _running[key] = _executor.submit(_run, import_string(options['check']), timeout)
+
+    results = {}
+    for name, future in futures.items():
+        options = settings.HEALTH_CHECKS[name]
+        timeout = options.get('timeout', settings.HEALTH_CHECK_TIMEOUT)
+        result = {'critical': options.get('critical', True)}
+        try:
+            remaining = max(started[name] + timeout - time.perf_counter(), 0)
+            detail = future.result(timeout=remaining)
+            result['status'] = 'ok'
+            if detail:
+                result['detail'] = detail
+        except FutureTimeoutError:
+            result['status'] = 'timeout'
+            result['error'] = f'no response within {timeout}s'
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = str(e)
+        result['latency_ms'] = round((time.perf_counter() - started[name]) * 1000, 2)
+        results[name] = result
+    return results
+
+
+def get_health() -> tuple[dict, bool]:
+    """
+    チェック結果を返す（HEALTH_CHECK_CACHE_TTL 秒以内の結果があれば再利用する）
+
+    同時に届いたプローブは最初の1件の結果を待って共有する。
+    """
+    with _lock:
+        cached = _state.get('health')
+        if cached and time.monotonic() - cached[0] < settings.HEALTH_CHECK_CACHE_TTL:
+            return cached[1], True
+        checks = run_checks()
+        _state['health'] = (time.monotonic(), checks)
+        return checks, False
+
+
+def migrations_applied() -> bool:
+    """未適用のマイグレーションがないかどうか（一度適用済みになれば再確認しない）"""
+    if not _state.get('migrated'):
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        targets = executor.loader.graph.leaf_nodes()
+        _state['migrated'] = not executor.migration_plan(targets)
+    return _state['migrated']
+
+
+def warm_caches() -> None:
+    """HEALTH_CHECK_WARMUP の関数を実行してキャッシュを準備する（プロセスごとに1回）"""
+    if not _state.get('warmed'):
+        for path in settings.HEALTH_CHECK_WARMUP:
+            import_string(path)()
+        _state['warmed'] = True
 
 
 def health_check(request):
     """
     アプリケーションのヘルスチェックエンドポイント
-    データベース接続を確認して、正常性を返す
+    依存先（データベース、キャッシュ、ストレージ）を確認して、正常性と所要時間を返す
     """
-    try:
-        # データベース接続の確認
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-        
-        return JsonResponse({
-            'status': 'healthy',
-            'database': 'connected',
-            'debug': settings.DEBUG
-        }, status=200)
-    
-    except Exception as e:
-        return JsonResponse({
-            'status': 'unhealthy',
-            'error': str(e)
-        }, status=503)
+    checks, cached = get_health()
+    failed = [name for name, result in checks.items() if result['status'] != 'ok']
+    if any(checks[name]['critical'] for name in failed):
+        status = 'unhealthy'
+    elif failed:
+        # 重要でない依存先（ストレージ等）の障害ではサービスを止めない
+        status = 'degraded'
+    else:
+        status = 'healthy'
+
+    return JsonResponse({
+        'status': status,
+        'checks': checks,
+        'cached': cached,
+        'debug': settings.DEBUG
+    }, status=503 if status == 'unhealthy' else 200)
 
 
 def readiness_check(request):
     """
     レディネスチェックエンドポイント
-    アプリケーションがリクエストを受け付ける準備ができているかを確認
+    マイグレーションが適用済みで、キャッシュの準備ができている場合のみ ready を返す
     """
+    try:
+        with _ready_lock:
+            if not migrations_applied():
+                return JsonResponse({
+                    'status': 'not ready',
+                    'reason': 'migrations pending'
+                }, status=503)
+            warm_caches()
+    except Exception as e:
+        return JsonResponse({
+            'status': 'not ready',
+            'error': str(e)
+        }, status=503)
+
     return JsonResponse({
         'status': 'ready'
     }, status=200)
@@ -47,4 +219,3 @@ def liveness_check(request):
     return JsonResponse({
         'status': 'alive'
     }, status=200)
-
@@ -0,0 +1,88 @@
+import copy
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import ConnectionHandler
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/s of per-request, persistent and pooled PostgreSQL connections '
+        'at different numbers of concurrent workers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', default='1,4,16,32',
+            help='Comma separated numbers of concurrent workers (threads)',
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Requests per worker count and mode')
+        parser.add_argument('--queries', type=int, default=3, help='Queries per simulated request')
+        parser.add_argument('--pool-max-size', type=int, default=10)
+
+    def handle(self, *args, **options):
+        base = connections.settings[DEFAULT_DB_ALIAS]
+        if base['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError('This benchmark requires PostgreSQL (set DATABASE_URL).')
+
+        base = copy.deepcopy(base)
+        base['OPTIONS'].pop('pool', None)
+        modes = {
+            'per-request': dict(base, CONN_MAX_AGE=0),
+            'persistent': dict(base, CONN_MAX_AGE=600),
+            'pooled': dict(base, CONN_MAX_AGE=0, OPTIONS=dict(base['OPTIONS'], pool={
+                'min_size': 1, 'max_size': options['pool_max_size'], 'timeout': 30,
+            })),
+        }
+        workers = [int(n) for n in options['workers'].split(',')]
+
+        self.stdout.write(f'{"workers":>8} ' + ' '.join(f'{mode + " req/s":>18}' for mode in modes))
+        for count in workers:
+            row = []
+            for mode, settings_dict in modes.items():
+                # 接続プールはエイリアスごとに共有されるため、計測ごとに別名を使う
+                alias = f'benchmark_{mode}_{count}'
+                rate, errors = self.measure(
+                    ConnectionHandler({alias: settings_dict}), alias,
+                    count, options['requests'], options['queries'],
+                )
+                row.append(f'{rate:>12.1f}' + (f' ({errors} err)' if errors else ' ' * 6))
+            self.stdout.write(f'{count:>8} ' + ' '.join(row))
+
+    def measure(self, handler, alias, workers, requests, queries):
+        """ワーカー数分のスレッドでリクエストを模した処理を行い、1秒あたりの件数を返す"""
+        remaining = iter(range(requests))
+        lock = threading.Lock()
+        errors = []
+
+        def worker():
+            connection = handler[alias]
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            break
+                    try:
+                        with connection.cursor() as cursor:
+                            for _ in range(queries):
+                                cursor.execute('SELECT 1')
+                                cursor.fetchone()
+                    except Exception as e:
+                        errors.append(e)
+                    # リクエスト終了時の処理（close_old_connections と同じ）
+                    connection.close_if_unusable_or_obsolete()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        handler[alias].close_pool()
+        return (requests - len(errors)) / elapsed, len(errors)
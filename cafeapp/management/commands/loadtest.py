@@ -0,0 +1,62 @@
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Send concurrent GET requests to a running server and report requests/s and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs to request in turn (e.g. http://localhost:8000/news/)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+        parser.add_argument('--requests', type=int, default=500, help='Total number of requests')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Timeout of each request (seconds)')
+
+    def handle(self, *args, **options):
+        urls = options['urls']
+        total = options['requests']
+        counter = iter(range(total))
+        lock = threading.Lock()
+        latencies = []
+        errors = []
+
+        def client():
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                url = urls[index % len(urls)]
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(url, timeout=options['timeout']) as response:
+                        response.read()
+                except (urllib.error.URLError, OSError) as e:
+                    errors.append(e)
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if not latencies:
+            self.stderr.write(f'All {total} requests failed: {errors[0] if errors else "no requests"}')
+            return
+
+        latencies.sort()
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(f'requests:    {len(latencies)} ok, {len(errors)} failed')
+        self.stdout.write(f'throughput:  {len(latencies) / elapsed:.1f} req/s')
+        self.stdout.write(
+            f'latency ms:  p50={quantiles[49] * 1000:.1f} p95={quantiles[94] * 1000:.1f} '
+            f'p99={quantiles[98] * 1000:.1f} max={latencies[-1] * 1000:.1f}'
+        )
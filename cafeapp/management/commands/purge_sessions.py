@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired rows from django_session in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of sessions deleted per statement (default: SESSION_PURGE_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to wait between batches to reduce load on the database',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and purge again every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=3600.0,
+            help='Seconds between purges (with --loop)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.SESSION_ENGINE.endswith(('.db', '.cached_db')):
+            self.stdout.write(f'{settings.SESSION_ENGINE} does not store sessions in the database; nothing to purge.')
+            return
+
+        while True:
+            deleted = self.purge(options['batch_size'] or settings.SESSION_PURGE_BATCH_SIZE, options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def purge(self, batch_size, sleep):
+        """期限切れのセッションを主キーで区切って削除する（長時間のロックを避ける）"""
+        now = timezone.now()
+        total = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return total
+            total += Session.objects.filter(session_key__in=keys).delete()[0]
+            if sleep:
+                time.sleep(sleep)
@@ -0,0 +1,143 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from cafeapp.benchmarks import (
+    SCENARIOS, SEED_VOLUMES, BenchmarkError, HttpSession, TestClientSession,
+    clear_scenario_data, compare, invalidate_caches, run_scenario, seed,
+)
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the benchmark scenarios against the test client (default, rolled back afterwards) '
+        'or a running server (--base-url), report p50/p95/p99 and queries per request, '
+        'and compare them with a stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*',
+            help=f'Scenarios to run (default: all of {", ".join(SCENARIOS)})',
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Visitors per scenario')
+        parser.add_argument('--warmup', type=int, default=1, help='Visitors per scenario run before measuring')
+        parser.add_argument(
+            '--base-url',
+            help='Send HTTP requests to a running server instead of the test client (queries are not counted)',
+        )
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Seed the standard data volumes before running (test client only; rolled back afterwards)',
+        )
+        parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='Baseline JSON file')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Allowed p95 slowdown compared with the baseline (0.5 = 50%%)',
+        )
+        parser.add_argument(
+            '--queries-only', action='store_true',
+            help='Only compare queries per request (latency baselines depend on the machine)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(
+                f'Unknown scenarios: {", ".join(unknown)} (choose from {", ".join(SCENARIOS)})'
+            )
+        try:
+            if options['base_url']:
+                if options['seed']:
+                    raise CommandError('--seed is only available with the test client; run seed_benchmark_data instead.')
+                results = self.run_http(names, options)
+            else:
+                results = self.run_test_client(names, options)
+        except BenchmarkError as e:
+            raise CommandError(f'Scenario failed: {e}') from e
+
+        self.report(results)
+
+        baseline_path = options['baseline']
+        # SQLの件数や所要時間はデータベースによって異なるため、ベースラインには種類も記録する
+        vendor = connection.vendor
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline = {'vendor': vendor, 'scenarios': results}
+            baseline_path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f'No baseline at {baseline_path} (create one with --save-baseline)')
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('vendor') != vendor:
+            raise CommandError(
+                f'The baseline {baseline_path} was recorded on {baseline.get("vendor") or "an unknown database"}, '
+                f'not {vendor}; record a baseline for this database with --save-baseline --baseline <path>.'
+            )
+        regressions = compare(
+            results, baseline['scenarios'], options['tolerance'], options['queries_only'],
+        )
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}'))
+
+    def run_test_client(self, names, options):
+        results = {}
+        # シナリオで作成したデータとベンチマーク用のデータは最後にロールバックし、
+        # アップロードされる画像は一時ディレクトリに保存して削除する
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], MEDIA_ROOT=media_root,
+            ), transaction.atomic():
+                if options['seed']:
+                    with TestCase.captureOnCommitCallbacks(execute=True):
+                        seed(**SEED_VOLUMES)
+                for name in names:
+                    recorder = run_scenario(name, TestClientSession, options['iterations'], options['warmup'])
+                    results[name] = recorder.summary()
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+            # ロールバックしたデータを含むキャッシュを破棄する
+            invalidate_caches()
+        return results
+
+    def run_http(self, names, options):
+        results = {}
+        try:
+            for name in names:
+                recorder = run_scenario(
+                    name, lambda recorder: HttpSession(recorder, options['base_url']),
+                    options['iterations'], options['warmup'],
+                )
+                results[name] = recorder.summary()
+        finally:
+            # サーバーが同じデータベースを使っている場合のみ削除される
+            clear_scenario_data()
+        return results
+
+    def report(self, results):
+        self.stdout.write(f'{"scenario / request":<48} {"n":>5} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}')
+        for name, labels in results.items():
+            self.stdout.write(name)
+            for label, result in labels.items():
+                queries = '-' if result['queries'] is None else result['queries']
+                self.stdout.write(
+                    f'  {label:<46} {result["requests"]:>5} {result["p50_ms"]:>8} '
+                    f'{result["p95_ms"]:>8} {result["p99_ms"]:>8} {queries:>8}'
+                )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cafeapp.benchmarks import SEED_VOLUMES, clear_seed_data, seed
+
+
+class Command(BaseCommand):
+    help = 'Create News, Menu, Review and Booking rows for the benchmark suite (same --random-seed, same data)'
+
+    def add_arguments(self, parser):
+        for name, default in SEED_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f'Number of {name} (default: {default})')
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete previously seeded rows and rows created by benchmark scenarios first',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['clear']:
+                deleted = clear_seed_data()
+                self.stdout.write('Deleted ' + ', '.join(f'{count} {name}' for name, count in deleted.items()))
+            try:
+                created = seed(
+                    **{name: options[name] for name in SEED_VOLUMES},
+                    random_seed=options['random_seed'],
+                )
+            except ValueError as e:
+                raise CommandError(str(e)) from e
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{count} {name}' for name, count in created.items())
+        ))
@@ -0,0 +1,101 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from cafeapp.health_check import check_database
+
+APPLICATIONS = {
+    'gthread': 'cafeapp.wsgi:application',
+    'uvicorn': 'cafeapp.asgi:application',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Wait for the database, apply migrations once, collect static files if the manifest '
+        'is missing and exec gunicorn with cafeapp.gunicorn_config'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wait', type=float, default=30.0,
+            help='Seconds to wait for the database to accept connections',
+        )
+        parser.add_argument(
+            '--skip-migrate', action='store_true',
+            help='Do not run migrate before starting gunicorn',
+        )
+        parser.add_argument(
+            'gunicorn_args', nargs='*',
+            help='Extra arguments passed to gunicorn (after --)',
+        )
+
+    def handle(self, *args, **options):
+        self.wait_for_database(options['wait'])
+
+        if not options['skip_migrate']:
+            # ワーカーごとではなく起動時に1回だけ実行する
+            self.stdout.write(self.style.SUCCESS('Running migrate'))
+            call_command('migrate', interactive=False)
+
+        if settings.STATIC_MANIFEST and not self.has_static_manifest():
+            # マニフェストがないと {% static %} がすべてエラーになるため、起動前に作成する
+            self.stdout.write(self.style.SUCCESS('Running collectstatic'))
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+        self.check_shared_cache()
+
+        worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+        if worker_class not in APPLICATIONS:
+            raise CommandError(f'GUNICORN_WORKER_CLASS must be one of: {", ".join(APPLICATIONS)}')
+        gunicorn = shutil.which('gunicorn')
+        if gunicorn is None:
+            raise CommandError('gunicorn is not installed.')
+
+        # 引き継がないよう、gunicorn の起動前にDB接続を閉じる
+        connections.close_all()
+        argv = [
+            gunicorn, '--config', 'python:cafeapp.gunicorn_config',
+            *options['gunicorn_args'], APPLICATIONS[worker_class],
+        ]
+        self.stdout.write(self.style.SUCCESS(f'Starting {" ".join(argv[1:])}'))
+        self.stdout.flush()
+        os.execv(gunicorn, argv)
+
+    def check_shared_cache(self):
+        """
+        プロセス内メモリのキャッシュでは、キャッシュの破棄が他のワーカーに伝わらないため、
+        複数ワーカーでは起動しない
+        """
+        from cafeapp import gunicorn_config
+
+        backend = settings.CACHES['default']['BACKEND']
+        if backend.endswith('LocMemCache') and gunicorn_config.workers > 1:
+            raise CommandError(
+                f'{backend} is per-process and cannot be shared by {gunicorn_config.workers} workers. '
+                'Set DJANGO_CACHE_LOCATION to a Redis or Memcached server or GUNICORN_WORKERS=1.'
+            )
+
+    def has_static_manifest(self) -> bool:
+        """collectstatic で作成するマニフェスト（staticfiles.json）があるか"""
+        return staticfiles_storage.manifest_storage.exists(staticfiles_storage.manifest_name)
+
+    def wait_for_database(self, wait):
+        """ヘルスチェックと同じ方法でデータベースへの接続を確認する"""
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                check_database()
+                return
+            except Exception as e:
+                if time.monotonic() >= deadline:
+                    raise CommandError(f'Database is not available: {e}') from e
+                self.stdout.write(f'Waiting for database: {e}')
+                connections.close_all()
+                time.sleep(1)
@@ -0,0 +1,261 @@
+"""
+リクエストごとの性能計測
+
+URL名（pages:news など）ごとに処理時間・SQLの件数と時間・テンプレートの描画時間を
+ヒストグラムとして集計し、/metrics で Prometheus のテキスト形式で出力する。
+同じSQLが1リクエスト内で METRICS_N_PLUS_ONE_THRESHOLD 回以上実行された場合は
+N+1 の疑いとして記録する。
+
+集計値はプロセスごとに保持する（gunicorn の各ワーカーがそれぞれ集計する）。
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.template.backends.django import Template
+from django.utils.crypto import constant_time_compare
+
+from .dbpool import get_pool_stats
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 計測中のリクエストの集計（sync_to_async のスレッドにも引き継がれる）
+_current = contextvars.ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Prometheus 形式のヒストグラム"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class ViewMetrics:
+    """URL名ごとの集計"""
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.sql_time = Histogram(DURATION_BUCKETS)
+        self.template_time = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.responses = Counter()
+        self.n_plus_one = 0
+
+
+_views: dict[str, ViewMetrics] = defaultdict(ViewMetrics)
+
+
+class RequestStats:
+    """1リクエスト分の計測値"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_time += time.perf_counter() - started
+        stats.query_count += 1
+        # パラメーターを除いたSQLで数え、同じ形のクエリの繰り返しを検出する
+        stats.statements[sql] += 1
+
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    """新しいDB接続にクエリ計測用のラッパーを追加する（計測中のリクエストのみ記録する）"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+_template_render = Template.render
+
+
+def _timed_template_render(self, context=None, request=None):
+    stats = _current.get()
+    if stats is None:
+        return _template_render(self, context, request)
+    started = time.perf_counter()
+    try:
+        return _template_render(self, context, request)
+    finally:
+        stats.template_time += time.perf_counter() - started
+
+
+def get_view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '<unresolved>'
+
+
+def record(request, response, stats: RequestStats, duration: float) -> None:
+    """リクエストの計測値を集計に加える"""
+    view_name = get_view_name(request)
+    repeated = [
+        (sql, count) for sql, count in stats.statements.items()
+        if count >= settings.METRICS_N_PLUS_ONE_THRESHOLD
+    ]
+    with _lock:
+        metrics = _views[view_name]
+        metrics.duration.observe(duration)
+        metrics.sql_time.observe(stats.sql_time)
+        metrics.template_time.observe(stats.template_time)
+        metrics.queries.observe(stats.query_count)
+        metrics.responses[(request.method, response.status_code)] += 1
+        if repeated:
+            metrics.n_plus_one += 1
+    for sql, count in repeated:
+        logger.warning('Possible N+1 query in %s: %d x %s', view_name, count, sql[:200])
+
+
+class RequestMetricsMiddleware:
+    """
+    リクエストの処理時間・SQL・テンプレート描画時間を計測するミドルウェア
+
+    METRICS_SAMPLE_RATE の割合のリクエストのみ計測する。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install_query_wrapper, dispatch_uid='cafeapp.metrics')
+        for connection in connections.all(initialized_only=True):
+            _install_query_wrapper(None, connection)
+        Template.render = _timed_template_render
+
+    def _should_sample(self) -> bool:
+        rate = settings.METRICS_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._should_sample():
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self._should_sample():
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        record(request, response, stats, time.perf_counter() - started)
+        return response
+
+
+def render_metrics() -> str:
+    """集計値を Prometheus のテキスト形式で返す"""
+    histograms = (
+        ('cafeapp_request_duration_seconds', 'duration', 'Request wall time'),
+        ('cafeapp_request_sql_seconds', 'sql_time', 'Time spent in SQL per request'),
+        ('cafeapp_request_template_seconds', 'template_time', 'Time spent rendering templates per request'),
+        ('cafeapp_request_queries', 'queries', 'SQL queries per request'),
+    )
+    with _lock:
+        views = sorted(_views.items())
+        lines = []
+        for name, attr, help_text in histograms:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for view_name, metrics in views:
+                lines += getattr(metrics, attr).render(name, f'view="{view_name}"')
+
+        lines += ['# HELP cafeapp_responses_total Responses by view, method and status',
+                  '# TYPE cafeapp_responses_total counter']
+        for view_name, metrics in views:
+            for (method, status), count in sorted(metrics.responses.items()):
+                lines.append(
+                    f'cafeapp_responses_total{{view="{view_name}",method="{method}",status="{status}"}} {count}'
+                )
+
+        lines += ['# HELP cafeapp_n_plus_one_total Requests that repeated the same SQL statement',
+                  '# TYPE cafeapp_n_plus_one_total counter']
+        for view_name, metrics in views:
+            lines.append(f'cafeapp_n_plus_one_total{{view="{view_name}"}} {metrics.n_plus_one}')
+
+    # 接続プールを使用している場合はプールの状態も出力する
+    for alias, stats in get_pool_stats().items():
+        for key, value in sorted(stats.items()):
+            lines.append(f'cafeapp_db_pool_{key}{{database="{alias}"}} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    集計値の出力（管理者、または METRICS_TOKEN の Bearer トークンを持つクライアントのみ）
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (token and constant_time_compare(authorization, f'Bearer {token}')):
+        return _staff_metrics_view(request)
+    return _metrics_response()
+
+
+def _metrics_response():
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def _staff_metrics_view(request):
+    return _metrics_response()
+
+
+def reset_metrics() -> None:
+    """集計値を消去する"""
+    with _lock:
+        _views.clear()
@@ -0,0 +1,45 @@
+"""
+セッションのシリアライザー
+
+予約データの date / time をセッションに保存したまま取り出せるよう、
+日付・時刻を型情報付きのJSONとして保存する。
+"""
+import json
+from datetime import date, datetime, time
+
+
+class _Encoder(json.JSONEncoder):
+    def default(self, o):
+        # datetime は date のサブクラスのため先に判定する
+        if isinstance(o, datetime):
+            return {'__datetime__': o.isoformat()}
+        if isinstance(o, date):
+            return {'__date__': o.isoformat()}
+        if isinstance(o, time):
+            return {'__time__': o.isoformat()}
+        return super().default(o)
+
+
+_DECODERS = {
+    '__datetime__': datetime.fromisoformat,
+    '__date__': date.fromisoformat,
+    '__time__': time.fromisoformat,
+}
+
+
+def _decode(obj: dict):
+    if len(obj) == 1:
+        (key, value), = obj.items()
+        if key in _DECODERS:
+            return _DECODERS[key](value)
+    return obj
+
+
+class SessionSerializer:
+    """date / time / datetime をそのまま復元できるJSONシリアライザー"""
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':'), cls=_Encoder).encode('latin-1')
+
+    def loads(self, data: bytes):
+        return json.loads(data.decode('latin-1'), object_hook=_decode)
@@ -0,0 +1,55 @@
+"""
+本番環境用の静的ファイルストレージ
+"""
+import io
+
+from django.conf import settings
+from PIL import Image, ImageOps
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class OptimizedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    collectstatic 時に静的ファイルを最適化するストレージ
+
+    - STATIC_IMAGE_MAX_BYTES を超えるJPEGを縮小・再圧縮する（元ファイルは変更しない）
+    - ファイル名にハッシュを付与する（WhiteNoiseが immutable で配信する）
+    - gzip / brotli 圧縮済みファイルを生成する
+    """
+
+    # マニフェストにないファイル（ビルドし忘れた dist/output.css など）はエラーにする
+    manifest_strict = True
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name in list(paths):
+                if name.lower().endswith(('.jpg', '.jpeg')) and self.optimize_jpeg(name):
+                    # ハッシュ計算と圧縮は最適化後のファイルから行う
+                    paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def optimize_jpeg(self, name: str) -> bool:
+        """大きなJPEGを縮小・再圧縮する（小さくなった場合のみ置き換える）"""
+        if self.size(name) <= settings.STATIC_IMAGE_MAX_BYTES:
+            return False
+
+        with self.open(name) as f:
+            original = f.read()
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(original)))
+        image.thumbnail((settings.STATIC_IMAGE_MAX_WIDTH, settings.STATIC_IMAGE_MAX_WIDTH), Image.LANCZOS)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        buffer = io.BytesIO()
+        image.save(
+            buffer, 'JPEG',
+            quality=settings.STATIC_IMAGE_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+        if buffer.tell() >= len(original):
+            return False
+
+        with open(self.path(name), 'wb') as f:
+            f.write(buffer.getvalue())
+        return True
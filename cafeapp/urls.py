@@ -19,7 +19,9 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from .dbpool import pool_stats
 from .health_check import health_check, readiness_check, liveness_check
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -30,6 +32,12 @@ urlpatterns = [
     path('health/', health_check, name='health_check'),
     path('ready/', readiness_check, name='readiness_check'),
     path('alive/', liveness_check, name='liveness_check'),
+
+    # データベース接続プールの状態（管理者のみ）
+    path('db-pool/', pool_stats, name='db_pool_stats'),
+
+    # リクエストの性能計測（Prometheus形式、管理者のみ）
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
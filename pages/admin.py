@@ -1,5 +1,32 @@
 from django.contrib import admin
-from .models import News, Menu, Review, Booking
+from django.utils import timezone
+
+from .exports import PERIOD_CHOICES, get_period_range
+from .models import News, Menu, Review, Booking, OutgoingMail
+from .pagination import CachedCountPaginator
+from .search import search_news
+
+
+class BookingPeriodFilter(admin.SimpleListFilter):
+    """
+    予約日の期間で絞り込むフィルター
+
+    date_hierarchy は年・月の一覧を求めるために全件を走査するため、
+    (date, time) インデックスの範囲検索で済む期間の選択肢を使う。
+    """
+    title = '日付'
+    parameter_name = 'period'
+
+    def lookups(self, request, model_admin):
+        return PERIOD_CHOICES
+
+    def queryset(self, request, queryset):
+        if self.value() not in dict(PERIOD_CHOICES):
+            return queryset
+        start, end = get_period_range(self.value(), timezone.localdate())
+        if start is not None:
+            queryset = queryset.filter(date__gte=start)
+        return queryset.filter(date__lte=end)
 
 
 @admin.register(News)
@@ -8,9 +35,16 @@ class NewsAdmin(admin.ModelAdmin):
     list_display = ['title', 'category', 'created_at']
     list_filter = ['category', 'created_at']
     search_fields = ['title', 'text']
+    search_help_text = 'タイトル・本文を全文検索します（空白区切りで AND 検索）'
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
 
+    def get_search_results(self, request, queryset, search_term):
+        """ILIKE の部分一致ではなく、検索用文書のインデックスで検索する"""
+        if not search_term.strip():
+            return queryset, False
+        return search_news(queryset, search_term), False
+
 
 @admin.register(Menu)
 class MenuAdmin(admin.ModelAdmin):
@@ -25,16 +59,31 @@ class ReviewAdmin(admin.ModelAdmin):
     """レビュー管理画面設定"""
     list_display = ['title', 'user', 'product', 'rating', 'date_posted']
     list_filter = ['rating', 'date_posted']
+    list_select_related = ['user', 'product']
+    autocomplete_fields = ['user', 'product']
     search_fields = ['title', 'content', 'user__username']
     date_hierarchy = 'date_posted'
     ordering = ['-date_posted']
+    # 件数はキャッシュ（大きなテーブルでは推定値）を使い、全件数は数えない
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     """予約管理画面設定"""
     list_display = ['name', 'date', 'time', 'number_of_people', 'phone_number', 'created_at']
-    list_filter = ['date', 'created_at']
+    list_filter = [BookingPeriodFilter, 'created_at']
     search_fields = ['name', 'email', 'phone_number']
-    date_hierarchy = 'date'
     ordering = ['-date', '-time']
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(OutgoingMail)
+class OutgoingMailAdmin(admin.ModelAdmin):
+    """送信メール管理画面設定"""
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status']
+    search_fields = ['subject']
+    ordering = ['-created_at']
@@ -0,0 +1,114 @@
+"""
+予約枠の空き状況
+
+予約カレンダー（datepicker）用に、予約受付期間内の
+日別・枠別の残り席数を集計してキャッシュする。
+スタッフ向けの来店予定表（日別・枠別の予約件数と人数）もここで集計する。
+"""
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from .forms import BookingForm
+from .models import Booking, BookingSlot
+
+CACHE_KEY = 'pages:booking-availability:{}'
+
+
+def get_booking_window(today: date | None = None) -> tuple[date, date]:
+    """予約を受け付ける期間（翌日〜90日後）を返す"""
+    today = today or datetime.now().date()
+    return today + timedelta(days=1), today + timedelta(days=90)
+
+
+def build_availability(today: date | None = None) -> dict:
+    """
+    予約受付期間の空き状況を集計する
+
+    予約枠テーブルを期間で1回だけ検索し、日別・枠別の残り席数を求める。
+    予約のない日は含めない（クライアント側では定員いっぱいの空きとして扱う）。
+    """
+    start, end = get_booking_window(today)
+    capacity = settings.BOOKING_SLOT_CAPACITY
+    slot_times = [value for value, _ in BookingForm.HOURS_CHOICES]
+
+    days = {}
+    rows = (
+        BookingSlot.objects
+        .filter(date__range=(start, end), seats_taken__gt=0)
+        .values_list('date', 'time', 'seats_taken')
+    )
+    for slot_date, slot_time, seats_taken in rows:
+        day = days.setdefault(slot_date.strftime('%Y/%m/%d'), {
+            'remaining': capacity * len(slot_times),
+            'slots': {},
+        })
+        remaining = max(capacity - seats_taken, 0)
+        day['slots'][slot_time.strftime('%H:%M')] = remaining
+        day['remaining'] -= capacity - remaining
+
+    full_days = [key for key, day in days.items() if day['remaining'] <= 0]
+
+    return {
+        'start': start.strftime('%Y/%m/%d'),
+        'end': end.strftime('%Y/%m/%d'),
+        'capacity': capacity,
+        'slots': slot_times,
+        'days': days,
+        'full_days': sorted(full_days),
+    }
+
+
+def get_availability(today: date | None = None) -> tuple[str, str]:
+    """
+    空き状況のJSONとETagを返す
+
+    結果はキャッシュし、予約の作成・変更・削除時に invalidate_availability で破棄する。
+    """
+    today = today or datetime.now().date()
+    key = CACHE_KEY.format(today.isoformat())
+    cached = cache.get(key)
+    if cached is None:
+        body = json.dumps(build_availability(today), ensure_ascii=False, separators=(',', ':'))
+        etag = '"{}"'.format(hashlib.md5(body.encode()).hexdigest())
+        cached = (body, etag)
+        cache.set(key, cached, settings.BOOKING_AVAILABILITY_CACHE_TIMEOUT)
+    return cached
+
+
+def invalidate_availability() -> None:
+    """空き状況のキャッシュを破棄する"""
+    cache.delete(CACHE_KEY.format(datetime.now().date().isoformat()))
+
+
+def build_roster(start: date | None, end: date) -> list[dict]:
+    """
+    期間内の来店予定表を日付・時間順に返す
+
+    (date, time) インデックスを使った1回の集計クエリで、枠ごとの予約件数と人数を求める。
+    予約のない枠は含めない。
+    """
+    capacity = settings.BOOKING_SLOT_CAPACITY
+    queryset = Booking.objects.filter(date__lte=end)
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    rows = (
+        queryset
+        .values('date', 'time')
+        .annotate(bookings=Count('pk'), covers=Sum('number_of_people'))
+        .order_by('date', 'time')
+    )
+
+    days = []
+    for row in rows:
+        if not days or days[-1]['date'] != row['date']:
+            days.append({'date': row['date'], 'bookings': 0, 'covers': 0, 'slots': []})
+        day = days[-1]
+        day['bookings'] += row['bookings']
+        day['covers'] += row['covers']
+        day['slots'].append({**row, 'seats_left': max(capacity - row['covers'], 0)})
+    return days
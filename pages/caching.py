@@ -0,0 +1,49 @@
+"""
+キャッシュの世代管理
+
+データの保存・削除時に名前空間ごとの世代番号を進めることで、
+その名前空間のキャッシュをまとめて無効にする。
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+
+def _new_generation() -> int:
+    """
+    新しい世代番号（ナノ秒単位の現在時刻）
+
+    連番にすると、世代番号のキーだけが追い出された後に以前と同じ番号が再び使われ、
+    残っている古いキャッシュを返してしまうため、過去の値と重ならない値を使う。
+    """
+    return time.time_ns()
+
+
+def get_generation(namespace: str) -> int:
+    """名前空間の世代番号を返す"""
+    return cache.get_or_set(f'pages:generation:{namespace}', _new_generation, None)
+
+
+def bump_generation(namespace: str) -> None:
+    """名前空間の世代番号を進める"""
+    cache.set(f'pages:generation:{namespace}', _new_generation(), None)
+
+
+def _digest(parts) -> str:
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def make_key(namespace: str, *parts) -> str:
+    """世代番号を含むキャッシュキーを作成する"""
+    return f'pages:{namespace}:{get_generation(namespace)}:{_digest(parts)}'
+
+
+async def aget_generation(namespace: str) -> int:
+    """get_generation の非同期版"""
+    return await cache.aget_or_set(f'pages:generation:{namespace}', _new_generation, None)
+
+
+async def amake_key(namespace: str, *parts) -> str:
+    """make_key の非同期版"""
+    return f'pages:{namespace}:{await aget_generation(namespace)}:{_digest(parts)}'
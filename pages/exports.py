@@ -0,0 +1,119 @@
+"""
+予約データのエクスポート（CSV・NDJSON）
+
+サーバーサイドカーソル（QuerySet.iterator）で chunk_size 件ずつ読み出し、
+chunk_size 件ごとにまとめて出力するため、件数に関わらずメモリ使用量は一定になる。
+"""
+import calendar
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+
+from .models import Booking
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+EXPORT_FIELDS = ('id', 'date', 'time', 'name', 'number_of_people', 'phone_number', 'email', 'created_at')
+
+# 期間別予約一覧（BookingDateView）で選択できる期間と表示名
+PERIOD_CHOICES = [
+    ('today', '本日'),
+    ('tomorrow', '明日'),
+    ('this_week', '今週'),
+    ('this_month', '今月'),
+    ('next_month', '来月'),
+    ('past_booking', '過去'),
+]
+PERIODS = tuple(period for period, label in PERIOD_CHOICES)
+
+
+def get_period_range(period: str, today: date, past_days: int | None = None) -> tuple[date | None, date]:
+    """
+    期間の開始日と終了日を返す
+
+    past_booking の開始日は past_days 日前（None の場合は制限せず None）。
+    """
+    if period == 'tomorrow':
+        return today + timedelta(days=1), today + timedelta(days=1)
+    if period == 'this_week':
+        return today, today + timedelta(days=(6 - today.weekday()))
+    if period == 'this_month':
+        return today, today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    if period == 'next_month':
+        start = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return start, start.replace(day=calendar.monthrange(start.year, start.month)[1])
+    if period == 'past_booking':
+        start = today - timedelta(days=past_days) if past_days else None
+        return start, today - timedelta(days=1)
+    return today, today
+
+
+def get_bookings(start: date | None = None, end: date | None = None) -> QuerySet[Booking]:
+    """期間内の予約を日時順に返す（開始日・終了日が None の場合は制限しない）"""
+    queryset = Booking.objects.all()
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    return queryset.order_by('date', 'time', 'pk')
+
+
+# 表計算ソフトで数式として解釈される先頭文字（CSVインジェクション対策）
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _format_value(value, fmt: str) -> str:
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if fmt == 'csv' and isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # 数式として実行されないよう、文字列として扱わせる ' を付ける
+        return f"'{value}"
+    return value
+
+
+def iter_export(queryset: QuerySet[Booking], fmt: str, chunk_size: int):
+    """予約を fmt の形式で chunk_size 件ごとの文字列として返すジェネレーター"""
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+
+    if writer is not None:
+        # Excel で文字化けしないよう BOM を付け、見出しは項目名にする
+        buffer.write('\ufeff')
+        writer.writerow([str(Booking._meta.get_field(name).verbose_name) for name in EXPORT_FIELDS])
+
+    count = 0
+    for row in rows:
+        values = [_format_value(value, fmt) for value in row]
+        if writer is not None:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False) + '\n')
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def aiter_export(blocks):
+    """
+    iter_export の非同期版（ASGIで StreamingHttpResponse に渡す）
+
+    同期のイテレーターをASGIで返すと全件を読み込んでから送信されるため、
+    1ブロックずつ同じスレッド（同じDB接続・カーソル）で読み出す。
+    """
+    blocks = iter(blocks)
+    next_block = sync_to_async(next)
+    while (block := await next_block(blocks, None)) is not None:
+        yield block
@@ -0,0 +1,178 @@
+"""
+ニュースのフィード（RSS・Atom・JSON Feed）
+
+全件とカテゴリーごとのフィードを提供する。描画したフィードは (形式, カテゴリー) ごとに
+キャッシュし、News の保存・削除時に invalidate_feeds で世代番号を進めて破棄する（シグナルから呼び出す）。
+キャッシュがあればクエリもテンプレートの描画も行わずに応答する。
+フィード内の絶対URLはリクエストの Host ヘッダーではなく SITE_URL から作成する
+（Host ヘッダーを変えるだけでキャッシュされない描画やキャッシュの登録を起こせないようにする）。
+"""
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404, HttpRequest, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+
+from .caching import amake_key, bump_generation
+from .models import News
+
+FEED_FORMATS = ('rss', 'atom', 'json')
+JSON_FEED_CONTENT_TYPE = 'application/feed+json; charset=utf-8'
+
+
+def get_categories() -> dict[str, str]:
+    """フィードを提供するカテゴリー（値と表示名）"""
+    return {value: label for value, label in News.Category.choices if value}
+
+
+async def get_feed_key(fmt: str, category: str | None) -> str:
+    return await amake_key('news-feed', fmt, category or 'all')
+
+
+def site_url(path: str) -> str:
+    """SITE_URL を付けた絶対URLを返す"""
+    return f'{settings.SITE_URL}{path}'
+
+
+def get_feed_path(fmt: str, category: str | None) -> str:
+    if category:
+        return reverse('pages:news-category-feed', kwargs={'category': category, 'fmt': fmt})
+    return reverse('pages:news-feed', kwargs={'fmt': fmt})
+
+
+def invalidate_feeds() -> None:
+    """すべてのフィードのキャッシュを破棄する"""
+    bump_generation('news-feed')
+
+
+class NewsRssFeed(Feed):
+    """ニュースのRSSフィード"""
+
+    feed_type = Rss201rev2Feed
+    fmt = 'rss'
+    description = 'CafeAppのお知らせ'
+
+    def get_object(self, request, category=None):
+        if category is not None and category not in get_categories():
+            raise Http404('Category does not exist')
+        return category
+
+    def title(self, category):
+        if category:
+            return f'CafeApp NEWS - {get_categories()[category]}'
+        return 'CafeApp NEWS'
+
+    def link(self, category):
+        if category:
+            return site_url(reverse('pages:news-category', kwargs={'category': category}))
+        return site_url(reverse('pages:news'))
+
+    def feed_url(self, category):
+        return site_url(get_feed_path(self.fmt, category))
+
+    def items(self, category):
+        queryset = News.objects.only('pk', 'category', 'title', 'text', 'created_at')
+        if category:
+            queryset = queryset.filter(category=category)
+        return queryset.order_by('-created_at', '-pk')[:settings.NEWS_FEED_ITEMS]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return site_url(f"{reverse('pages:news-category', kwargs={'category': item.category})}#news-{item.pk}")
+
+    def item_guid(self, item):
+        return f'news-{item.pk}'
+
+    item_guid_is_permalink = False
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_categories(self, item):
+        return [item.get_category_display()]
+
+
+class NewsAtomFeed(NewsRssFeed):
+    """ニュースのAtomフィード"""
+
+    feed_type = Atom1Feed
+    fmt = 'atom'
+    subtitle = NewsRssFeed.description
+
+
+def render_json_feed(request: HttpRequest, category: str | None) -> bytes:
+    """JSON Feed 1.1 を作成する"""
+    feed = NewsRssFeed()
+    category = feed.get_object(request, category)
+    items = [
+        {
+            'id': feed.item_guid(item),
+            'url': feed.item_link(item),
+            'title': item.title,
+            'content_text': item.text,
+            'date_published': item.created_at.isoformat(),
+            'tags': feed.item_categories(item),
+        }
+        for item in feed.items(category)
+    ]
+    return json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed.title(category),
+        'description': feed.description,
+        'home_page_url': feed.link(category),
+        'feed_url': site_url(get_feed_path('json', category)),
+        'items': items,
+    }, ensure_ascii=False).encode()
+
+
+def render_feed(request: HttpRequest, fmt: str, category: str | None) -> dict:
+    """
+    フィードを描画し、キャッシュに保存する内容（本文・Content-Type・ETag）を返す
+
+    Last-Modified は編集では変わらない（created_at のため）ので付与せず、本文の ETag だけで検証する。
+    """
+    if fmt == 'json':
+        content, content_type = render_json_feed(request, category), JSON_FEED_CONTENT_TYPE
+    else:
+        feed = NewsAtomFeed() if fmt == 'atom' else NewsRssFeed()
+        response = feed(request, category=category)
+        content, content_type = response.content, response['Content-Type']
+    return {
+        'content': content,
+        'content_type': content_type,
+        'etag': '"{}"'.format(hashlib.md5(content).hexdigest()),
+    }
+
+
+async def news_feed(request: HttpRequest, fmt: str, category: str | None = None) -> HttpResponse:
+    """
+    ニュースのフィード（/news/feed.<rss|atom|json>、カテゴリー別は /news/category/<category>/feed.<...>）
+
+    絶対URLは SITE_URL から作成するため、リクエストのホスト名によらず同じキーで保存する。
+    """
+    if fmt not in FEED_FORMATS:
+        raise Http404('Unknown feed format')
+
+    key = await get_feed_key(fmt, category)
+    entry = await cache.aget(key)
+    if entry is None:
+        entry = await sync_to_async(render_feed)(request, fmt, category)
+        await cache.aset(key, entry, settings.CONTENT_CACHE_TIMEOUT)
+
+    response = get_conditional_response(request, etag=entry['etag'])
+    if response is None:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    patch_cache_control(response, no_cache=True)
+    return response
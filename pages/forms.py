@@ -96,11 +96,9 @@ class BookingForm(forms.ModelForm):
         
         return date_obj
 
-    def _post_clean(self):
-        """dateフィールドをyyyy/mm/dd形式の文字列として返す"""
-        super()._post_clean()
-        if 'date' in self.cleaned_data:
-            self.cleaned_data['date'] = self.cleaned_data['date'].strftime('%Y/%m/%d')
+    def clean_time(self):
+        """時間を time オブジェクトとして返す（セッションにそのまま保存する）"""
+        return datetime.strptime(self.cleaned_data['time'], '%H:%M').time()
 
 
 class ContactForm(forms.Form):
@@ -0,0 +1,83 @@
+"""
+祝日カレンダー
+
+jpholiday による祝日計算は1日ずつPythonで判定するため、リクエストごとに
+実行すると重い。数年分の祝日をまとめて計算してキャッシュしておき、
+予約カレンダーにはJSON化済みの配列を渡す。
+"""
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import cache
+import jpholiday
+
+CACHE_KEY = 'pages:holiday-calendar:{}'
+
+# プロセス内キャッシュ（日付が変わるまで再利用する）
+_calendar: dict = {}
+
+
+def get_calendar_range(today: date) -> tuple[date, date]:
+    """事前計算する期間（今年の1月1日からHOLIDAY_CALENDAR_YEARS年後の年末まで）"""
+    return date(today.year, 1, 1), date(today.year + settings.HOLIDAY_CALENDAR_YEARS, 12, 31)
+
+
+def build_holiday_calendar(today: date) -> list[date]:
+    """事前計算する期間の祝日を計算する"""
+    start, end = get_calendar_range(today)
+    return sorted(holiday[0] for holiday in jpholiday.between(start, end))
+
+
+def get_holiday_calendar(today: date | None = None) -> list[date]:
+    """
+    祝日の一覧（昇順）を返す
+
+    プロセス内 → キャッシュフレームワーク → jpholiday の順に参照する。
+    """
+    today = today or datetime.now().date()
+    if _calendar.get('day') == today:
+        return _calendar['holidays']
+
+    key = CACHE_KEY.format(today.isoformat())
+    holidays = cache.get(key)
+    if holidays is None:
+        holidays = build_holiday_calendar(today)
+        cache.set(key, holidays, 60 * 60 * 24)
+
+    _calendar.clear()
+    _calendar.update(day=today, holidays=holidays, json={})
+    return holidays
+
+
+def get_holidays(start: date, end: date) -> list[date]:
+    """期間内の祝日を返す"""
+    today = datetime.now().date()
+    holidays = get_holiday_calendar(today)
+    calendar_start, calendar_end = get_calendar_range(today)
+    if start < calendar_start or end > calendar_end:
+        # 事前計算の範囲外は直接計算する
+        return [holiday[0] for holiday in jpholiday.between(start, end)]
+    return holidays[bisect_left(holidays, start):bisect_right(holidays, end)]
+
+
+def get_holidays_json(start: date, end: date) -> str:
+    """期間内の祝日を 'yyyy/mm/dd' 形式のJSON配列として返す"""
+    holidays = get_holidays(start, end)
+    serialized = _calendar.get('json', {})
+    if (start, end) not in serialized:
+        serialized[(start, end)] = json.dumps(
+            [holiday.strftime('%Y/%m/%d') for holiday in holidays]
+        )
+    return serialized[(start, end)]
+
+
+def warm_holiday_calendar(today: date | None = None) -> list[date]:
+    """祝日カレンダーを再計算してキャッシュに保存する"""
+    today = today or datetime.now().date()
+    holidays = build_holiday_calendar(today)
+    cache.set(CACHE_KEY.format(today.isoformat()), holidays, 60 * 60 * 24)
+    _calendar.clear()
+    _calendar.update(day=today, holidays=holidays, json={})
+    return holidays
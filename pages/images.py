@@ -0,0 +1,105 @@
+"""
+画像の派生ファイル（レスポンシブ画像）
+
+アップロードされた画像から幅の異なるWebP/JPEGを生成し、
+テンプレートで srcset として出力できるようにする。
+
+作り直す場合は新しいファイルを別名で生成して img_variants を更新してから、
+参照されなくなった古いファイルを削除する（生成に失敗しても表示中のファイルは残る）。
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# 出力形式ごとの拡張子とMIMEタイプ
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def get_derivative_name(name: str, width: int, fmt: str) -> str:
+    """派生ファイルの保存先（例: menu/derivatives/coffee-640w.webp）"""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    ext = 'jpg' if fmt == 'jpeg' else fmt
+    return os.path.join(directory, 'derivatives', f'{stem}-{width}w.{ext}')
+
+
+def generate_derivatives(name: str, storage=default_storage) -> dict:
+    """
+    画像から派生ファイルを生成して保存する
+
+    元画像より小さい IMAGE_DERIVATIVE_WIDTHS の各幅と元画像の幅について、
+    WebPとJPEGを作成する。戻り値はモデルの img_variants に保存する辞書。
+    """
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        # JPEGは透過に対応しないため白背景で合成する
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.convert('RGBA').split()[-1])
+        image = background
+    elif image.mode == 'L':
+        image = image.convert('RGB')
+
+    widths = sorted({w for w in settings.IMAGE_DERIVATIVE_WIDTHS if w < image.width} | {
+        min(image.width, max(settings.IMAGE_DERIVATIVE_WIDTHS))
+    })
+
+    items = []
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt, (pil_format, _) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(
+                buffer, pil_format,
+                quality=settings.IMAGE_DERIVATIVE_QUALITY,
+                optimize=True,
+                **({'progressive': True} if fmt == 'jpeg' else {}),
+            )
+            # 同名のファイルがある場合（作り直し）は別名で保存され、既存のファイルは上書きしない
+            path = storage.save(get_derivative_name(name, width, fmt), ContentFile(buffer.getvalue()))
+            items.append({'name': path, 'format': fmt, 'width': width, 'height': height})
+
+    return {
+        'source': name,
+        'width': image.width,
+        'height': image.height,
+        'items': items,
+    }
+
+
+def needs_derivatives(field_file, variants: dict) -> bool:
+    """画像が変更・削除され、派生ファイルの更新が必要かどうか"""
+    if not field_file:
+        return bool(variants)
+    return (variants or {}).get('source') != field_file.name
+
+
+def delete_derivatives(variants: dict, keep: dict | None = None, storage=default_storage) -> None:
+    """派生ファイルを削除する（keep の派生ファイルと同じファイルは残す）"""
+    kept = {item['name'] for item in (keep or {}).get('items', [])}
+    for item in (variants or {}).get('items', []):
+        if item['name'] not in kept:
+            storage.delete(item['name'])
+
+
+def replace_derivatives(queryset, name: str, previous: dict, variants: dict) -> bool:
+    """
+    img_variants を新しい派生ファイルに更新し、参照されなくなったファイルを削除する
+
+    更新中に画像が変更された（img が name でなくなった）場合は更新せず、新しいファイルを削除する。
+    """
+    if queryset.filter(img=name).update(img_variants=variants):
+        delete_derivatives(previous, keep=variants)
+        return True
+    delete_derivatives(variants, keep=previous)
+    return False
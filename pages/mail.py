@@ -0,0 +1,163 @@
+"""
+メール送信キュー
+
+リクエスト処理中はOutgoingMailへの登録のみを行い、
+実際のSMTP送信は send_queued_mail コマンド（ワーカー）が非同期に行う。
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingMail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_mail(subject: str, message: str, from_email: str | None,
+                 recipient_list: list[str]) -> OutgoingMail:
+    """
+    メールを送信キューに登録する
+
+    send_mail と同じ引数を受け取り、SMTPサーバーには接続しない。
+    """
+    return OutgoingMail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or '',
+        recipients=list(recipient_list),
+    )
+
+
+async def aenqueue_mail(subject: str, message: str, from_email: str | None,
+                        recipient_list: list[str]) -> OutgoingMail:
+    """enqueue_mail の非同期版（非同期ビューから使用する）"""
+    return await OutgoingMail.objects.acreate(
+        subject=subject,
+        body=message,
+        from_email=from_email or '',
+        recipients=list(recipient_list),
+    )
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    """試行回数に応じた再送までの待ち時間（指数バックオフ）"""
+    base = settings.MAIL_QUEUE_RETRY_DELAY
+    return timedelta(seconds=base * (2 ** max(attempts - 1, 0)))
+
+
+def claim_queued_mail(batch_size: int, max_attempts: int) -> tuple[list[OutgoingMail], int]:
+    """
+    送信時刻を迎えたメールを送信中（sending）にして取得する
+
+    短いトランザクションでロックして状態を更新し、SMTP送信中はロックを保持しない。
+    送信中のメールの next_attempt_at はリースの期限で、期限までに結果が記録されなければ
+    （ワーカーが停止した場合など）他のワーカーが再び取得する。
+    試行回数は取得時に数え、リース切れで最大試行回数に達したメールは failed にする。
+    戻り値は（取得したメール, failed にした件数）
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=settings.MAIL_QUEUE_LEASE)
+    with transaction.atomic():
+        expired = OutgoingMail.objects.filter(
+            status=OutgoingMail.Status.SENDING,
+            next_attempt_at__lte=now,
+        )
+        failed = expired.filter(attempts__gte=max_attempts).update(
+            status=OutgoingMail.Status.FAILED,
+            last_error='送信中に処理が中断されました',
+        )
+
+        # 複数ワーカーが同じメールを取得しないようにロックする
+        mails = list(
+            OutgoingMail.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutgoingMail.Status.PENDING, OutgoingMail.Status.SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if mails:
+            OutgoingMail.objects.filter(pk__in=[mail.pk for mail in mails]).update(
+                status=OutgoingMail.Status.SENDING,
+                attempts=F('attempts') + 1,
+                next_attempt_at=lease_until,
+            )
+    for mail in mails:
+        mail.status = OutgoingMail.Status.SENDING
+        mail.attempts += 1
+        mail.next_attempt_at = lease_until
+    return mails, failed
+
+
+def send_queued_mail(batch_size: int | None = None) -> dict[str, int]:
+    """
+    送信時刻を迎えたメールをまとめて送信する
+
+    1バッチにつきSMTP接続は1本だけ開き、全メッセージで使い回す。
+    メールは claim_queued_mail で取得してからトランザクションの外で送信し、
+    結果は1通ごとに保存する（途中で停止しても、送信済みのメールは再送しない）。
+    送信に失敗したメールはバックオフ後に再送し、
+    MAIL_QUEUE_MAX_ATTEMPTS 回失敗したものは failed にする。
+    """
+    batch_size = batch_size or settings.MAIL_QUEUE_BATCH_SIZE
+    max_attempts = settings.MAIL_QUEUE_MAX_ATTEMPTS
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    mails, result['failed'] = claim_queued_mail(batch_size, max_attempts)
+    if not mails:
+        return result
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # 接続自体に失敗した場合はバッチ全体を再送対象にする
+        logger.warning('SMTP接続エラー: %s', e)
+        for mail in mails:
+            _mark_failure(mail, e, max_attempts, result)
+        return result
+
+    try:
+        for mail in mails:
+            message = EmailMessage(
+                mail.subject,
+                mail.body,
+                mail.from_email or None,
+                mail.recipients,
+                connection=connection,
+            )
+            try:
+                message.send(fail_silently=False)
+            except Exception as e:
+                logger.warning('メール送信エラー (id=%s): %s', mail.id, e)
+                _mark_failure(mail, e, max_attempts, result)
+            else:
+                mail.status = OutgoingMail.Status.SENT
+                mail.sent_at = timezone.now()
+                mail.last_error = ''
+                mail.save(update_fields=['status', 'sent_at', 'last_error'])
+                result['sent'] += 1
+    finally:
+        connection.close()
+
+    return result
+
+
+def _mark_failure(mail: OutgoingMail, error: Exception, max_attempts: int,
+                  result: dict[str, int]) -> None:
+    """送信失敗を記録し、再送予定または失敗として保存する（試行回数は取得時に数えている）"""
+    mail.last_error = str(error)
+    if mail.attempts >= max_attempts:
+        mail.status = OutgoingMail.Status.FAILED
+        result['failed'] += 1
+    else:
+        mail.status = OutgoingMail.Status.PENDING
+        mail.next_attempt_at = timezone.now() + get_retry_delay(mail.attempts)
+        result['retried'] += 1
+    mail.save(update_fields=['status', 'last_error', 'next_attempt_at'])
@@ -0,0 +1,120 @@
+import http.cookiejar
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.forms import BookingForm
+from pages.models import Booking, OutgoingMail
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+BENCHMARK_NAME = 'ベンチマーク'
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent visitors through the booking funnel (form, confirm, complete) against a running server. '
+        'Run it once against a WSGI (gthread) and once against an ASGI (uvicorn) server to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='Server URL (e.g. http://localhost:8000)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent visitors')
+        parser.add_argument('--visitors', type=int, default=200, help='Total number of funnel runs')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the benchmark bookings (they are deleted from the configured database by default)',
+        )
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        total = options['visitors']
+        counter = iter(range(total))
+        lock = threading.Lock()
+        durations = []
+        errors = []
+        # 予約枠が満席にならないよう、遠い将来の日付と時間に分散させる
+        slots = [value for value, _ in BookingForm.HOURS_CHOICES]
+        start = date.today() + timedelta(days=3650)
+
+        def visitor():
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                day = start + timedelta(days=index // len(slots))
+                started = time.perf_counter()
+                try:
+                    self.run_funnel(base_url, day, slots[index % len(slots)])
+                except (urllib.error.URLError, OSError, CommandError) as e:
+                    errors.append(e)
+                    continue
+                durations.append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=visitor) for _ in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if not options['keep']:
+            self.cleanup(start)
+
+        if not durations:
+            raise CommandError(f'All funnel runs failed: {errors[0] if errors else "no runs"}')
+        durations.sort()
+        quantiles = statistics.quantiles(durations, n=100) if len(durations) > 1 else durations * 99
+        self.stdout.write(f'funnels:     {len(durations)} ok, {len(errors)} failed')
+        self.stdout.write(f'throughput:  {len(durations) / elapsed:.1f} funnels/s ({len(durations) * 5 / elapsed:.1f} req/s)')
+        self.stdout.write(
+            f'funnel ms:   p50={quantiles[49] * 1000:.1f} p95={quantiles[94] * 1000:.1f} '
+            f'max={durations[-1] * 1000:.1f}'
+        )
+
+    def run_funnel(self, base_url, day, slot):
+        """予約フォーム → 確認 → 完了 の5リクエスト（リダイレクトを含む）を1人の訪問者として送る"""
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+        def request(path, data=None, referer=None):
+            headers = {'Referer': referer} if referer else {}
+            body = urllib.parse.urlencode(data).encode() if data is not None else None
+            with opener.open(urllib.request.Request(base_url + path, body, headers), timeout=30) as response:
+                return response.geturl(), response.read().decode()
+
+        booking_url = base_url + '/booking/'
+        _, html = request('/booking/')
+        url, html = request('/booking/', {
+            'csrfmiddlewaretoken': self.csrf_token(html),
+            'name': BENCHMARK_NAME,
+            'date': day.strftime('%Y/%m/%d'),
+            'time': slot,
+            'email': 'benchmark@example.invalid',
+            'phone_number': '0312345678',
+            'number_of_people': 1,
+        }, referer=booking_url)
+        if '/booking/confirm/' not in url:
+            raise CommandError('Booking form was rejected')
+        url, _ = request('/booking/confirm/', {'csrfmiddlewaretoken': self.csrf_token(html)}, referer=url)
+        if '/booking/complete/' not in url:
+            raise CommandError('Booking was not confirmed')
+
+    def csrf_token(self, html):
+        match = CSRF_TOKEN.search(html)
+        if match is None:
+            raise CommandError('CSRF token not found')
+        return match.group(1)
+
+    def cleanup(self, start):
+        """ベンチマークで作成した予約を削除する"""
+        deleted, _ = Booking.objects.filter(name=BENCHMARK_NAME, date__gte=start).delete()
+        OutgoingMail.objects.filter(body__contains=f'ご予約者様: {BENCHMARK_NAME}').delete()
+        self.stdout.write(f'Deleted {deleted} benchmark bookings')
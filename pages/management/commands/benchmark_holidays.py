@@ -0,0 +1,31 @@
+import timeit
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+import jpholiday
+
+from pages.holidays import get_holidays_json, warm_holiday_calendar
+
+
+class Command(BaseCommand):
+    help = 'Compare the cached holiday calendar with calling jpholiday.between per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=200, help='Iterations per measurement')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        today = datetime.now().date()
+        end = today + timedelta(days=90)
+        warm_holiday_calendar()
+
+        def direct():
+            # 従来のBookingViewと同じ処理
+            return [holiday[0] for holiday in jpholiday.between(today, end)]
+
+        def cached():
+            return get_holidays_json(today, end)
+
+        for label, func in (('jpholiday.between', direct), ('holiday calendar', cached)):
+            seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+            self.stdout.write(f'{label:<20} {seconds * 1e6:10.1f} us/request')
@@ -0,0 +1,89 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from pages.models import News
+from pages.search import build_search_document, search_news
+
+# 本文の生成に使う語句（検索語にも使う）
+WORDS = [
+    'コーヒー', '紅茶', '抹茶', 'ラテ', 'ケーキ', 'チーズケーキ', 'パンケーキ', 'スコーン', '季節', '限定',
+    '新メニュー', 'オーガニック', '無添加', '自家焙煎', 'ブレンド', 'イベント', '営業時間', '定休日', '予約',
+    '貸切', 'ランチ', 'モーニング', 'テイクアウト', '秋', '冬', '春', '夏', 'いちご', 'かぼちゃ', '栗',
+]
+QUERIES = ['抹茶', '期間限定', '自家焙煎 ブレンド', 'チーズケーキ', '栗']
+
+
+class Command(BaseCommand):
+    help = 'Compare ILIKE search (NewsAdmin search_fields) with the indexed news search over seeded rows (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Number of news articles to seed')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--query', action='append', help=f'Search terms (default: {", ".join(QUERIES)})')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['rows'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE pages_news')
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'{connection.vendor}: the search falls back to LIKE on the bigram document (no GIN index)'
+                ))
+
+            self.stdout.write(f'{"query":<20} {"hits":>8} {"ilike (ms)":>12} {"search (ms)":>12}')
+            for query in options['query'] or QUERIES:
+                ilike = self.ilike(query)
+                search = search_news(News.objects.all(), query)
+                hits = search.count()
+                ilike_ms = self.measure(lambda: list(ilike[:10]), options['repeat'])
+                search_ms = self.measure(lambda: list(search[:10]), options['repeat'])
+                self.stdout.write(f'{query:<20} {hits:>8} {ilike_ms:>12.2f} {search_ms:>12.2f}')
+
+            transaction.set_rollback(True)
+
+    def ilike(self, query):
+        """管理画面の search_fields と同じ条件（語ごとに title または text の部分一致）"""
+        condition = Q()
+        for word in query.split():
+            condition &= Q(title__icontains=word) | Q(text__icontains=word)
+        return News.objects.filter(condition).order_by('-created_at', '-pk')
+
+    def seed(self, rows):
+        self.stdout.write(f'Seeding {rows} news articles...')
+        rng = random.Random(0)
+        now = timezone.now()
+        categories = [value for value, _ in News.Category.choices if value]
+        batch = []
+        for i in range(rows):
+            title = f'{rng.choice(WORDS)}のお知らせ{i}'
+            text = '。'.join(
+                f'{rng.choice(WORDS)}と{rng.choice(WORDS)}の{rng.choice(WORDS)}をご用意しました'
+                for _ in range(rng.randint(3, 12))
+            )
+            batch.append(News(
+                category=categories[i % len(categories)],
+                title=title,
+                text=text,
+                search_document=build_search_document(title, text),
+                created_at=now - timedelta(seconds=i),
+            ))
+            if len(batch) == 5000:
+                News.objects.bulk_create(batch)
+                batch = []
+        News.objects.bulk_create(batch)
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
@@ -0,0 +1,83 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils import timezone
+
+from pages.models import Booking
+from pages.pagination import KeysetPaginator, invalidate_counts
+
+
+class Command(BaseCommand):
+    help = 'Compare OFFSET and keyset pagination over a seeded Booking table (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Number of bookings to seed (e.g. 1000000)')
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, per_page = options['rows'], options['per_page']
+
+        with transaction.atomic():
+            self.seed(rows)
+            queryset = Booking.objects.order_by('-created_at', '-pk')
+            last_page = max(rows // per_page, 1)
+            depths = sorted(n for n in {1, 10, 100, last_page // 10, last_page // 2, last_page} if 0 < n <= last_page)
+
+            self.stdout.write(f'{"page":>10} {"offset (ms)":>12} {"keyset (ms)":>12}')
+            for number in depths:
+                offset_ms = self.measure(
+                    lambda: list(Paginator(queryset, per_page).page(number).object_list),
+                    options['repeat'],
+                )
+                cursor = self.cursor_for(queryset, per_page, number)
+                keyset_ms = self.measure(
+                    lambda: KeysetPaginator(queryset, per_page).page(cursor).object_list,
+                    options['repeat'],
+                )
+                self.stdout.write(f'{number:>10} {offset_ms:>12.2f} {keyset_ms:>12.2f}')
+
+            transaction.set_rollback(True)
+        # ロールバックした件数がキャッシュに残らないようにする
+        invalidate_counts(Booking)
+
+    def seed(self, rows):
+        self.stdout.write(f'Seeding {rows} bookings...')
+        now = timezone.now()
+        start = date.today()
+        batch = []
+        for i in range(rows):
+            batch.append(Booking(
+                name=f'ゲスト{i}',
+                date=start + timedelta(days=i % 365),
+                time='12:00',
+                email='guest@example.com',
+                phone_number='0312345678',
+                number_of_people=1 + i % 4,
+                created_at=now - timedelta(seconds=i),
+            ))
+            if len(batch) == 10_000:
+                Booking.objects.bulk_create(batch)
+                batch = []
+        Booking.objects.bulk_create(batch)
+
+    def cursor_for(self, queryset, per_page, number):
+        """指定ページのカーソルを作成する（計測対象外）"""
+        paginator = KeysetPaginator(queryset, per_page)
+        if number == 1:
+            return None
+        key = queryset.values_list('created_at', 'pk')[(number - 1) * per_page - 1]
+        return paginator.encode_cursor(number, 'next', key)
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            # 件数キャッシュの影響を除く（セッション等の他のキャッシュは消さない）
+            invalidate_counts(Booking)
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pages.exports import EXPORT_FORMATS, PERIODS, get_bookings, get_period_range, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream bookings as CSV or NDJSON for a period (same as the booking list) or a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--period', choices=PERIODS, help='Period of the booking list (e.g. today, next_month)')
+        parser.add_argument('--start', type=date.fromisoformat, help='First date (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last date (YYYY-MM-DD)')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Rows fetched per round trip (default: BOOKING_EXPORT_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        if options['period'] and (options['start'] or options['end']):
+            raise CommandError('Use either --period or --start/--end.')
+        if options['period']:
+            start, end = get_period_range(options['period'], timezone.localdate())
+        else:
+            start, end = options['start'], options['end']
+
+        blocks = iter_export(
+            get_bookings(start, end), options['format'],
+            options['chunk_size'] or settings.BOOKING_EXPORT_CHUNK_SIZE,
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(blocks)
+        else:
+            for block in blocks:
+                self.stdout.write(block, ending='')
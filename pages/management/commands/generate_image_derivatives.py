@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from pages.caching import bump_generation
+from pages.images import generate_derivatives, needs_derivatives, replace_derivatives
+from pages.models import Menu, News
+
+MODELS = {'menu': Menu, 'news': News}
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate responsive image derivatives for Menu and News images that are missing or outdated '
+        '(uploads are processed here, not in the request worker)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that are already up to date')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new or changed images instead of exiting after one pass',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to wait between polls when there is nothing to do (with --loop)',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        while True:
+            jobs = self.find_jobs(force)
+            if jobs:
+                done = self.generate(jobs, options['workers'])
+                self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {done}/{len(jobs)} images'))
+            elif not options['loop']:
+                self.stdout.write(self.style.SUCCESS('All derivatives are up to date'))
+
+            if not options['loop']:
+                break
+            # --force は最初の1回のみ
+            force = False
+            if not jobs:
+                time.sleep(options['interval'])
+
+    def find_jobs(self, force: bool) -> list[tuple]:
+        jobs = []
+        for namespace, model in MODELS.items():
+            for pk, name, variants in model.objects.exclude(img='').exclude(img__isnull=True).values_list(
+                'pk', 'img', 'img_variants'
+            ).iterator():
+                field_file = model(img=name).img
+                if force or needs_derivatives(field_file, variants):
+                    # 古い派生ファイルは新しいファイルに切り替えてから削除する
+                    jobs.append((namespace, pk, name, variants))
+        return jobs
+
+    def generate(self, jobs: list[tuple], workers: int | None) -> int:
+        # 子プロセスにDB接続を引き継がないように閉じておく
+        for connection in connections.all(initialized_only=True):
+            if not connection.in_atomic_block:
+                connection.close()
+
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(generate_derivatives, job[2]): job for job in jobs}
+            for future in as_completed(futures):
+                namespace, pk, name, previous = futures[future]
+                try:
+                    variants = future.result()
+                except OSError as e:
+                    # 現在の派生ファイルはそのまま使用する
+                    self.stderr.write(f'{name}: {e}')
+                    continue
+                if replace_derivatives(MODELS[namespace].objects.filter(pk=pk), name, previous, variants):
+                    done += 1
+
+        for namespace in {job[0] for job in jobs}:
+            bump_generation(namespace)
+        return done
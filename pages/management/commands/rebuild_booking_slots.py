@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pages.availability import invalidate_availability
+from pages.models import BookingSlot
+
+
+class Command(BaseCommand):
+    help = 'Recompute BookingSlot seat counters from the Booking table'
+
+    def handle(self, *args, **options):
+        # 枠をロックし、1回のUPDATE（予約の合計の相関サブクエリ）で再計算する
+        rebuilt = BookingSlot.objects.rebuild()
+        invalidate_availability()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} booking slots'))
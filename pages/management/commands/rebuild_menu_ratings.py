@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pages.caching import bump_generation
+from pages.models import MenuRating
+
+
+class Command(BaseCommand):
+    help = 'Recompute MenuRating review counts, rating sums and star histograms from the Review table'
+
+    def handle(self, *args, **options):
+        # 1回の集計クエリ（メニューごとの GROUP BY）で再計算する
+        rebuilt = MenuRating.objects.rebuild()
+        bump_generation('menu')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {rebuilt} menus'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Send queued outgoing mail in batches over a single SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Maximum number of messages sent per batch (default: MAIL_QUEUE_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the queue instead of exiting after one batch',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to wait between polls when the queue is empty (with --loop)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = send_queued_mail(batch_size=options['batch_size'])
+            if any(result.values()):
+                self.stdout.write(self.style.SUCCESS(
+                    f"sent={result['sent']} retried={result['retried']} failed={result['failed']}"
+                ))
+
+            if not options['loop']:
+                break
+            # 送信するメールがあった場合は続けて次のバッチを処理する
+            if not result['sent']:
+                time.sleep(options['interval'])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from pages.holidays import warm_holiday_calendar
+
+
+class Command(BaseCommand):
+    help = 'Precompute the holiday calendar and store it in the cache'
+
+    def handle(self, *args, **options):
+        holidays = warm_holiday_calendar()
+        self.stdout.write(self.style.SUCCESS(
+            f'Cached {len(holidays)} holidays ({holidays[0]} .. {holidays[-1]})'
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingMail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='件名')),
+                ('body', models.TextField(verbose_name='本文')),
+                ('from_email', models.CharField(blank=True, max_length=254, verbose_name='送信元')),
+                ('recipients', models.JSONField(default=list, verbose_name='宛先')),
+                ('status', models.CharField(choices=[('pending', '送信待ち'), ('sent', '送信済み'), ('failed', '送信失敗')], default='pending', max_length=10, verbose_name='ステータス')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='試行回数')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='次回送信日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='最終エラー')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='作成日時')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='送信日時')),
+            ],
+            options={
+                'verbose_name': '送信メール',
+                'verbose_name_plural': '送信メール',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='pages_outgo_status_a6556c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:16
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_booking_slots(apps, schema_editor):
+    """
+    既存の予約から予約枠の席数を集計する
+
+    アプリのコードが変わってもマイグレーションの結果が変わらないよう、履歴モデルのみで集計する。
+    テーブルは同じマイグレーションで作成するため、他の予約と競合せずロックは不要。
+    """
+    Booking = apps.get_model('pages', 'Booking')
+    BookingSlot = apps.get_model('pages', 'BookingSlot')
+    bookings = Booking.objects.order_by()
+    seats = (
+        bookings
+        .filter(date=OuterRef('date'), time=OuterRef('time'))
+        .values('date', 'time')
+        .annotate(total=Sum('number_of_people'))
+        .values('total')
+    )
+    BookingSlot.objects.bulk_create(
+        [BookingSlot(date=row['date'], time=row['time']) for row in bookings.values('date', 'time').distinct()],
+        batch_size=1000,
+    )
+    BookingSlot.objects.update(seats_taken=Coalesce(Subquery(seats), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0002_outgoingmail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('time', models.TimeField(verbose_name='時間')),
+                ('seats_taken', models.PositiveIntegerField(default=0, verbose_name='予約済み席数')),
+            ],
+            options={
+                'verbose_name': '予約枠',
+                'verbose_name_plural': '予約枠',
+                'ordering': ['date', 'time'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'time'), name='unique_booking_slot')],
+            },
+        ),
+        migrations.RunPython(populate_booking_slots, migrations.RunPython.noop),
+    ]
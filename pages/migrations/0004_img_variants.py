@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0003_bookingslot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menu',
+            name='img_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='画像派生ファイル'),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='img_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='画像派生ファイル'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.15 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_menu_ratings(apps, schema_editor):
+    """既存のレビューからメニューの評価を集計する"""
+    Review = apps.get_model('pages', 'Review')
+    MenuRating = apps.get_model('pages', 'MenuRating')
+    totals = (
+        Review.objects.order_by()
+        .values('product_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+        )
+    )
+    MenuRating.objects.bulk_create(
+        [
+            MenuRating(
+                menu_id=row['product_id'],
+                review_count=row['count'],
+                rating_sum=row['total'],
+                **{f'stars_{star}': row[f'stars_{star}'] for star in range(1, 6)},
+            )
+            for row in totals
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0004_img_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuRating',
+            fields=[
+                ('menu', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='pages.menu', verbose_name='メニュー')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='レビュー数')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='評価の合計')),
+                ('stars_1', models.PositiveIntegerField(default=0, verbose_name='★1')),
+                ('stars_2', models.PositiveIntegerField(default=0, verbose_name='★2')),
+                ('stars_3', models.PositiveIntegerField(default=0, verbose_name='★3')),
+                ('stars_4', models.PositiveIntegerField(default=0, verbose_name='★4')),
+                ('stars_5', models.PositiveIntegerField(default=0, verbose_name='★5')),
+            ],
+            options={
+                'verbose_name': 'メニューの評価',
+                'verbose_name_plural': 'メニューの評価',
+            },
+        ),
+        migrations.RunPython(populate_menu_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:05
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# 作成時点の pages.search の分割方法（アプリのコードを変更してもこのマイグレーションの結果は変わらない）
+TOKEN_RUN = re.compile(r'[0-9a-z]+|[^\W0-9a-z_]+')
+
+
+def build_search_document(*fields):
+    """検索用の文書（英数字は単語、それ以外はバイグラムを空白で区切ったもの）"""
+    tokens = []
+    for field in fields:
+        for run in TOKEN_RUN.findall(unicodedata.normalize('NFKC', field or '').lower()):
+            if run.isascii() or len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return ' '.join(tokens)
+
+
+def populate_search_documents(apps, schema_editor):
+    """既存のニュースの検索用文書を作成する"""
+    News = apps.get_model('pages', 'News')
+    batch = []
+    for news in News.objects.only('pk', 'title', 'text').iterator(chunk_size=1000):
+        news.search_document = build_search_document(news.title, news.text)
+        batch.append(news)
+        if len(batch) == 1000:
+            News.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    News.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    """
+    検索用文書のGINインデックスを作成する（PostgreSQLのみ）
+
+    式は検索（pages.search.search_vector_sql）と一致させる（一致しない場合はインデックスが使われない）。
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX pages_news_search_gin ON pages_news "
+            "USING gin (to_tsvector('simple', search_document));"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS pages_news_search_gin;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0005_menurating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='検索用文書'),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0006_news_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-date_posted'], name='pages_revie_date_po_a1e96d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['rating', '-date_posted'], name='pages_revie_rating_4e1437_idx'),
+        ),
+    ]
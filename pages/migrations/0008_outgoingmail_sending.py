@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0007_review_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outgoingmail',
+            name='status',
+            field=models.CharField(choices=[('pending', '送信待ち'), ('sending', '送信中'), ('sent', '送信済み'), ('failed', '送信失敗')], default='pending', max_length=10, verbose_name='ステータス'),
+        ),
+    ]
@@ -1,8 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .search import build_search_document
+
 
 class News(models.Model):
     """ニュース記事モデル"""
@@ -39,10 +44,22 @@ class News(models.Model):
         blank=True,
         verbose_name='画像タイトル'
     )
+    img_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='画像派生ファイル'
+    )
     created_at = models.DateTimeField(
         default=timezone.now,
         verbose_name='作成日時'
     )
+    search_document = models.TextField(
+        default='',
+        blank=True,
+        editable=False,
+        verbose_name='検索用文書'
+    )
     
     class Meta:
         ordering = ['-created_at']
@@ -56,6 +73,14 @@ class News(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """タイトル・本文から検索用文書を作成してから保存する"""
+        self.search_document = build_search_document(self.title, self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'title', 'text'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'search_document'}
+        super().save(*args, **kwargs)
+
 
 class Menu(models.Model):
     """メニューモデル"""
@@ -72,6 +97,12 @@ class Menu(models.Model):
         max_length=50,
         verbose_name='画像タイトル'
     )
+    img_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='画像派生ファイル'
+    )
     price = models.IntegerField(
         validators=[MinValueValidator(0)],
         verbose_name='値段(円)'
@@ -126,10 +157,226 @@ class Review(models.Model):
         ordering = ['-date_posted']
         verbose_name = 'レビュー'
         verbose_name_plural = 'レビュー'
+        indexes = [
+            models.Index(fields=['-date_posted']),
+            models.Index(fields=['rating', '-date_posted']),
+        ]
 
     def __str__(self):
         return f'{self.title} - {self.user.username}'
 
+    def save(self, *args, **kwargs):
+        """メニューの評価の集計を更新してから保存する"""
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding and self.pk:
+                previous = (
+                    Review.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('product_id', 'rating')
+                    .first()
+                )
+            current = (self.product_id, self.rating)
+            if previous != current:
+                if previous:
+                    MenuRating.objects.remove(*previous)
+                MenuRating.objects.add(*current)
+            super().save(*args, **kwargs)
+
+
+class MenuRatingManager(models.Manager):
+    """メニューの評価の集計を原子的に更新するマネージャー"""
+
+    def add(self, menu_id, rating: int) -> None:
+        """レビュー1件分を集計に加える"""
+        # 集計の行がなければ作成する（同時作成は一意制約で無視される）
+        self.bulk_create([self.model(menu_id=menu_id)], ignore_conflicts=True)
+        self.filter(menu_id=menu_id).update(**{
+            'review_count': F('review_count') + 1,
+            'rating_sum': F('rating_sum') + rating,
+            f'stars_{rating}': F(f'stars_{rating}') + 1,
+        })
+
+    def remove(self, menu_id, rating: int) -> None:
+        """レビュー1件分を集計から除く"""
+        self.filter(menu_id=menu_id, review_count__gte=1, **{f'stars_{rating}__gte': 1}).update(**{
+            'review_count': F('review_count') - 1,
+            'rating_sum': F('rating_sum') - rating,
+            f'stars_{rating}': F(f'stars_{rating}') - 1,
+        })
+
+    def rebuild(self) -> int:
+        """レビューから集計を作り直し、作成した行数を返す"""
+        totals = (
+            Review.objects
+            .order_by()
+            .values('product_id')
+            .annotate(
+                count=Count('id'),
+                total=Sum('rating'),
+                **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+            )
+        )
+        ratings = [
+            self.model(
+                menu_id=row['product_id'],
+                review_count=row['count'],
+                rating_sum=row['total'],
+                **{f'stars_{star}': row[f'stars_{star}'] for star in range(1, 6)},
+            )
+            for row in totals
+        ]
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(ratings, batch_size=1000)
+        return len(ratings)
+
+
+class MenuRating(models.Model):
+    """メニューごとの評価の集計（レビューの件数・合計・星ごとの件数）"""
+
+    menu = models.OneToOneField(
+        Menu,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating',
+        verbose_name='メニュー'
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='レビュー数'
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        verbose_name='評価の合計'
+    )
+    stars_1 = models.PositiveIntegerField(default=0, verbose_name='★1')
+    stars_2 = models.PositiveIntegerField(default=0, verbose_name='★2')
+    stars_3 = models.PositiveIntegerField(default=0, verbose_name='★3')
+    stars_4 = models.PositiveIntegerField(default=0, verbose_name='★4')
+    stars_5 = models.PositiveIntegerField(default=0, verbose_name='★5')
+
+    objects = MenuRatingManager()
+
+    class Meta:
+        verbose_name = 'メニューの評価'
+        verbose_name_plural = 'メニューの評価'
+
+    def __str__(self):
+        return f'{self.menu_id} ({self.review_count}件)'
+
+    @property
+    def average(self) -> float | None:
+        """平均評価（レビューがない場合は None）"""
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 1)
+
+    @property
+    def histogram(self) -> dict[int, int]:
+        """星の数ごとのレビュー数"""
+        return {star: getattr(self, f'stars_{star}') for star in range(1, 6)}
+
+
+class SlotFullError(Exception):
+    """予約枠の席数が足りない場合に送出される例外"""
+
+
+class BookingSlotManager(models.Manager):
+    """予約枠の席数を原子的に更新するマネージャー"""
+
+    def seats_left(self, date, time) -> int:
+        """指定した枠の残り席数を返す（主キー相当の一意インデックスで1行参照）"""
+        seats_taken = (
+            self.filter(date=date, time=time)
+            .values_list('seats_taken', flat=True)
+            .first()
+        ) or 0
+        return max(settings.BOOKING_SLOT_CAPACITY - seats_taken, 0)
+
+    def reserve(self, date, time, seats: int) -> None:
+        """
+        枠に席を確保する
+
+        条件付きUPDATE（seats_taken + seats <= 定員 の場合のみ加算）で
+        確認と更新を1文で行うため、同時に予約されても定員を超えない。
+        """
+        # 枠の行がなければ作成する（同時作成は一意制約で無視される）
+        self.bulk_create(
+            [self.model(date=date, time=time, seats_taken=0)],
+            ignore_conflicts=True,
+        )
+        updated = self.filter(
+            date=date,
+            time=time,
+            seats_taken__lte=settings.BOOKING_SLOT_CAPACITY - seats,
+        ).update(seats_taken=F('seats_taken') + seats)
+        if not updated:
+            raise SlotFullError(f'{date} {time} の予約枠は満席です。')
+
+    def release(self, date, time, seats: int) -> None:
+        """枠の席を解放する"""
+        self.filter(
+            date=date, time=time, seats_taken__gte=seats
+        ).update(seats_taken=F('seats_taken') - seats)
+
+    def rebuild(self) -> int:
+        """
+        予約から席数を集計し直し、更新した枠の数を返す
+
+        予約のない枠を作成してから全ての枠をロックし、予約済みの席数を
+        1文のUPDATE（SET seats_taken = (SELECT SUM ...)）で再計算する。
+        ロック中は同じ枠への予約（reserve の条件付きUPDATE）が待たされるため、
+        集計中に確定した予約の席数が失われない。
+        """
+        bookings = Booking.objects.order_by()
+        with transaction.atomic():
+            self.bulk_create(
+                [
+                    self.model(date=row['date'], time=row['time'], seats_taken=0)
+                    for row in bookings.values('date', 'time').distinct()
+                ],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+            list(self.select_for_update().values_list('pk', flat=True))
+            seats = (
+                bookings
+                .filter(date=OuterRef('date'), time=OuterRef('time'))
+                .values('date', 'time')
+                .annotate(total=Sum('number_of_people'))
+                .values('total')
+            )
+            return self.update(seats_taken=Coalesce(Subquery(seats), 0))
+
+
+class BookingSlot(models.Model):
+    """予約枠モデル（日付・時間ごとの予約済み席数）"""
+
+    date = models.DateField(
+        verbose_name='日付'
+    )
+    time = models.TimeField(
+        verbose_name='時間'
+    )
+    seats_taken = models.PositiveIntegerField(
+        default=0,
+        verbose_name='予約済み席数'
+    )
+
+    objects = BookingSlotManager()
+
+    class Meta:
+        ordering = ['date', 'time']
+        verbose_name = '予約枠'
+        verbose_name_plural = '予約枠'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time'], name='unique_booking_slot'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.time} ({self.seats_taken}席)'
+
 
 class Booking(models.Model):
     """予約モデル"""
@@ -174,3 +421,101 @@ class Booking(models.Model):
 
     def __str__(self):
         return f'{self.name} - {self.date} {self.time}'
+
+    def clean(self):
+        """予約枠の空き状況を確認する（確定時は save で改めて原子的に確認）"""
+        if self.date is None or self.time is None or not self.number_of_people:
+            return
+        seats_left = BookingSlot.objects.seats_left(self.date, self.time)
+        if not self._state.adding and self.pk:
+            previous = Booking.objects.filter(pk=self.pk).values('date', 'time', 'number_of_people').first()
+            if previous and (previous['date'], previous['time']) == (self.date, self.time):
+                seats_left += previous['number_of_people']
+        if self.number_of_people > seats_left:
+            raise ValidationError(
+                f'ご指定の日時は残り{seats_left}席のため予約できません。別の日時を選択してください。'
+            )
+
+    def save(self, *args, **kwargs):
+        """予約枠の席数を更新してから保存する"""
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding and self.pk:
+                previous = (
+                    Booking.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('date', 'time', 'number_of_people')
+                    .first()
+                )
+            current = (self.date, self.time, self.number_of_people)
+            if previous != current:
+                if previous:
+                    BookingSlot.objects.release(*previous)
+                BookingSlot.objects.reserve(*current)
+            super().save(*args, **kwargs)
+
+
+class OutgoingMail(models.Model):
+    """送信待ちメールモデル（アウトボックス）"""
+
+    class Status(models.TextChoices):
+        """送信ステータス"""
+        PENDING = 'pending', '送信待ち'
+        SENDING = 'sending', '送信中'
+        SENT = 'sent', '送信済み'
+        FAILED = 'failed', '送信失敗'
+
+    subject = models.CharField(
+        max_length=255,
+        verbose_name='件名'
+    )
+    body = models.TextField(
+        verbose_name='本文'
+    )
+    from_email = models.CharField(
+        max_length=254,
+        blank=True,
+        verbose_name='送信元'
+    )
+    recipients = models.JSONField(
+        default=list,
+        verbose_name='宛先'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='ステータス'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='試行回数'
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='次回送信日時'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='最終エラー'
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='作成日時'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='送信日時'
+    )
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = '送信メール'
+        verbose_name_plural = '送信メール'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} ({self.get_status_display()})'
@@ -0,0 +1,247 @@
+"""
+ページネーション
+
+件数の多い一覧向けに、件数をキャッシュするページネーターと
+キーセット（カーソル）方式のページネーターを提供する。
+"""
+import base64
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+from .caching import bump_generation, make_key
+
+
+def invalidate_counts(model) -> None:
+    """モデルの件数キャッシュを破棄する"""
+    bump_generation(f'count:{model._meta.label_lower}')
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """
+    クエリの件数を求める
+
+    PostgreSQLで絞り込みのない一覧の場合は pg_class.reltuples の推定値を使い、
+    推定値が PAGINATION_ESTIMATE_THRESHOLD 未満の小さなテーブルでは正確に数える。
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+            return int(row[0])
+    return queryset.count()
+
+
+def get_cached_count(queryset: QuerySet) -> int:
+    """
+    クエリの件数をキャッシュして返す
+
+    キーは (モデル, 絞り込み条件) ごとに作成し、モデルの保存・削除時に
+    invalidate_counts で破棄する。
+    """
+    if queryset.query.is_empty():
+        # none() のクエリはSQLにできないため、キャッシュせずに0件とする
+        return 0
+    key = make_key(
+        f'count:{queryset.model._meta.label_lower}',
+        queryset.order_by().query,
+    )
+    count = cache.get(key)
+    if count is None:
+        count = estimate_count(queryset)
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """件数をキャッシュするページネーター"""
+
+    @cached_property
+    def count(self) -> int:
+        if isinstance(self.object_list, QuerySet):
+            return get_cached_count(self.object_list)
+        return super().count
+
+
+class KeysetPage:
+    """キーセット方式のページ（テンプレートからは通常のPageと同様に扱える）"""
+
+    def __init__(self, object_list, number, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<KeysetPage {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def first_key(self):
+        return self.paginator.get_key(self.object_list[0])
+
+    @property
+    def last_key(self):
+        return self.paginator.get_key(self.object_list[-1])
+
+
+class KeysetPaginator:
+    """
+    (key 降順, id 降順) でページを区切るページネーター
+
+    OFFSET を使わず「前ページ最後の行より古い行」を検索するため、
+    深いページでもインデックスを per_page 件たどるだけで済む。
+    総ページ数はキャッシュした件数から求める。
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, key: str = 'created_at'):
+        self.key = key
+        self.per_page = per_page
+        self.queryset = queryset.order_by(f'-{key}', '-pk')
+
+    @cached_property
+    def count(self) -> int:
+        return get_cached_count(self.queryset)
+
+    @cached_property
+    def num_pages(self) -> int:
+        return max(math.ceil(self.count / self.per_page), 1)
+
+    def get_key(self, obj) -> tuple:
+        return getattr(obj, self.key), obj.pk
+
+    def encode_cursor(self, number: int, direction: str, key: tuple | None = None) -> str:
+        value = f'{number}|{direction}'
+        if key is not None:
+            value += f'|{key[0].isoformat()}|{key[1]}'
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> tuple[int, str, tuple | None]:
+        try:
+            value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            parts = value.split('|')
+            number, direction = int(parts[0]), parts[1]
+            key = None
+            if direction in ('next', 'prev'):
+                key = (datetime.fromisoformat(parts[2]), int(parts[3]))
+            elif direction != 'last':
+                raise ValueError(direction)
+        except (ValueError, IndexError, UnicodeDecodeError) as e:
+            raise InvalidPage('Invalid cursor') from e
+        return number, direction, key
+
+    def _older(self, key: tuple) -> Q:
+        # 先頭の条件でインデックスの範囲検索になるようにする
+        value, pk = key
+        return Q(**{f'{self.key}__lte': value}) & (
+            Q(**{f'{self.key}__lt': value}) | Q(pk__lt=pk)
+        )
+
+    def _newer(self, key: tuple) -> Q:
+        value, pk = key
+        return Q(**{f'{self.key}__gte': value}) & (
+            Q(**{f'{self.key}__gt': value}) | Q(pk__gt=pk)
+        )
+
+    def page(self, cursor: str | None = None) -> KeysetPage:
+        """カーソルに対応するページを返す（カーソルなしは先頭ページ）"""
+        per_page = self.per_page
+        if not cursor:
+            rows = list(self.queryset[:per_page + 1])
+            return self._page(rows[:per_page], 1, len(rows) > per_page, False)
+
+        number, direction, key = self.decode_cursor(cursor)
+        if direction == 'next':
+            rows = list(self.queryset.filter(self._older(key))[:per_page + 1])
+            return self._page(rows[:per_page], max(number, 2), len(rows) > per_page, True)
+
+        if direction == 'prev':
+            rows = list(
+                self.queryset.filter(self._newer(key))
+                .order_by(self.key, 'pk')[:per_page + 1]
+            )
+            if len(rows) <= per_page or number <= 1:
+                # 先頭まで戻った場合は先頭ページとして表示する
+                return self.page()
+            return self._page(rows[:per_page][::-1], number, True, True)
+
+        # 最終ページ
+        if self.num_pages <= 1:
+            return self.page()
+        rows = list(self.queryset.order_by(self.key, 'pk')[:per_page])[::-1]
+        return self._page(rows, self.num_pages, False, True)
+
+    def _page(self, rows, number, has_next, has_previous) -> KeysetPage:
+        if not rows and number > 1:
+            raise InvalidPage('That page contains no results')
+        # キャッシュした件数が古い場合でも現在のページ番号と矛盾しないようにする
+        self.num_pages = max(self.num_pages, number + (1 if has_next else 0))
+        return KeysetPage(rows, number, self, has_next, has_previous)
+
+    def get_page_cursors(self, page: KeysetPage, numbers) -> dict[int, str]:
+        """
+        ページ番号ごとのカーソルを返す
+
+        現在のページから表示するページ番号までのキーだけを
+        前後それぞれ1クエリで取得する。辿れないページ番号は含めない。
+        """
+        cursors = {}
+        per_page = self.per_page
+        ahead = [n - page.number for n in numbers if n > page.number]
+        behind = [page.number - n for n in numbers if 1 < n < page.number]
+
+        if ahead and page.has_next():
+            keys = [page.last_key]
+            if max(ahead) > 1:
+                keys += self.queryset.filter(self._older(page.last_key)).values_list(
+                    self.key, 'pk'
+                )[:per_page * (max(ahead) - 1) + 1]
+            for step in ahead:
+                index = (step - 1) * per_page
+                if step == 1 or index + 1 < len(keys):
+                    cursors[page.number + step] = self.encode_cursor(
+                        page.number + step, 'next', keys[index]
+                    )
+
+        if behind and page.has_previous():
+            keys = [page.first_key]
+            keys += self.queryset.filter(self._newer(page.first_key)).order_by(
+                self.key, 'pk'
+            ).values_list(self.key, 'pk')[:per_page * (max(behind) - 1) + 1]
+            for step in behind:
+                index = (step - 1) * per_page
+                if index + 1 < len(keys):
+                    cursors[page.number - step] = self.encode_cursor(
+                        page.number - step, 'prev', keys[index]
+                    )
+
+        return cursors
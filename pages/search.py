@@ -0,0 +1,109 @@
+"""
+ニュースの全文検索
+
+日本語は単語の区切りがないため、本文を文字の2-gram（バイグラム）に分割した文書を
+News.search_document に保存し、PostgreSQL では to_tsvector('simple', search_document) の
+GINインデックスで検索する（'simple' 設定は語幹処理をせず、トークンをそのまま索引にする）。
+英数字の並びは単語のまま扱う。
+
+検索語も同じ方法で分割し、1語の中のトークンは隣接（<->）、空白で区切った語は AND で結合する。
+1文字だけの語は、その文字で始まるトークンの前方一致で検索する。
+PostgreSQL 以外のデータベース（開発・テスト用のSQLite）では文書の部分一致で検索する。
+"""
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+# 英数字の並び、またはそれ以外の文字（漢字・かな等）の並び
+TOKEN_RUN = re.compile(r'[0-9a-z]+|[^\W0-9a-z_]+')
+# PostgreSQL のテキスト検索設定（語幹処理をしない）
+SEARCH_CONFIG = 'simple'
+
+
+def normalize(text: str) -> str:
+    """全角英数字・半角カナ等を統一し、小文字にする"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text: str) -> list[str]:
+    """文字列を検索用のトークンに分割する（英数字は単語、それ以外はバイグラム）"""
+    tokens = []
+    for run in TOKEN_RUN.findall(normalize(text)):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def build_search_document(*fields: str) -> str:
+    """検索用の文書（空白区切りのトークン）を作成する"""
+    return ' '.join(token for field in fields for token in tokenize(field))
+
+
+def parse_query(query: str) -> list[list[str]]:
+    """検索語を空白で区切り、語ごとのトークンのリストを返す"""
+    terms = []
+    for word in normalize(query).split():
+        tokens = tokenize(word)
+        if tokens:
+            terms.append(tokens)
+    return terms
+
+
+def search_vector_sql(column: str) -> str:
+    """
+    検索用文書の tsvector の式
+
+    GINインデックス（マイグレーション 0006）の式と一致させる（一致しない場合はインデックスが使われない）。
+    変更する場合はインデックスを作り直すマイグレーションを追加すること。
+    """
+    return f"to_tsvector('{SEARCH_CONFIG}', {column})"
+
+
+def to_tsquery(terms: list[list[str]]) -> str:
+    """to_tsquery('simple', ...) に渡す検索式を作成する"""
+    phrases = []
+    for tokens in terms:
+        if len(tokens) == 1 and len(tokens[0]) == 1 and not tokens[0].isascii():
+            phrases.append(f"'{tokens[0]}':*")
+        else:
+            phrases.append(' <-> '.join(f"'{token}'" for token in tokens))
+    return ' & '.join(f'({phrase})' for phrase in phrases)
+
+
+def search_news(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    検索語に一致するニュースを関連度（rank）の高い順に返す
+
+    PostgreSQL 以外では rank は 0 になり、新しい順に並ぶ。
+    """
+    terms = parse_query(query)
+    if not terms:
+        return queryset.none()
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        condition = Q()
+        for tokens in terms:
+            condition &= Q(search_document__contains=' '.join(tokens))
+        return (
+            queryset.filter(condition)
+            .annotate(rank=RawSQL('0', [], output_field=FloatField()))
+            .order_by('-created_at', '-pk')
+        )
+
+    # インデックスの式（マイグレーション 0006）と同じ式を使う
+    column = f'{connection.ops.quote_name(queryset.model._meta.db_table)}.{connection.ops.quote_name("search_document")}'
+    vector = search_vector_sql(column)
+    match = f"to_tsquery('{SEARCH_CONFIG}', %s)"
+    tsquery = to_tsquery(terms)
+    return (
+        queryset
+        .filter(RawSQL(f"{vector} @@ {match}", [tsquery], output_field=BooleanField()))
+        .annotate(rank=RawSQL(f"ts_rank({vector}, {match})", [tsquery], output_field=FloatField()))
+        .order_by('-rank', '-created_at', '-pk')
+    )
@@ -0,0 +1,83 @@
+"""
+pagesアプリのシグナルハンドラー
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .availability import invalidate_availability
+from .caching import bump_generation
+from .feeds import invalidate_feeds
+from .images import replace_derivatives
+from .models import Booking, BookingSlot, Menu, MenuRating, News, Review
+from .pagination import invalidate_counts
+
+
+@receiver(post_delete, sender=Booking)
+def release_booking_slot(sender, instance, **kwargs):
+    """予約削除時に予約枠の席を解放する"""
+    BookingSlot.objects.release(instance.date, instance.time, instance.number_of_people)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def clear_availability_cache(sender, instance, **kwargs):
+    """予約の変更時に空き状況のキャッシュを破棄する"""
+    transaction.on_commit(invalidate_availability)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def clear_count_cache(sender, instance, **kwargs):
+    """一覧の件数キャッシュを破棄する"""
+    transaction.on_commit(lambda: invalidate_counts(sender))
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def clear_news_cache(sender, instance, **kwargs):
+    """ニュース一覧・フィードのキャッシュを破棄する"""
+    transaction.on_commit(lambda: bump_generation('news'))
+    transaction.on_commit(invalidate_feeds)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    """レビュー削除時にメニューの評価の集計から除く"""
+    MenuRating.objects.remove(instance.product_id, instance.rating)
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def clear_menu_cache(sender, instance, **kwargs):
+    """メニュー一覧（評価を含む）のキャッシュを破棄する"""
+    transaction.on_commit(lambda: bump_generation('menu'))
+
+
+@receiver(post_save, sender=News)
+@receiver(post_save, sender=Menu)
+def delete_unused_derivatives(sender, instance, **kwargs):
+    """
+    画像が削除された場合に派生ファイルを削除する
+
+    画像の縮小（派生ファイルの生成）はリクエストのワーカーでは行わず、
+    generate_image_derivatives（imagesコンテナで常駐実行）が行う。
+    生成されるまではテンプレートが元画像を表示する。
+    """
+    if instance.img or not instance.img_variants:
+        return
+    previous = instance.img_variants
+    namespace = 'news' if sender is News else 'menu'
+
+    def update():
+        if replace_derivatives(sender.objects.filter(pk=instance.pk), '', previous, {}):
+            instance.img_variants = {}
+            bump_generation(namespace)
+
+    transaction.on_commit(update)
@@ -0,0 +1,53 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from pages.images import FORMATS
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, alt='', sizes='100vw', css_class=''):
+    """
+    派生ファイルから srcset / sizes 付きの <picture> を出力する
+
+    使用例: {% responsive_image item.img item.img_variants alt=item.alt sizes="50vw" %}
+    派生ファイルがない（generate_image_derivatives で生成される前の）場合は元画像の <img> を出力する。
+    """
+    if not field_file:
+        return ''
+    variants = variants or {}
+    if variants.get('source') != field_file.name or not variants.get('items'):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            field_file.url, alt, css_class,
+        )
+
+    srcsets = {}
+    for item in variants['items']:
+        srcsets.setdefault(item['format'], []).append(
+            f"{default_storage.url(item['name'])} {item['width']}w"
+        )
+    jpeg = [item for item in variants['items'] if item['format'] == 'jpeg']
+    fallback = max(jpeg, key=lambda item: item['width'])
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (FORMATS[fmt][1], ', '.join(srcset), sizes)
+            for fmt, srcset in srcsets.items() if fmt != 'jpeg'
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" '
+        'loading="lazy" decoding="async"></picture>',
+        sources,
+        default_storage.url(fallback['name']),
+        ', '.join(srcsets['jpeg']),
+        sizes,
+        fallback['width'],
+        fallback['height'],
+        alt,
+        css_class,
+    )
@@ -1,3 +1,1629 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import jpholiday
+from PIL import Image
+
+from .availability import build_roster, get_booking_window
+from .holidays import get_holidays, get_holidays_json
+from .mail import enqueue_mail, send_queued_mail
+from .models import Booking, BookingSlot, Menu, MenuRating, News, OutgoingMail, Review, SlotFullError
+from .pagination import get_cached_count
+from .search import build_search_document, search_news
+
+
+class MailQueueTests(TestCase):
+    """メール送信キューのテスト"""
+
+    def test_enqueue_does_not_send(self):
+        enqueue_mail('件名', '本文', 'cafe@example.com', ['guest@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingMail.objects.filter(status=OutgoingMail.Status.PENDING).count(), 1)
+
+    def test_send_queued_mail_uses_single_connection(self):
+        for i in range(3):
+            enqueue_mail(f'件名{i}', '本文', 'cafe@example.com', ['guest@example.com'])
+
+        with mock.patch('pages.mail.get_connection', wraps=mail.get_connection) as get_connection:
+            result = send_queued_mail()
+
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(result['sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingMail.objects.filter(status=OutgoingMail.Status.PENDING).exists())
+
+    @override_settings(MAIL_QUEUE_MAX_ATTEMPTS=2, MAIL_QUEUE_RETRY_DELAY=60)
+    def test_failed_mail_is_retried_with_backoff(self):
+        queued = enqueue_mail('件名', '本文', 'cafe@example.com', ['guest@example.com'])
+
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('down')):
+            result = send_queued_mail()
+        queued.refresh_from_db()
+        self.assertEqual(result['retried'], 1)
+        self.assertEqual(queued.status, OutgoingMail.Status.PENDING)
+        self.assertGreater(queued.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        # 待ち時間中は再送されない
+        self.assertEqual(send_queued_mail()['retried'], 0)
+
+        OutgoingMail.objects.update(next_attempt_at=timezone.now())
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('down')):
+            result = send_queued_mail()
+        queued.refresh_from_db()
+        self.assertEqual(result['failed'], 1)
+        self.assertEqual(queued.status, OutgoingMail.Status.FAILED)
+
+    def test_mail_is_sent_outside_the_claiming_transaction(self):
+        first = enqueue_mail('件名1', '本文', 'cafe@example.com', ['guest@example.com'])
+        second = enqueue_mail('件名2', '本文', 'cafe@example.com', ['guest@example.com'])
+        # TestCase のトランザクションの中で実行されるため、その深さと比較する
+        depth = len(connection.atomic_blocks)
+        states = []
+
+        def send(message, fail_silently=False):
+            states.append((len(connection.atomic_blocks) - depth, OutgoingMail.objects.get(pk=first.pk).status))
+            if message.subject == '件名2':
+                raise SystemExit
+            return 1
+
+        with mock.patch('django.core.mail.EmailMessage.send', send), self.assertRaises(SystemExit):
+            send_queued_mail()
+
+        # 送信中はトランザクションの外で、1通目の結果は2通目を送信する前に保存されている
+        self.assertEqual(states, [(0, OutgoingMail.Status.SENDING), (0, OutgoingMail.Status.SENT)])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (OutgoingMail.Status.SENT, 1))
+        self.assertEqual(second.status, OutgoingMail.Status.SENDING)
+        self.assertGreater(second.next_attempt_at, timezone.now())
+
+    @override_settings(MAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_expired_lease_is_claimed_again(self):
+        queued = enqueue_mail('件名', '本文', 'cafe@example.com', ['guest@example.com'])
+        # 送信中に停止したワーカーのリースは、期限までは他のワーカーが取得しない
+        OutgoingMail.objects.update(
+            status=OutgoingMail.Status.SENDING, attempts=1,
+            next_attempt_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(send_queued_mail()['sent'], 0)
+
+        OutgoingMail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mail()['sent'], 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (OutgoingMail.Status.SENT, 2))
+
+        # 最大試行回数に達したリース切れのメールは失敗にする
+        OutgoingMail.objects.update(status=OutgoingMail.Status.SENDING, next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mail()['failed'], 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutgoingMail.Status.FAILED)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class BookingConfirmViewTests(TestCase):
+    """予約確認ビューのテスト"""
+
+    booking_data = {
+        'name': '山田 太郎',
+        'date': date(2030, 1, 15),
+        'time': time(12, 0),
+        'email': 'guest@example.com',
+        'phone_number': '0312345678',
+        'number_of_people': 2,
+    }
+
+    def confirm(self, data=None):
+        session = self.client.session
+        session['booking_data'] = dict(data or self.booking_data)
+        session.save()
+        return self.client.post(
+            reverse('pages:booking-confirm'),
+            HTTP_REFERER='http://testserver/booking/',
+        )
+
+    def test_confirm_queues_mail_without_sending(self):
+        response = self.confirm()
+
+        self.assertRedirects(response, reverse('pages:booking-complete'), fetch_redirect_response=False)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutgoingMail.objects.get()
+        self.assertEqual(queued.recipients, ['guest@example.com'])
+        self.assertIn('2030/01/15', queued.body)
+
+    def test_booking_form_stores_date_and_time_in_session(self):
+        response = self.client.post(reverse('pages:booking'), {
+            **self.booking_data, 'date': '2030/01/15', 'time': '12:00',
+        })
+        self.assertRedirects(response, reverse('pages:booking-confirm'), fetch_redirect_response=False)
+        # セッションからオブジェクトとして復元される
+        self.assertEqual(self.client.session['booking_data'], self.booking_data)
+
+        response = self.client.get(reverse('pages:booking-confirm'), HTTP_REFERER='http://testserver/booking/')
+        self.assertContains(response, '2030/01/15')
+        self.assertContains(response, '12:00')
+
+    async def test_async_confirm_creates_booking(self):
+        # 非同期ビューとして ASGI で処理される
+        session = await self.async_client.asession()
+        await session.aset('booking_data', dict(self.booking_data))
+        await session.asave()
+        response = await self.async_client.post(
+            reverse('pages:booking-confirm'),
+            headers={'referer': 'http://testserver/booking/'},
+        )
+
+        self.assertRedirects(response, reverse('pages:booking-complete'), fetch_redirect_response=False)
+        self.assertEqual(await Booking.objects.acount(), 1)
+        self.assertEqual(await OutgoingMail.objects.acount(), 1)
+
+    def test_confirm_accepts_legacy_string_session_data(self):
+        # 以前のシリアライザーで保存された（予約の途中でデプロイをまたいだ）セッション
+        response = self.confirm({**self.booking_data, 'date': '2030/01/15', 'time': '12:00'})
+
+        self.assertRedirects(response, reverse('pages:booking-complete'), fetch_redirect_response=False)
+        booking = Booking.objects.get()
+        self.assertEqual((booking.date, booking.time), (date(2030, 1, 15), time(12, 0)))
+
+    def test_confirm_restarts_booking_when_session_data_is_invalid(self):
+        response = self.confirm({**self.booking_data, 'date': '15/01/2030', 'number_of_people': 50})
+
+        self.assertRedirects(response, reverse('pages:booking'), fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.exists())
+        self.assertNotIn('booking_data', self.client.session)
+        response = self.client.get(reverse('pages:booking'))
+        self.assertContains(response, 'もう一度入力してください')
+
+    @override_settings(BOOKING_SLOT_CAPACITY=2)
+    def test_confirm_full_slot_is_rejected(self):
+        Booking.objects.create(
+            name='先客', date=date(2030, 1, 15), time=time(12, 0),
+            email='first@example.com', phone_number='0300000000', number_of_people=1,
+        )
+        response = self.confirm()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['slot_full'])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertFalse(OutgoingMail.objects.exists())
+
+
+class ContactViewTests(TestCase):
+    """お問い合わせビューのテスト"""
+
+    async def test_async_post_queues_mail(self):
+        response = await self.async_client.post(reverse('pages:contact'), {
+            'subject': '営業時間について',
+            'message': '祝日の営業時間を教えてください。',
+            'full_name': '山田 太郎',
+            'email': 'guest@example.com',
+        })
+        self.assertRedirects(response, reverse('pages:contact-complete'), fetch_redirect_response=False)
+        queued = await OutgoingMail.objects.aget()
+        self.assertIn('山田 太郎', queued.body)
+
+    async def test_async_invalid_form_is_rendered(self):
+        response = await self.async_client.post(reverse('pages:contact'), {'subject': '件名'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await OutgoingMail.objects.aexists())
+
+
+@override_settings(BOOKING_SLOT_CAPACITY=4)
+class BookingSlotTests(TestCase):
+    """予約枠の席数管理のテスト"""
+
+    def book(self, people, slot_time=time(12, 0)):
+        return Booking.objects.create(
+            name='山田 太郎', date=date(2030, 1, 15), time=slot_time,
+            email='guest@example.com', phone_number='0312345678', number_of_people=people,
+        )
+
+    def seats_taken(self, slot_time=time(12, 0)):
+        return BookingSlot.objects.get(date=date(2030, 1, 15), time=slot_time).seats_taken
+
+    def test_create_counts_seats(self):
+        self.book(3)
+        self.assertEqual(self.seats_taken(), 3)
+        self.assertEqual(BookingSlot.objects.seats_left(date(2030, 1, 15), time(12, 0)), 1)
+
+    def test_create_over_capacity_raises(self):
+        self.book(3)
+        with self.assertRaises(SlotFullError):
+            self.book(2)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.seats_taken(), 3)
+
+    def test_update_and_delete_move_seats(self):
+        booking = self.book(3)
+        booking.time = time(12, 30)
+        booking.save()
+        self.assertEqual(self.seats_taken(), 0)
+        self.assertEqual(self.seats_taken(time(12, 30)), 3)
+
+        booking.delete()
+        self.assertEqual(self.seats_taken(time(12, 30)), 0)
+
+    def test_rebuild_recomputes_seats_in_place(self):
+        self.book(3)
+        self.book(1, time(12, 30))
+        BookingSlot.objects.filter(time=time(12, 0)).update(seats_taken=0)
+        BookingSlot.objects.filter(time=time(12, 30)).delete()
+        BookingSlot.objects.create(date=date(2030, 1, 15), time=time(13, 0), seats_taken=2)
+        slot_id = BookingSlot.objects.get(time=time(12, 0)).pk
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('rebuild_booking_slots', stdout=io.StringIO())
+
+        self.assertEqual([self.seats_taken(), self.seats_taken(time(12, 30)), self.seats_taken(time(13, 0))], [3, 1, 0])
+        # 枠の行は削除せずに1文のUPDATEで更新する
+        self.assertEqual(BookingSlot.objects.get(time=time(12, 0)).pk, slot_id)
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertNotIn('DELETE', statements)
+        self.assertEqual(statements.count('UPDATE'), 1)
+
+
+@override_settings(BOOKING_SLOT_CAPACITY=2)
+class BookingAvailabilityViewTests(TestCase):
+    """予約枠の空き状況APIのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.day, _ = get_booking_window()
+
+    def book(self, slot_time, people):
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                name='山田 太郎', date=self.day, time=slot_time,
+                email='guest@example.com', phone_number='0312345678', number_of_people=people,
+            )
+
+    def test_reports_remaining_seats_per_slot(self):
+        self.book(time(12, 0), 2)
+        self.book(time(12, 30), 1)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('pages:booking-availability'))
+        data = response.json()
+        day = data['days'][self.day.strftime('%Y/%m/%d')]
+        self.assertEqual(day['slots'], {'12:00': 0, '12:30': 1})
+        self.assertEqual(day['remaining'], 2 * len(data['slots']) - 3)
+        self.assertEqual(data['full_days'], [])
+
+        # 2回目以降はキャッシュから返す
+        with self.assertNumQueries(0):
+            self.client.get(reverse('pages:booking-availability'))
+
+    def test_etag_and_invalidation(self):
+        url = reverse('pages:booking-availability')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.book(time(12, 0), 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class KeysetPaginationTests(TestCase):
+    """キーセット方式のページネーションのテスト"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        # created_at が重複する行も含めて作成する
+        News.objects.bulk_create([
+            News(category='event', title=f'ニュース{i}', text='本文', created_at=now - timedelta(minutes=i // 2))
+            for i in range(73)
+        ])
+        cls.expected = list(News.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+        cls.admin = User.objects.create_superuser('admin')
+
+    def setUp(self):
+        cache.clear()
+        # 一覧のキャッシュを経由せずにページネーションを確認する
+        self.client.force_login(self.admin)
+
+    def titles(self, response):
+        return [item.pk for item in response.context['object_list']]
+
+    def test_walk_all_pages_with_cursors(self):
+        url = reverse('pages:news')
+        response = self.client.get(url)
+        seen = self.titles(response)
+        while response.context['page_obj'].has_next():
+            number = response.context['page_obj'].number
+            links = dict(response.context['page_links'])
+            response = self.client.get(url + links[number + 1])
+            self.assertEqual(response.context['page_obj'].number, number + 1)
+            seen += self.titles(response)
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(response.context['page_obj'].number, 8)
+
+    def test_window_links_match_offset_pages(self):
+        url = reverse('pages:news')
+        response = self.client.get(url)
+        for page_num, page_url in response.context['page_links']:
+            page = self.client.get(url + page_url)
+            start = (page_num - 1) * 10
+            self.assertEqual(self.titles(page), self.expected[start:start + 10])
+
+        # 後方のページへのリンク
+        links = dict(self.client.get(url + dict(response.context['page_links'])[5]).context['page_links'])
+        for page_num in (3, 4):
+            start = (page_num - 1) * 10
+            self.assertEqual(self.titles(self.client.get(url + links[page_num])), self.expected[start:start + 10])
+
+    def test_last_page_and_offset_fallback(self):
+        url = reverse('pages:news')
+        response = self.client.get(url + self.client.get(url).context['last_page_url'])
+        self.assertEqual(response.context['page_obj'].number, 8)
+        self.assertEqual(self.titles(response), self.expected[-10:])
+
+        response = self.client.get(url, {'page': 3})
+        self.assertEqual(self.titles(response), self.expected[20:30])
+
+    def test_count_is_cached_until_news_changes(self):
+        url = reverse('pages:news-category', kwargs={'category': 'event'})
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            # ユーザー以外は、ページの行とリンク用のキーだけを検索する（セッションはキャッシュから読む）
+            response = self.client.get(url)
+        self.assertEqual(response.context['paginator'].num_pages, 8)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            News.objects.bulk_create([
+                News(category='event', title=f'追加{i}', text='本文') for i in range(10)
+            ])
+            News.objects.create(category='event', title='追加', text='本文')
+        response = self.client.get(url)
+        self.assertEqual(response.context['paginator'].num_pages, 9)
+
+    def test_page_links_drop_unknown_query_params(self):
+        self.client.logout()
+        url = reverse('pages:news')
+        response = self.client.get(url, {'page': 2, 'utm_source': '"><script>'})
+        links = [link for _, link in response.context['page_links']]
+        links += [response.context['first_page_url'], response.context['last_page_url']]
+        for link in links:
+            self.assertNotIn('utm_source', link)
+        # キャッシュされた一覧を別のリクエストで表示しても、パラメーターは含まれない
+        self.assertNotContains(self.client.get(url, {'page': 2}), 'utm_source')
+
+        News.objects.update(search_document=build_search_document('ニュース'))
+        response = self.client.get(reverse('pages:news-search'), {'q': 'ニュース', 'utm_source': 'x'})
+        for _, link in response.context['page_links']:
+            self.assertIn('q=%E3%83%8B', link)
+            self.assertNotIn('utm_source', link)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('pages:news'), {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_benchmark_keeps_other_cache_entries(self):
+        cache.set('unrelated', 'kept')
+        call_command('benchmark_pagination', rows=30, repeat=1, stdout=io.StringIO())
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        self.assertEqual(get_cached_count(Booking.objects.all()), 0)
+
+
+class ContentCacheTests(TestCase):
+    """ニュース・メニュー一覧のキャッシュのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        News.objects.create(category='event', title='最初のニュース', text='本文')
+
+    def test_generation_numbers_are_not_reused_after_eviction(self):
+        from .caching import bump_generation, make_key
+        keys = {make_key('news', 'page')}
+        bump_generation('news')
+        keys.add(make_key('news', 'page'))
+        # 世代番号のキーだけが追い出されても、以前の世代のキーにはならない
+        cache.delete('pages:generation:news')
+        keys.add(make_key('news', 'page'))
+        cache.delete('pages:generation:news')
+        bump_generation('news')
+        keys.add(make_key('news', 'page'))
+        self.assertEqual(len(keys), 4)
+
+    def test_anonymous_cached_page_runs_no_queries(self):
+        url = reverse('pages:news-category', kwargs={'category': 'event'})
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertContains(second, '絞り込み：イベント')
+
+        self.client.get(reverse('pages:menu'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('pages:menu'))
+
+    def test_new_post_invalidates_cache(self):
+        url = reverse('pages:news')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            News.objects.create(category='talk', title='新しいニュース', text='本文')
+        self.assertContains(self.client.get(url), '新しいニュース')
+
+    def test_cached_page_is_rendered_for_the_requesting_user(self):
+        url = reverse('pages:news')
+        self.client.get(url)
+        self.client.force_login(User.objects.create_user('customer'))
+        # ユーザーはキャッシュの確認前に1回だけ取得する（セッション・ユーザー・一覧の件数等）
+        response = self.client.get(url)
+        self.assertContains(response, 'Accounts')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Accounts')
+        self.assertEqual(sum('auth_user' in query['sql'] for query in queries), 1)
+
+    def test_superuser_bypasses_cache(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        url = reverse('pages:news')
+        self.client.get(url)
+        # コミット前の変更もスーパーユーザーには表示される
+        News.objects.create(category='talk', title='下書き確認', text='本文')
+        self.assertContains(self.client.get(url), '下書き確認')
+
+
+class ConditionalGetTests(TestCase):
+    """一覧ページの条件付きGETのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        News.objects.create(category='event', title='最初のニュース', text='本文')
+
+    def test_not_modified_without_rendering(self):
+        url = reverse('pages:news')
+        response = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_if_modified_since_alone_never_returns_stale_content(self):
+        url = reverse('pages:news')
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        # 編集では created_at が変わらないため、If-Modified-Since だけで 304 を返すと古い内容になる
+        with self.captureOnCommitCallbacks(execute=True):
+            news = News.objects.get()
+            news.title = '編集したニュース'
+            news.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '編集したニュース')
+
+    def test_validators_change_after_new_post(self):
+        for url in (reverse('pages:news'), reverse('pages:news-category', kwargs={'category': 'event'})):
+            etag = self.client.get(url)['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                News.objects.create(category='event', title='新しいニュース', text='本文')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_menu_validators_change_after_delete(self):
+        menu = Menu.objects.create(title='コーヒー', img='menu/coffee.jpg', alt='コーヒー', price=500)
+        url = reverse('pages:menu')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            menu.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_differs_for_logged_in_users(self):
+        url = reverse('pages:news')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_user('customer'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class NewsSearchTests(TestCase):
+    """ニュース検索のテスト"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tokenize_splits_japanese_into_bigrams(self):
+        from .search import parse_query, to_tsquery, tokenize
+        self.assertEqual(tokenize('期間限定ＣＡＦＥラテ'), ['期間', '間限', '限定', 'cafe', 'ラテ'])
+        self.assertEqual(tokenize('茶'), ['茶'])
+        self.assertEqual(
+            to_tsquery(parse_query('期間限定　茶')),
+            "('期間' <-> '間限' <-> '限定') & ('茶':*)",
+        )
+
+    def test_postgresql_query_uses_the_index_expression(self):
+        from django.db.backends.postgresql.base import DatabaseWrapper
+        from .search import parse_query, to_tsquery
+
+        postgres = DatabaseWrapper(
+            {**connection.settings_dict, 'ENGINE': 'django.db.backends.postgresql'}, alias='default',
+        )
+        migration = importlib.import_module('pages.migrations.0006_news_search_document')
+        executed = []
+        migration.create_search_index(None, mock.Mock(connection=postgres, execute=executed.append))
+        self.assertEqual(len(executed), 1)
+        index_expression = re.search(r'USING gin \((.+)\);$', executed[0]).group(1)
+        self.assertEqual(index_expression, "to_tsvector('simple', search_document)")
+
+        with mock.patch('pages.search.connections', {'default': postgres}):
+            queryset = search_news(News.objects.all(), '期間限定 抹茶')
+        sql, params = queryset.query.get_compiler(connection=postgres).as_sql()
+        # 検索の式はテーブル名で修飾した列に対するインデックスと同じ式
+        vector = index_expression.replace('search_document', '"pages_news"."search_document"')
+        where = sql.split(' WHERE ', 1)[1]
+        self.assertTrue(where.startswith(f"({vector} @@ to_tsquery('simple', %s))"), where)
+        self.assertIn(f"(ts_rank({vector}, to_tsquery('simple', %s))) AS \"rank\"", sql)
+        self.assertEqual(params.count(to_tsquery(parse_query('期間限定 抹茶'))), 2)
+
+    def test_migration_builds_the_same_documents(self):
+        migration = importlib.import_module('pages.migrations.0006_news_search_document')
+        for fields in [('秋のイベント', '栗のケーキ'), ('期間限定ＣＡＦＥラテ', ''), ('茶', 'ｶﾌｪ 2024年')]:
+            with self.subTest(fields=fields):
+                self.assertEqual(migration.build_search_document(*fields), build_search_document(*fields))
+
+    def test_search_document_is_maintained_on_save(self):
+        news = News.objects.create(category='event', title='秋のイベント', text='栗のケーキ')
+        self.assertEqual(news.search_document, '秋の のイ イベ ベン ント 栗の のケ ケー ーキ')
+        news.text = '抹茶ラテ'
+        news.save(update_fields=['text'])
+        news.refresh_from_db()
+        self.assertIn('抹茶', news.search_document)
+
+    def test_search_view_matches_phrases_and_paginates(self):
+        for i in range(12):
+            News.objects.create(category='irregularmenu', title=f'期間限定メニュー{i}', text='抹茶ラテ')
+        News.objects.create(category='event', title='期間と限定', text='別々の語')
+        response = self.client.get(reverse('pages:news-search'), {'q': '期間限定 抹茶'})
+        self.assertEqual(response.context['paginator'].count, 12)
+        self.assertContains(response, '検索：期間限定 抹茶（12件）')
+        self.assertContains(response, 'href="?q=%E6%9C%9F%E9%96%93%E9%99%90%E5%AE%9A+%E6%8A%B9%E8%8C%B6&amp;page=2"')
+
+        response = self.client.get(reverse('pages:news-search'), {'q': '期間限定 抹茶', 'page': 2})
+        self.assertEqual(len(response.context['object_list']), 2)
+        self.assertFalse(self.client.get(reverse('pages:news-search')).context['object_list'])
+
+    def test_admin_search_uses_search_document(self):
+        News.objects.create(category='event', title='自家焙煎', text='ブレンド')
+        News.objects.create(category='event', title='紅茶', text='アールグレイ')
+        admin = User.objects.create_superuser('admin', password='pass')
+        self.client.force_login(admin)
+        with mock.patch('pages.admin.search_news', wraps=search_news) as search:
+            response = self.client.get(reverse('admin:pages_news_changelist'), {'q': '焙煎'})
+        search.assert_called_once()
+        self.assertContains(response, '自家焙煎')
+        self.assertNotContains(response, 'アールグレイ')
+
+
+class NewsFeedTests(TestCase):
+    """ニュースのフィードのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.news = News.objects.create(category='event', title='秋のイベント', text='栗のケーキ')
+        News.objects.create(category='talk', title='常連さんとの会話', text='コーヒーの話')
+
+    def test_formats_and_categories(self):
+        response = self.client.get(reverse('pages:news-feed', kwargs={'fmt': 'rss'}))
+        self.assertEqual(response['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertContains(response, '常連さんとの会話')
+
+        response = self.client.get(reverse('pages:news-category-feed', kwargs={'category': 'event', 'fmt': 'atom'}))
+        self.assertTrue(response['Content-Type'].startswith('application/atom+xml'))
+        self.assertContains(response, f'http://localhost:8000/news/category/event/#news-{self.news.pk}')
+        self.assertNotContains(response, '常連さんとの会話')
+
+        data = self.client.get(reverse('pages:news-feed', kwargs={'fmt': 'json'})).json()
+        self.assertEqual(data['version'], 'https://jsonfeed.org/version/1.1')
+        self.assertEqual([item['title'] for item in data['items']], ['常連さんとの会話', '秋のイベント'])
+
+        self.assertEqual(self.client.get(reverse('pages:news-feed', kwargs={'fmt': 'xml'})).status_code, 404)
+        url = reverse('pages:news-category-feed', kwargs={'category': 'unknown', 'fmt': 'rss'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cached_feed_and_conditional_get_skip_the_database(self):
+        url = reverse('pages:news-feed', kwargs={'fmt': 'atom'})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_saving_news_invalidates_feeds(self):
+        url = reverse('pages:news-category-feed', kwargs={'category': 'event', 'fmt': 'json'})
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            News.objects.create(category='event', title='冬のイベント', text='ホットワイン')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['items'][0]['title'], '冬のイベント')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            News.objects.filter(title='冬のイベント').get().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(SITE_URL='https://cafe.example.com')
+    def test_feeds_use_the_site_url_regardless_of_host(self):
+        url = reverse('pages:news-feed', kwargs={'fmt': 'json'})
+        data = self.client.get(url, HTTP_HOST='cafe.example.com').json()
+        self.assertEqual(data['home_page_url'], 'https://cafe.example.com/news/')
+        self.assertEqual(data['feed_url'], 'https://cafe.example.com/news/feed.json')
+        # Host ヘッダーを変えても、描画もキャッシュの登録もしない
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_HOST='attacker.example.com')
+        self.assertEqual(response.json(), data)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        response = self.client.get(reverse('pages:news-feed', kwargs={'fmt': 'atom'}), HTTP_HOST='attacker.example.com')
+        self.assertContains(response, 'https://cafe.example.com/news/feed.atom')
+        self.assertNotContains(response, 'attacker.example.com')
+
+    def test_editing_news_invalidates_feeds(self):
+        url = reverse('pages:news-feed', kwargs={'fmt': 'rss'})
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news.title = '秋のイベント（日程変更）'
+            self.news.save()
+        self.assertContains(self.client.get(url), '秋のイベント（日程変更）')
+
+    def test_news_pages_link_to_feeds(self):
+        self.assertContains(self.client.get(reverse('pages:news')), 'href="/news/feed.atom"')
+        response = self.client.get(reverse('pages:news-category', kwargs={'category': 'talk'}))
+        self.assertContains(response, 'href="/news/category/talk/feed.rss"')
+
+
+class BookingExportTests(TestCase):
+    """予約のエクスポートのテスト"""
+
+    def setUp(self):
+        today = timezone.localdate()
+        for i, day in enumerate([today - timedelta(days=3), today, today, today + timedelta(days=40)]):
+            Booking.objects.create(
+                name=f'予約{i}', date=day, time=time(12, 0), email=f'guest{i}@example.com',
+                phone_number='0312345678', number_of_people=2,
+            )
+        self.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_staff_only(self):
+        url = reverse('pages:booking-export', kwargs={'fmt': 'csv'})
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user('guest', password='pass'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    @override_settings(BOOKING_EXPORT_CHUNK_SIZE=1)
+    def test_streams_csv_for_period(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('pages:booking-export', kwargs={'fmt': 'csv'}), {'period': 'today'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bookings-today.csv"')
+        blocks = list(response.streaming_content)
+        # 見出し＋1件目、2件目がそれぞれ1ブロックで送られる
+        self.assertEqual(len(blocks), 2)
+        lines = b''.join(blocks).decode().splitlines()
+        self.assertEqual(lines[0], '\ufeffID,日付,時間,名前,人数,電話番号,メールアドレス,作成日時')
+        self.assertEqual([line.split(',')[3] for line in lines[1:]], ['予約1', '予約2'])
+
+    def test_csv_escapes_formula_values(self):
+        Booking.objects.filter(name='予約1').update(name='=HYPERLINK("http://example.com")', email='@SUM(A1)')
+        Booking.objects.filter(name='予約2').update(name='-2+3', phone_number='+81312345678')
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('pages:booking-export', kwargs={'fmt': 'csv'}), {'period': 'today'})
+        rows = list(csv.reader(self.read(response).splitlines()))[1:]
+        self.assertEqual([(row[3], row[5], row[6]) for row in rows], [
+            ('\'=HYPERLINK("http://example.com")', '0312345678', "'@SUM(A1)"),
+            ("'-2+3", "'+81312345678", 'guest2@example.com'),
+        ])
+
+        # NDJSON の値はそのまま出力する
+        response = self.client.get(reverse('pages:booking-export', kwargs={'fmt': 'ndjson'}), {'period': 'today'})
+        self.assertEqual(json.loads(self.read(response).splitlines()[1])['name'], '-2+3')
+
+    def test_ndjson_for_date_range_and_invalid_parameters(self):
+        self.client.force_login(self.staff)
+        url = reverse('pages:booking-export', kwargs={'fmt': 'ndjson'})
+        response = self.client.get(url, {'start': (timezone.localdate() + timedelta(days=1)).isoformat()})
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['予約3'])
+        self.assertEqual(rows[0]['time'], '12:00:00')
+
+        self.assertEqual(self.client.get(url, {'period': 'someday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2024/01/01'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('pages:booking-export', kwargs={'fmt': 'xml'})).status_code, 404)
+
+    async def test_async_export_streams_with_async_iterator(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(
+            reverse('pages:booking-export', kwargs={'fmt': 'ndjson'}), {'period': 'past_booking'}
+        )
+        self.assertTrue(response.is_async)
+        content = b''.join([block async for block in response.streaming_content]).decode()
+        self.assertEqual([json.loads(line)['name'] for line in content.splitlines()], ['予約0'])
+
+    def test_export_command(self):
+        out = io.StringIO()
+        call_command('export_bookings', format='ndjson', period='this_month', chunk_size=1, stdout=out)
+        names = [json.loads(line)['name'] for line in out.getvalue().splitlines()]
+        self.assertEqual(names[:2], ['予約1', '予約2'])
+        with self.assertRaises(CommandError):
+            call_command('export_bookings', period='today', start=timezone.localdate(), stdout=out)
+
+
+@override_settings(BOOKING_SLOT_CAPACITY=10)
+class BookingRosterTests(TestCase):
+    """来店予定表のテスト"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+
+    def book(self, day, hour, people=2, count=1):
+        for i in range(count):
+            Booking.objects.create(
+                name=f'予約{i}', date=day, time=time(hour, 0), email=f'guest{i}@example.com',
+                phone_number='0312345678', number_of_people=people,
+            )
+
+    def test_groups_by_day_and_slot_in_service_order(self):
+        tomorrow = self.today + timedelta(days=1)
+        self.book(tomorrow, 12)
+        self.book(self.today, 18, people=3, count=2)
+        self.book(self.today, 11, people=1)
+        self.book(self.today - timedelta(days=1), 12)
+
+        days = build_roster(self.today, tomorrow)
+        self.assertEqual([day['date'] for day in days], [self.today, tomorrow])
+        self.assertEqual([slot['time'] for slot in days[0]['slots']], [time(11, 0), time(18, 0)])
+        self.assertEqual((days[0]['bookings'], days[0]['covers']), (3, 7))
+        slot = days[0]['slots'][1]
+        self.assertEqual((slot['bookings'], slot['covers']), (2, 6))
+        self.assertEqual(slot['seats_left'], 4)
+
+    def test_staff_only_and_unknown_period(self):
+        url = reverse('pages:booking-roster')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        url = reverse('pages:booking-roster-period', kwargs={'period': 'someday'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_today_is_the_local_date(self):
+        # UTC では前日の 20:00 でも、TIME_ZONE（Asia/Tokyo）では翌日の 05:00
+        now = datetime(2030, 1, 14, 20, 0, tzinfo=dt_timezone.utc)
+        self.book(date(2030, 1, 15), 12)
+        self.client.force_login(self.staff)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            response = self.client.get(reverse('pages:booking-roster-period', kwargs={'period': 'today'}))
+        self.assertEqual([day['date'] for day in response.context['days']], [date(2030, 1, 15)])
+
+    @override_settings(BOOKING_ROSTER_PAST_DAYS=90)
+    def test_past_bookings_are_limited_to_recent_days(self):
+        self.book(self.today - timedelta(days=91), 12)
+        self.book(self.today - timedelta(days=90), 12)
+        self.book(self.today - timedelta(days=1), 12)
+        self.book(self.today, 12)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('pages:booking-roster-period', kwargs={'period': 'past_booking'}))
+        self.assertEqual(
+            [day['date'] for day in response.context['days']],
+            [self.today - timedelta(days=90), self.today - timedelta(days=1)],
+        )
+        self.assertContains(response, '過去（90日間）')
+
+    def test_query_count_does_not_grow_with_bookings(self):
+        self.client.force_login(self.staff)
+        url = reverse('pages:booking-roster-period', kwargs={'period': 'this_week'})
+        self.book(self.today, 12)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for hour in (11, 13, 18):
+            self.book(self.today, hour, count=5)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(response.context['total_bookings'], 16)
+        self.assertContains(response, '18:00')
+
+
+class AdminChangelistTests(TestCase):
+    """管理画面の一覧のクエリ数のテスト"""
+
+    # ユーザー・件数・一覧（レビューは date_hierarchy の期間と日付の2件を加える）
+    REVIEW_QUERY_BUDGET = 5
+    BOOKING_QUERY_BUDGET = 3
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+    def create_reviews(self, count):
+        menu = Menu.objects.create(title=f'メニュー{Menu.objects.count()}', img='menu/coffee.jpg', alt='メニュー', price=500)
+        for i in range(count):
+            user = User.objects.create_user(f'reviewer{User.objects.count()}')
+            Review.objects.create(user=user, product=menu, rating=i % 5 + 1, title='感想', content='本文')
+
+    def create_bookings(self, count):
+        today = date.today()
+        for i in range(count):
+            Booking.objects.create(
+                name=f'予約{i}', date=today + timedelta(days=i % 7), time=time(12, 0),
+                email='guest@example.com', phone_number='0312345678', number_of_people=1,
+            )
+
+    def test_review_changelist_has_fixed_query_budget(self):
+        url = reverse('admin:pages_review_changelist')
+        self.create_reviews(2)
+        with self.assertNumQueries(self.REVIEW_QUERY_BUDGET):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_reviews(30)
+        with self.assertNumQueries(self.REVIEW_QUERY_BUDGET):
+            response = self.client.get(url)
+        # レビューの保存で件数キャッシュが破棄される
+        self.assertEqual(response.context['cl'].result_count, 32)
+        with self.assertNumQueries(self.REVIEW_QUERY_BUDGET):
+            self.client.get(url, {'rating__exact': 5})
+
+    def test_booking_changelist_has_fixed_query_budget(self):
+        url = reverse('admin:pages_booking_changelist')
+        self.create_bookings(2)
+        with self.assertNumQueries(self.BOOKING_QUERY_BUDGET):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_bookings(30)
+        with self.assertNumQueries(self.BOOKING_QUERY_BUDGET):
+            response = self.client.get(url, {'period': 'this_week'})
+        self.assertEqual(response.context['cl'].result_count, 32)
+
+    def test_review_form_uses_autocomplete(self):
+        self.create_reviews(1)
+        response = self.client.get(reverse('admin:pages_review_add'))
+        self.assertContains(response, 'class="admin-autocomplete"', count=2)
+
+
+class MenuRatingTests(TestCase):
+    """メニューの評価の集計のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reviewer', password='pass')
+        self.coffee = self.create_menu('コーヒー')
+        self.tea = self.create_menu('紅茶')
+
+    def create_menu(self, title):
+        return Menu.objects.create(title=title, img='menu/coffee.jpg', alt=title, price=500)
+
+    def review(self, menu, rating):
+        return Review.objects.create(user=self.user, product=menu, rating=rating, title='感想', content='本文')
+
+    def assertRating(self, menu, count, total, histogram):
+        rating = MenuRating.objects.get(menu=menu)
+        self.assertEqual((rating.review_count, rating.rating_sum), (count, total))
+        self.assertEqual(rating.histogram, dict(zip(range(1, 6), histogram)))
+
+    def test_aggregates_follow_create_update_and_delete(self):
+        first = self.review(self.coffee, 5)
+        self.review(self.coffee, 3)
+        self.assertRating(self.coffee, 2, 8, [0, 0, 1, 0, 1])
+        self.assertEqual(MenuRating.objects.get(menu=self.coffee).average, 4.0)
+
+        first.rating = 1
+        first.save()
+        self.assertRating(self.coffee, 2, 4, [1, 0, 1, 0, 0])
+
+        first.product = self.tea
+        first.save()
+        self.assertRating(self.coffee, 1, 3, [0, 0, 1, 0, 0])
+        self.assertRating(self.tea, 1, 1, [1, 0, 0, 0, 0])
+
+        first.delete()
+        self.assertRating(self.tea, 0, 0, [0, 0, 0, 0, 0])
+        self.assertIsNone(MenuRating.objects.get(menu=self.tea).average)
+
+    def test_rebuild_command_recomputes_from_reviews(self):
+        self.review(self.coffee, 4)
+        self.review(self.coffee, 2)
+        self.review(self.tea, 5)
+        MenuRating.objects.all().delete()
+        Review.objects.bulk_create([
+            Review(user=self.user, product=self.tea, rating=5, title='感想', content='本文'),
+        ])
+
+        call_command('rebuild_menu_ratings', stdout=io.StringIO())
+        self.assertRating(self.coffee, 2, 6, [0, 1, 0, 1, 0])
+        self.assertRating(self.tea, 2, 10, [0, 0, 0, 0, 2])
+
+    def test_menu_view_shows_ratings_without_extra_queries(self):
+        self.review(self.coffee, 4)
+        with CaptureQueriesContext(connection) as two_menus:
+            self.client.get(reverse('pages:menu'))
+
+        for i in range(5):
+            self.review(self.create_menu(f'ケーキ{i}'), 3)
+        cache.clear()
+        with self.assertNumQueries(len(two_menus)):
+            response = self.client.get(reverse('pages:menu'))
+        self.assertContains(response, '★4.0（1件のレビュー）')
+        self.assertContains(response, '★3.0（1件のレビュー）', count=5)
+
+    def test_review_changes_invalidate_menu_cache(self):
+        self.client.get(reverse('pages:menu'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(self.coffee, 2)
+        self.assertContains(self.client.get(reverse('pages:menu')), '★2.0（1件のレビュー）')
+
+
+class ImageDerivativeTests(TestCase):
+    """レスポンシブ画像の派生ファイルのテスト"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WIDTHS=[320, 640]))
+        cache.clear()
+
+    def upload(self, size=(1000, 500)):
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, (200, 100, 50, 255)).save(buffer, 'PNG')
+        return SimpleUploadedFile('coffee.png', buffer.getvalue(), content_type='image/png')
+
+    def create_menu(self, size=(1000, 500)):
+        with self.captureOnCommitCallbacks(execute=True):
+            menu = Menu.objects.create(title='コーヒー', img=self.upload(size), alt='コーヒー', price=500)
+        call_command('generate_image_derivatives', workers=1, stdout=io.StringIO())
+        menu.refresh_from_db()
+        return menu
+
+    def test_upload_is_processed_by_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            menu = Menu.objects.create(title='コーヒー', img=self.upload(), alt='コーヒー', price=500)
+        # リクエストのワーカーでは画像を処理せず、生成されるまでは元画像を表示する
+        menu.refresh_from_db()
+        self.assertEqual(menu.img_variants, {})
+        html = self.client.get(reverse('pages:menu')).content.decode()
+        self.assertIn(f'<img src="{menu.img.url}"', html)
+        self.assertNotIn('<picture>', html)
+
+        call_command('generate_image_derivatives', workers=1, stdout=io.StringIO())
+        menu.refresh_from_db()
+        variants = menu.img_variants
+        self.assertEqual(variants['source'], menu.img.name)
+        self.assertEqual(
+            sorted((item['format'], item['width'], item['height']) for item in variants['items']),
+            [('jpeg', 320, 160), ('jpeg', 640, 320), ('webp', 320, 160), ('webp', 640, 320)],
+        )
+        for item in variants['items']:
+            self.assertTrue(default_storage.exists(item['name']))
+
+        html = self.client.get(reverse('pages:menu')).content.decode()
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('-640w.jpg 640w', html)
+
+    def test_removing_the_image_deletes_derivatives(self):
+        menu = self.create_menu()
+        names = [item['name'] for item in menu.img_variants['items']]
+        menu.img = None
+        with self.captureOnCommitCallbacks(execute=True):
+            menu.save()
+        menu.refresh_from_db()
+        self.assertEqual(menu.img_variants, {})
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_backfill_command(self):
+        menu = self.create_menu((200, 100))
+        Menu.objects.filter(pk=menu.pk).update(img_variants={})
+
+        call_command('generate_image_derivatives', workers=1, stdout=io.StringIO())
+        menu.refresh_from_db()
+        # 元画像より大きい幅は作成せず、元画像の幅で作成する
+        self.assertEqual({item['width'] for item in menu.img_variants['items']}, {200})
+
+    def test_force_replaces_files_only_after_generating_new_ones(self):
+        menu = self.create_menu((200, 100))
+        old = {item['name'] for item in menu.img_variants['items']}
+
+        with mock.patch(
+            'pages.management.commands.generate_image_derivatives.ProcessPoolExecutor', ThreadPoolExecutor,
+        ), mock.patch('pages.images.Image.open', side_effect=OSError('broken')):
+            call_command('generate_image_derivatives', force=True, stdout=io.StringIO(), stderr=io.StringIO())
+        menu.refresh_from_db()
+        # 生成に失敗した場合は現在の派生ファイルをそのまま使用する
+        self.assertEqual({item['name'] for item in menu.img_variants['items']}, old)
+        self.assertTrue(all(default_storage.exists(name) for name in old))
+
+        call_command('generate_image_derivatives', workers=1, force=True, stdout=io.StringIO())
+        menu.refresh_from_db()
+        new = {item['name'] for item in menu.img_variants['items']}
+        self.assertFalse(new & old)
+        self.assertTrue(all(default_storage.exists(name) for name in new))
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+
+
+class SessionTests(TestCase):
+    """セッションのテスト"""
+
+    def test_serializer_round_trips_dates(self):
+        from cafeapp.sessions import SessionSerializer
+
+        serializer = SessionSerializer()
+        data = {
+            'date': date(2030, 1, 15),
+            'time': time(12, 30),
+            'at': timezone.now(),
+            'name': '山田 太郎',
+            'nested': [{'date': date(2030, 1, 16)}],
+        }
+        self.assertEqual(serializer.loads(serializer.dumps(data)), data)
+
+    def test_purge_sessions_deletes_expired_rows_in_batches(self):
+        from django.contrib.sessions.models import Session
+
+        now = timezone.now()
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+            for i in range(5)
+        ] + [Session(session_key='active', session_data='', expire_date=now + timedelta(days=1))])
+
+        out = io.StringIO()
+        call_command('purge_sessions', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['active'])
+
+
+class DatabasePoolTests(TestCase):
+    """データベース接続プールの状態のテスト"""
+
+    def test_pool_stats_requires_staff(self):
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        stats = {'pool_min': 2, 'pool_max': 10, 'pool_size': 2, 'pool_available': 1, 'requests_waiting': 0}
+        pool = mock.Mock(get_stats=mock.Mock(return_value=stats))
+        with mock.patch.object(type(connections['default']), 'pool', pool, create=True):
+            response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.json(), {'pools': {'default': stats}})
+
+
+class ServeCommandTests(TestCase):
+    """本番環境用の起動コマンドのテスト"""
+
+    def setUp(self):
+        patcher = mock.patch('cafeapp.gunicorn_config.workers', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_serve_migrates_once_and_execs_gunicorn(self):
+        with mock.patch('cafeapp.management.commands.serve.call_command') as command, \
+                mock.patch('cafeapp.management.commands.serve.shutil.which', return_value='/usr/bin/gunicorn'), \
+                mock.patch('cafeapp.management.commands.serve.os.execv') as execv:
+            # デフォルトは WSGI（ミドルウェアが同期のみのため）
+            call_command('serve', stdout=io.StringIO())
+
+        self.assertEqual(command.call_args_list, [mock.call('migrate', interactive=False)])
+        execv.assert_called_once_with('/usr/bin/gunicorn', [
+            '/usr/bin/gunicorn', '--config', 'python:cafeapp.gunicorn_config', 'cafeapp.wsgi:application',
+        ])
+
+    def test_serve_refuses_per_process_cache_with_multiple_workers(self):
+        with mock.patch('cafeapp.management.commands.serve.call_command'), \
+                mock.patch('cafeapp.management.commands.serve.shutil.which', return_value='/usr/bin/gunicorn'), \
+                mock.patch('cafeapp.management.commands.serve.os.execv') as execv, \
+                mock.patch('cafeapp.gunicorn_config.workers', 3):
+            locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+            with override_settings(CACHES=locmem), self.assertRaisesMessage(CommandError, 'GUNICORN_WORKERS=1'):
+                call_command('serve', stdout=io.StringIO())
+            execv.assert_not_called()
+
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/0'}}
+            with override_settings(CACHES=shared):
+                call_command('serve', stdout=io.StringIO())
+            execv.assert_called_once()
+
+
+def load_settings(**environ):
+    """環境変数を指定して settings.py を読み込み直す（設定値の組み立てのテスト用、None は未設定）"""
+    with mock.patch.dict(os.environ), mock.patch('dotenv.load_dotenv'):
+        for name, value in environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        return runpy.run_path(str(Path(__file__).resolve().parent.parent / 'cafeapp' / 'settings.py'))
+
+
+class SettingsTests(TestCase):
+    """環境変数から組み立てる設定のテスト"""
+
+    def test_asgi_worker_does_not_keep_persistent_connections(self):
+        self.assertEqual(load_settings(GUNICORN_WORKER_CLASS='gthread')['DATABASES']['default']['CONN_MAX_AGE'], 600)
+        self.assertEqual(load_settings(GUNICORN_WORKER_CLASS='uvicorn')['DATABASES']['default']['CONN_MAX_AGE'], 0)
+
+    def test_production_requires_site_url(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_SITE_URL'):
+            load_settings(DJANGO_DEBUG='False', DJANGO_SITE_URL=None)
+        settings = load_settings(
+            DJANGO_DEBUG='False', DJANGO_SITE_URL='https://cafe.example.com/',
+            DJANGO_CACHE_BACKEND=None, DJANGO_CACHE_LOCATION='redis://127.0.0.1:6379/1',
+        )
+        self.assertEqual(settings['SITE_URL'], 'https://cafe.example.com')
+
+    def test_production_requires_redis_or_memcached(self):
+        production = {
+            'DJANGO_DEBUG': 'False', 'DJANGO_SITE_URL': 'https://cafe.example.com',
+            'DJANGO_CACHE_BACKEND': None, 'DJANGO_CACHE_LOCATION': None,
+        }
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_CACHE_LOCATION'):
+            load_settings(**production)
+        # データベースのキャッシュには切り替えない
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(**{**production, 'DJANGO_CACHE_BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                             'DJANGO_CACHE_LOCATION': 'cafeapp_cache'})
+
+        caches = load_settings(**{**production, 'DJANGO_CACHE_LOCATION': 'redis://redis:6379/0'})['CACHES']
+        self.assertEqual(caches['default'], {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/0',
+        })
+        development = load_settings(DJANGO_DEBUG='True', DJANGO_CACHE_BACKEND=None)['CACHES']
+        self.assertEqual(development['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+    def test_session_engine_matches_the_cache_backend(self):
+        engine = 'django.contrib.sessions.backends.'
+        development = {'DJANGO_DEBUG': 'True', 'DJANGO_SESSION_ENGINE': None}
+        self.assertEqual(load_settings(**development, DJANGO_CACHE_BACKEND=None)['SESSION_ENGINE'], engine + 'cached_db')
+        production = {
+            'DJANGO_DEBUG': 'False', 'DJANGO_SITE_URL': 'https://cafe.example.com',
+            'DJANGO_SESSION_ENGINE': None, 'DJANGO_CACHE_BACKEND': None,
+        }
+        self.assertEqual(
+            load_settings(**production, DJANGO_CACHE_LOCATION='redis://redis:6379/0')['SESSION_ENGINE'],
+            engine + 'cached_db',
+        )
+
+        # DBのキャッシュでは、セッションをキャッシュに保存しない
+        database = {**development, 'DJANGO_CACHE_BACKEND': 'django.core.cache.backends.db.DatabaseCache'}
+        self.assertEqual(load_settings(**database)['SESSION_ENGINE'], engine + 'db')
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DJANGO_SESSION_ENGINE=cached_db'):
+            load_settings(**{**database, 'DJANGO_SESSION_ENGINE': 'cached_db'})
+        self.assertEqual(
+            load_settings(**{**database, 'DJANGO_SESSION_ENGINE': 'signed_cookies'})['SESSION_ENGINE'],
+            engine + 'signed_cookies',
+        )
+
+
+def slow_check(timeout=None):
+    """ヘルスチェックのテスト用（0.2秒かかるチェック）"""
+    import time as _time
+    _time.sleep(0.2)
+
+
+def hanging_check(timeout=None):
+    """ヘルスチェックのテスト用（応答しないチェック）"""
+    import time as _time
+    _time.sleep(1)
+
+
+class HealthCheckTests(TestCase):
+    """ヘルスチェックのテスト"""
+
+    def setUp(self):
+        from cafeapp import health_check
+        health_check._state.clear()
+        self.addCleanup(health_check._state.clear)
+        self.addCleanup(health_check._running.clear)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    @override_settings(HEALTH_CHECKS={
+        'first': {'check': 'pages.tests.slow_check'},
+        'second': {'check': 'pages.tests.slow_check'},
+    }, HEALTH_CHECK_CACHE_TTL=60)
+    def test_checks_run_concurrently_and_are_cached(self):
+        started = timezone.now()
+        data = self.client.get(reverse('health_check')).json()
+        self.assertLess((timezone.now() - started).total_seconds(), 0.35)
+        self.assertEqual(data['status'], 'healthy')
+        self.assertFalse(data['cached'])
+        self.assertGreaterEqual(data['checks']['first']['latency_ms'], 200)
+
+        # TTL内のプローブではチェックを実行しない
+        with mock.patch('pages.tests.slow_check') as check:
+            data = self.client.get(reverse('health_check')).json()
+        check.assert_not_called()
+        self.assertTrue(data['cached'])
+
+    @override_settings(HEALTH_CHECKS={
+        'database': {'check': 'pages.tests.hanging_check', 'timeout': 0.1},
+        'smtp': {'check': 'pages.tests.hanging_check', 'timeout': 0.1, 'critical': False},
+    })
+    def test_timeout_marks_critical_check_unhealthy(self):
+        response = self.client.get(reverse('health_check'))
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertEqual(data['status'], 'unhealthy')
+        self.assertEqual(data['checks']['database']['status'], 'timeout')
+        self.assertLess(data['checks']['database']['latency_ms'], 500)
+
+    @override_settings(HEALTH_CHECKS={
+        'database': {'check': 'pages.tests.hanging_check', 'timeout': 0.1},
+    }, HEALTH_CHECK_CACHE_TTL=0)
+    def test_hanging_check_is_not_submitted_again(self):
+        from cafeapp import health_check
+        with mock.patch.object(health_check._executor, 'submit', wraps=health_check._executor.submit) as submit:
+            for _ in range(3):
+                data = self.client.get(reverse('health_check')).json()
+                self.assertEqual(data['checks']['database']['status'], 'timeout')
+        # 応答しないチェックのスレッドは1つだけで、スレッドプールを使い切らない
+        self.assertEqual(submit.call_count, 1)
+
+    def test_checks_receive_their_timeout_and_skip_smtp_by_default(self):
+        from django.conf import settings
+        self.assertNotIn('smtp', settings.HEALTH_CHECKS)
+
+        received = []
+        with override_settings(HEALTH_CHECKS={'custom': {'check': 'pages.tests.slow_check', 'timeout': 1.5}}), \
+                mock.patch('pages.tests.slow_check', side_effect=lambda timeout: received.append(timeout)):
+            self.client.get(reverse('health_check'))
+        self.assertEqual(received, [1.5])
+
+    def test_database_check_sets_connect_timeout_for_its_connection(self):
+        from cafeapp.health_check import check_database
+        db = connections['default']
+        shared = db.settings_dict
+        with mock.patch.object(type(db), 'vendor', 'postgresql'), mock.patch.object(db, 'cursor'), \
+                mock.patch.object(db, 'settings_dict', {**shared, 'OPTIONS': {}}):
+            check_database(timeout=0.5)
+            self.assertEqual(db.settings_dict['OPTIONS'], {'connect_timeout': 2})
+            check_database(timeout=3.5)
+            self.assertEqual(db.settings_dict['OPTIONS'], {'connect_timeout': 4})
+        # 共有の設定は変更しない
+        self.assertNotIn('connect_timeout', shared.get('OPTIONS', {}))
+
+    def test_smtp_check_against_stand_in_server(self):
+        import socket
+        from cafeapp.health_check import check_smtp
+
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+
+        def stand_in():
+            # EHLO に応答するだけのSMTPサーバー
+            conn, _ = server.accept()
+            with conn, conn.makefile('rb') as reader:
+                conn.sendall(b'220 stand-in ESMTP\r\n')
+                for line in reader:
+                    if line.upper().startswith(b'QUIT'):
+                        conn.sendall(b'221 bye\r\n')
+                        break
+                    conn.sendall(b'250 stand-in\r\n')
+
+        thread = threading.Thread(target=stand_in)
+        thread.start()
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.getsockname()[1],
+        ):
+            check_smtp()
+        thread.join(timeout=5)
+
+    @override_settings(HEALTH_CHECK_WARMUP=['pages.holidays.warm_holiday_calendar'])
+    def test_readiness_requires_migrations_and_warm_caches(self):
+        with mock.patch('cafeapp.health_check.MigrationExecutor') as executor:
+            executor.return_value.migration_plan.return_value = [('pages', '9999_pending')]
+            response = self.client.get(reverse('readiness_check'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['reason'], 'migrations pending')
+
+        with mock.patch('pages.holidays.warm_holiday_calendar') as warm:
+            self.assertEqual(self.client.get(reverse('readiness_check')).status_code, 200)
+            self.client.get(reverse('readiness_check'))
+        warm.assert_called_once_with()
+
+
+class RequestMetricsTests(TestCase):
+    """リクエストの性能計測のテスト"""
+
+    def setUp(self):
+        from cafeapp.metrics import reset_metrics
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+
+    def test_metrics_require_staff_or_token(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, 302)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_records_per_view_histograms(self):
+        self.client.get(reverse('pages:news'))
+        self.client.get(reverse('pages:news'))
+
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('cafeapp_request_duration_seconds_count{view="pages:news"} 2', body)
+        self.assertIn('cafeapp_responses_total{view="pages:news",method="GET",status="200"} 2', body)
+        self.assertIn('cafeapp_request_template_seconds_count{view="pages:news"} 2', body)
+        # 初回はキャッシュがないため、ニュースの取得クエリが記録される
+        self.assertNotIn('cafeapp_request_queries_bucket{view="pages:news",le="0"} 2', body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        from cafeapp.metrics import render_metrics
+        self.client.get(reverse('pages:news'))
+        self.assertNotIn('pages:news', render_metrics())
+
+    @override_settings(METRICS_N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_queries_are_flagged_as_n_plus_one(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from cafeapp.metrics import RequestMetricsMiddleware, render_metrics
+
+        for i in range(3):
+            News.objects.create(category='event', title=f'お知らせ{i}', text='本文')
+
+        def view(request):
+            for news in News.objects.all():
+                News.objects.get(pk=news.pk)
+            return HttpResponse()
+
+        with self.assertLogs('cafeapp.metrics', 'WARNING'):
+            RequestMetricsMiddleware(view)(RequestFactory().get('/news/'))
+        self.assertIn('cafeapp_n_plus_one_total{view="<unresolved>"} 1', render_metrics())
+
+
+class BenchmarkSuiteTests(TestCase):
+    """ベンチマーク用データとシナリオのテスト"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_seed_is_reproducible_and_clearable(self):
+        from cafeapp.benchmarks import SEED_PREFIX
+        out = io.StringIO()
+        call_command('seed_benchmark_data', news=12, menus=3, users=2, reviews=10, bookings=20, stdout=out)
+        self.assertEqual(News.objects.filter(title__startswith=SEED_PREFIX).count(), 12)
+        self.assertEqual(Review.objects.count(), 10)
+        self.assertEqual(BookingSlot.objects.aggregate(total=Sum('seats_taken'))['total'],
+                         Booking.objects.aggregate(total=Sum('number_of_people'))['total'])
+        ratings = list(Review.objects.order_by('title').values_list('rating', flat=True))
+
+        call_command('seed_benchmark_data', news=0, menus=3, users=2, reviews=10, bookings=0,
+                     clear=True, stdout=out)
+        self.assertFalse(News.objects.exists())
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(list(Review.objects.order_by('title').values_list('rating', flat=True)), ratings)
+
+    def test_seed_invalidates_caches_and_clear_removes_the_image(self):
+        from cafeapp.benchmarks import SEED_IMAGE
+        from pages.caching import get_generation
+        namespaces = ['news', 'menu', 'news-feed', 'count:pages.news', 'count:pages.review']
+        before = [get_generation(namespace) for namespace in namespaces]
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('seed_benchmark_data', news=2, menus=2, users=1, reviews=2, bookings=0, stdout=io.StringIO())
+        after = [get_generation(namespace) for namespace in namespaces]
+        for namespace, old, new in zip(namespaces, before, after):
+            self.assertNotEqual(old, new, namespace)
+        self.assertTrue(default_storage.exists(SEED_IMAGE))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('seed_benchmark_data', news=0, menus=0, users=0, reviews=0, bookings=0,
+                         clear=True, stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(SEED_IMAGE))
+
+    def test_scenarios_report_queries_and_compare_with_baseline(self):
+        from cafeapp.benchmarks import SCENARIOS
+        baseline = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        baseline.close()
+        self.addCleanup(lambda: os.remove(baseline.name))
+        out = io.StringIO()
+        call_command('run_benchmarks', *SCENARIOS, iterations=1, warmup=0, seed=False,
+                     baseline=Path(baseline.name), save_baseline=True, stdout=out)
+        baseline_data = json.loads(Path(baseline.name).read_text())
+        self.assertEqual(baseline_data['vendor'], connection.vendor)
+        results = baseline_data['scenarios']
+        self.assertEqual(set(results), set(SCENARIOS))
+        self.assertIn('POST pages:booking-confirm', results['booking_funnel'])
+        self.assertIsNotNone(results['booking_funnel']['POST pages:booking-confirm']['queries'])
+        # シナリオで作成した予約はロールバックされる
+        self.assertFalse(Booking.objects.exists())
+
+        results['menu_browse']['GET pages:menu']['queries'] = -1
+        Path(baseline.name).write_text(json.dumps(baseline_data))
+        with self.assertRaisesMessage(CommandError, 'menu_browse GET pages:menu'):
+            call_command('run_benchmarks', 'menu_browse', iterations=1, queries_only=True,
+                         baseline=Path(baseline.name), stdout=out)
+
+        # 別の種類のデータベースで記録したベースラインとは比較しない
+        Path(baseline.name).write_text(json.dumps({**baseline_data, 'vendor': 'postgresql'}))
+        with self.assertRaisesMessage(CommandError, 'recorded on postgresql'):
+            call_command('run_benchmarks', 'menu_browse', iterations=1, queries_only=True,
+                         baseline=Path(baseline.name), stdout=out)
+
+    def test_commit_callbacks_run_for_each_request(self):
+        with mock.patch('pages.signals.invalidate_availability') as invalidate:
+            call_command('run_benchmarks', 'booking_funnel', iterations=2, warmup=0,
+                         baseline=Path(tempfile.gettempdir()) / 'missing-baseline.json', stdout=io.StringIO())
+        # 予約の確定ごとにコミット後の予約枠キャッシュの破棄が実行される
+        self.assertEqual(invalidate.call_count, 2)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_unknown_scenario_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown scenarios: checkout'):
+            call_command('run_benchmarks', 'menu_browse', 'checkout', stdout=io.StringIO())
+
+
+class StaticFilesStorageTests(TestCase):
+    """本番環境用の静的ファイルストレージのテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        # Tailwind CSSのビルド結果（static/dist/output.css）の代わり
+        build_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, build_dir)
+        os.makedirs(os.path.join(build_dir, 'dist'))
+        with open(os.path.join(build_dir, 'dist', 'output.css'), 'w') as f:
+            f.write('body { margin: 0; }\n')
+        cls.settings = override_settings(
+            STATIC_ROOT=cls.static_root,
+            STATICFILES_DIRS=[Path(__file__).resolve().parent.parent / 'static', build_dir],
+            STATIC_MANIFEST=True,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'cafeapp.storage.OptimizedStaticFilesStorage'},
+            },
+            STATIC_IMAGE_MAX_BYTES=500 * 1024,
+        )
+        cls.settings.enable()
+        cls.addClassCleanup(cls.settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def setUp(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        self.storage = staticfiles_storage
+        self.storage.hashed_files, self.storage.manifest_hash = self.storage.load_manifest()
+
+    def test_collectstatic_hashes_and_compresses(self):
+        url = self.storage.url('pages/images/complete-bg.jpg')
+        name = url.removeprefix('/static/')
+        self.assertRegex(name, r'complete-bg\.[0-9a-f]{12}\.jpg$')
+        # 大きな背景画像は縮小・再圧縮される
+        self.assertLess(self.storage.size(name), 500 * 1024)
+        # CSS内の参照もハッシュ付きのファイル名に置き換わる
+        css = self.storage.url('src/input.css').removeprefix('/static/')
+        self.assertTrue(self.storage.exists(css + '.br'))
+        with self.storage.open(css) as f:
+            self.assertIn(url, f.read().decode())
+
+    def test_pages_render_with_manifest(self):
+        for name in ('pages:index', 'pages:news', 'pages:menu', 'pages:booking', 'pages:contact'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertRegex(response.content.decode(), r'/static/pages/images/favicon\.[0-9a-f]{12}\.png')
+
+    def test_missing_files_fail_loudly(self):
+        with self.assertRaisesMessage(ValueError, "Missing staticfiles manifest entry for 'dist/missing.css'"):
+            self.storage.url('dist/missing.css')
+
+    @mock.patch('cafeapp.gunicorn_config.workers', 1)
+    def test_serve_collects_static_files_only_without_manifest(self):
+        with mock.patch('cafeapp.management.commands.serve.call_command') as command, \
+                mock.patch('cafeapp.management.commands.serve.shutil.which', return_value='/usr/bin/gunicorn'), \
+                mock.patch('cafeapp.management.commands.serve.os.execv'):
+            call_command('serve', '--skip-migrate', stdout=io.StringIO())
+            command.assert_not_called()
+
+            self.storage.manifest_storage.delete(self.storage.manifest_name)
+            self.addCleanup(call_command, 'collectstatic', interactive=False, verbosity=0)
+            call_command('serve', '--skip-migrate', stdout=io.StringIO())
+            command.assert_called_once_with('collectstatic', interactive=False, verbosity=0)
+
+
+class HolidayCalendarTests(TestCase):
+    """祝日カレンダーのテスト"""
+
+    def test_matches_jpholiday(self):
+        start = date.today()
+        end = start + timedelta(days=90)
+        expected = [holiday[0] for holiday in jpholiday.between(start, end)]
+
+        self.assertEqual(get_holidays(start, end), expected)
+        self.assertEqual(
+            json.loads(get_holidays_json(start, end)),
+            [holiday.strftime('%Y/%m/%d') for holiday in expected],
+        )
+
+    def test_booking_view_uses_serialized_holidays(self):
+        response = self.client.get(reverse('pages:booking'))
+        holidays = json.loads(response.context['holidays_json'])
+        self.assertTrue(all(len(holiday) == 10 for holiday in holidays))
+
+
+@override_settings(BOOKING_SLOT_CAPACITY=10)
+class BookingSlotConcurrencyTests(TransactionTestCase):
+    """同じ予約枠への同時予約のテスト"""
+
+    def test_parallel_confirmations_never_overbook(self):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def confirm():
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        Booking.objects.create(
+                            name='山田 太郎', date=date(2030, 1, 15), time=time(12, 0),
+                            email='guest@example.com', phone_number='0312345678', number_of_people=3,
+                        )
+                        results.append('booked')
+                    except SlotFullError:
+                        results.append('full')
+                    except OperationalError:
+                        # SQLiteではテーブルロック中の書き込みが失敗するため再試行する
+                        continue
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=confirm) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        slot = BookingSlot.objects.get(date=date(2030, 1, 15), time=time(12, 0))
+        self.assertEqual(results.count('booked'), 3)
+        self.assertEqual(results.count('full'), 5)
+        self.assertEqual(slot.seats_taken, 9)
+        self.assertEqual(Booking.objects.count(), 3)
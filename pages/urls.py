@@ -1,6 +1,7 @@
 from django.urls import path
 
 from . import views
+from .feeds import news_feed
 
 app_name = 'pages'
 
@@ -17,14 +18,21 @@ urlpatterns = [
     # ニュース
     path('news/', views.NewsView.as_view(), name='news'),
     path('news/category/<str:category>/', views.NewsCategoryView.as_view(), name='news-category'),
+    path('news/search/', views.NewsSearchView.as_view(), name='news-search'),
+    path('news/feed.<str:fmt>', news_feed, name='news-feed'),
+    path('news/category/<str:category>/feed.<str:fmt>', news_feed, name='news-category-feed'),
     path('news/create/', views.CreateNewsView.as_view(), name='news-create'),
     path('news/posted/', views.PostedNewsView.as_view(), name='news-posted'),
     
     # 予約
     path('booking/', views.BookingView.as_view(), name='booking'),
+    path('booking/availability/', views.BookingAvailabilityView.as_view(), name='booking-availability'),
     path('booking/confirm/', views.BookingConfirmView.as_view(), name='booking-confirm'),
     path('booking/complete/', views.BookingCompleteView.as_view(), name='booking-complete'),
     path('booking/list/', views.BookingListView.as_view(), name='booking-list'),
+    path('booking/roster/', views.BookingRosterView.as_view(), name='booking-roster'),
+    path('booking/roster/<str:period>/', views.BookingRosterView.as_view(), name='booking-roster-period'),
+    path('booking/export.<str:fmt>', views.BookingExportView.as_view(), name='booking-export'),
     path('booking/list/<str:date>/', views.BookingDateView.as_view(), name='booking-date'),
     
     # お問い合わせ
@@ -1,20 +1,38 @@
 from typing import Any
-from datetime import datetime, timedelta
-import calendar
+from datetime import date, datetime
+import hashlib
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import user_passes_test
-from django.core.mail import send_mail
-from django.db.models import QuerySet
-from django.http import Http404, HttpRequest, HttpResponse
-from django.shortcuts import render, redirect
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.db.models import Count, Max, QuerySet
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseBadRequest, QueryDict, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.utils.safestring import mark_safe
 from django.views import generic
-import jpholiday
 
-from .models import News, Menu, Booking
+from .models import News, Menu, Booking, SlotFullError
 from .forms import NewsForm, MenuForm, BookingForm, ContactForm
+from .availability import build_roster, get_availability, get_booking_window
+from .caching import aget_generation, amake_key
+from .exports import EXPORT_FORMATS, PERIOD_CHOICES, PERIODS, aiter_export, get_bookings, get_period_range, iter_export
+from .holidays import get_holidays_json
+from .mail import aenqueue_mail, enqueue_mail
+from .pagination import CachedCountPaginator, KeysetPage, KeysetPaginator
+from .search import search_news
 
 
 def is_superuser(user) -> bool:
@@ -23,9 +41,37 @@ def is_superuser(user) -> bool:
 
 
 class PaginationMixin:
-    """ページネーション機能を提供するMixin"""
+    """
+    ページネーション機能を提供するMixin
+
+    pagination_mode = 'keyset' を指定すると、keyset_key と id をキーにした
+    カーソル方式（?cursor=...）でページを区切る。
+    ?page=N で直接指定された場合は従来のOFFSET方式で表示する。
+    ページのリンクには page・cursor と page_query_params のクエリパラメーターだけを引き継ぐ
+    （描画結果をキャッシュする一覧に、任意のパラメーターが入らないようにする）。
+    """
     
     paginate_by = 10
+    paginator_class = CachedCountPaginator
+    pagination_mode = 'offset'
+    keyset_key = 'created_at'
+    page_query_params: tuple[str, ...] = ()
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.pagination_mode != 'keyset':
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, key=self.keyset_key)
+        cursor = self.request.GET.get('cursor')
+        if not cursor and self.request.GET.get('page', '1') != '1':
+            # カーソル方式と同じ並び順でOFFSET方式のページを返す
+            return super().paginate_queryset(paginator.queryset, page_size)
+
+        try:
+            page_obj = paginator.page(cursor)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page_obj, page_obj.object_list, page_obj.has_other_pages()
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
@@ -51,9 +97,136 @@ class PaginationMixin:
             pages = range(current_page - 2, current_page + 3)
 
         context['pages'] = pages
+        context.update(self.get_page_links(context['page_obj'], pages))
+        return context
+
+    def get_page_links(self, page_obj, pages) -> dict[str, Any]:
+        """ページ番号ごとのリンク先を返す"""
+        if not isinstance(page_obj, KeysetPage):
+            return {
+                'first_page_url': self.get_page_url(1),
+                'page_links': [(page_num, self.get_page_url(page_num)) for page_num in pages],
+                'last_page_url': self.get_page_url(page_obj.paginator.num_pages),
+            }
+
+        paginator = page_obj.paginator
+        cursors = paginator.get_page_cursors(page_obj, pages)
+        page_links = []
+        for page_num in pages:
+            if page_num == 1:
+                page_links.append((page_num, self.get_page_url(1)))
+            elif page_num == page_obj.number:
+                cursor = self.request.GET.get('cursor')
+                url = self.get_page_url(cursor=cursor) if cursor else self.get_page_url(page_num)
+                page_links.append((page_num, url))
+            elif page_num in cursors:
+                page_links.append((page_num, self.get_page_url(cursor=cursors[page_num])))
+        last_cursor = paginator.encode_cursor(paginator.num_pages, 'last')
+        return {
+            'first_page_url': self.get_page_url(1),
+            'page_links': page_links,
+            'last_page_url': self.get_page_url(cursor=last_cursor),
+        }
+
+    def get_page_url(self, page_num: int | None = None, cursor: str | None = None) -> str:
+        """ページのリンク先（page_query_params 以外のクエリパラメーターは引き継がない）"""
+        params = QueryDict(mutable=True)
+        for name in self.page_query_params:
+            if name in self.request.GET:
+                params.setlist(name, self.request.GET.getlist(name))
+        if cursor is not None:
+            params['cursor'] = cursor
+        else:
+            params['page'] = page_num
+        return f'?{params.urlencode()}'
+
+
+class ContentCacheMixin:
+    """
+    一覧部分（content_template_name）の描画結果をキャッシュするMixin
+
+    キャッシュキーには cache_namespace の世代番号とURL・ページ指定を含め、
+    投稿の保存・削除時に世代番号を進めて破棄する。
+    キャッシュがあればクエリを実行せずにページを返す。
+    スーパーユーザーは常に最新の内容を表示する。
+    """
+    
+    cache_namespace = ''
+    content_template_name = ''
+    cache_query_params = ('page', 'cursor')
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        # ユーザーはキーを作成する前に取得し、キャッシュの有無に関わらず同じユーザーで描画する
+        # （取得済みのユーザーを渡し、描画・同期処理で再度検索しないようにする）
+        user = await request.auser()
+        request.user = user
+        variant = 'user' if user.is_authenticated else 'anonymous'
+        params = [request.GET.get(name, '') for name in self.cache_query_params]
+        self.content_cache_key = await amake_key(self.cache_namespace, request.path, variant, *params)
+
+        # キャッシュがある場合はスレッドを使わずに応答する（描画はレスポンス返却時に行われる）
+        if not user.is_superuser:
+            content = await cache.aget(self.content_cache_key)
+            if content is not None:
+                return self.response_class(
+                    request=request,
+                    template=[self.template_name],
+                    context={'view': self, 'content': mark_safe(content)},
+                    using=self.template_engine,
+                )
+        # 一覧の検索・ページネーションは同期処理で行う
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        content = render_to_string(self.content_template_name, context, self.request)
+        if not self.request.user.is_superuser:
+            cache.set(self.content_cache_key, content, settings.CONTENT_CACHE_TIMEOUT)
+        context['content'] = mark_safe(content)
         return context
 
 
+class ConditionalGetMixin:
+    """
+    一覧ページに ETag を付与し、変更がなければ 304 を返すMixin
+
+    検証値は MAX(created_at) と件数から求め、cache_namespace の世代番号ごとに
+    キャッシュする。投稿の編集・削除でも世代番号が変わるため ETag は更新される。
+    Last-Modified は編集・削除・ログイン状態による違いを表せないため付与しない
+    （If-Modified-Since だけのリクエストには常に本文を返す）。
+    ContentCacheMixin と組み合わせて使用する。
+    """
+
+    async def get_etag(self) -> str:
+        key = await amake_key(self.cache_namespace, 'validators', self.request.path)
+        stats = await cache.aget(key)
+        if stats is None:
+            stats = await self.get_queryset().order_by().aaggregate(
+                last_modified=Max('created_at'),
+                count=Count('pk'),
+            )
+            await cache.aset(key, stats, settings.CONTENT_CACHE_TIMEOUT)
+
+        user = await self.request.auser()
+        variant = 'superuser' if user.is_superuser else 'user' if user.is_authenticated else 'anonymous'
+        params = [self.request.GET.get(name, '') for name in self.cache_query_params]
+        value = '|'.join(str(part) for part in [
+            await aget_generation(self.cache_namespace), stats['last_modified'], stats['count'],
+            self.request.path, variant, *params,
+        ])
+        return '"{}"'.format(hashlib.md5(value.encode()).hexdigest())
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        etag = await self.get_etag()
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
 class ReferrerRequiredMixin:
     """リファラーが必要なビューに使用するMixin"""
     
@@ -70,16 +243,21 @@ class IndexView(generic.TemplateView):
 
 
 # メニュー関連
-class MenuView(generic.ListView):
+class MenuView(ConditionalGetMixin, ContentCacheMixin, generic.ListView):
     """メニュー一覧ビュー"""
     template_name = 'pages/menu.html'
+    content_template_name = 'pages/includes/menu_list.html'
+    cache_namespace = 'menu'
     model = Menu
     context_object_name = 'object_list'
 
+    def get_queryset(self) -> QuerySet[Menu]:
+        # 評価の集計は同じクエリで結合して取得する（メニューごとの集計クエリは発行しない）
+        return Menu.objects.select_related('rating')
+
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
-        context = super().get_context_data(**kwargs)
-        context['category_display_names'] = dict(News.Category.choices)
-        return context
+        kwargs['category_display_names'] = dict(News.Category.choices)
+        return super().get_context_data(**kwargs)
 
 
 class DetailMenuView(generic.TemplateView):
@@ -113,16 +291,22 @@ class PostedMenuView(ReferrerRequiredMixin, generic.TemplateView):
 
 
 # ニュース関連
-class NewsView(PaginationMixin, generic.ListView):
+class NewsView(ConditionalGetMixin, ContentCacheMixin, PaginationMixin, generic.ListView):
     """ニュース一覧ビュー"""
+    pagination_mode = 'keyset'
     template_name = 'pages/news.html'
+    content_template_name = 'pages/includes/news_list.html'
+    cache_namespace = 'news'
     model = News
     context_object_name = 'object_list'
 
 
-class NewsCategoryView(PaginationMixin, generic.ListView):
+class NewsCategoryView(ConditionalGetMixin, ContentCacheMixin, PaginationMixin, generic.ListView):
     """カテゴリー別ニュース一覧ビュー"""
+    pagination_mode = 'keyset'
     template_name = 'pages/news.html'
+    content_template_name = 'pages/includes/news_list.html'
+    cache_namespace = 'news'
     model = News
     context_object_name = 'object_list'
 
@@ -135,9 +319,9 @@ class NewsCategoryView(PaginationMixin, generic.ListView):
         return News.objects.filter(category=category)
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
-        context = super().get_context_data(**kwargs)
-        context['category_name'] = getattr(self, 'category_name', None)
-        return context
+        # 一覧部分の描画前にカテゴリー名を渡す
+        kwargs['category_name'] = getattr(self, 'category_name', None)
+        return super().get_context_data(**kwargs)
 
 
 @method_decorator(user_passes_test(is_superuser, login_url='pages:news'), name='dispatch')
@@ -153,6 +337,21 @@ class CreateNewsView(generic.CreateView):
         return response
 
 
+class NewsSearchView(PaginationMixin, generic.ListView):
+    """ニュース検索ビュー（関連度の高い順）"""
+    template_name = 'pages/news_search.html'
+    context_object_name = 'object_list'
+    page_query_params = ('q',)
+
+    def get_queryset(self) -> QuerySet[News]:
+        self.query = self.request.GET.get('q', '').strip()[:100]
+        return search_news(News.objects.all(), self.query)
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        kwargs['search_query'] = self.query
+        return super().get_context_data(**kwargs)
+
+
 class PostedNewsView(ReferrerRequiredMixin, generic.TemplateView):
     """ニュース投稿完了ビュー"""
     template_name = 'pages/news_posted.html'
@@ -174,16 +373,12 @@ class BookingView(generic.CreateView):
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         today = datetime.now().date()
-        next_day = today + timedelta(days=1)
-        three_months_later = today + timedelta(days=90)
-        holidays_list = [
-            holiday[0] for holiday in jpholiday.between(today, three_months_later)
-        ]
+        next_day, three_months_later = get_booking_window(today)
 
         context = super().get_context_data(**kwargs)
         context['next_day'] = next_day
         context['three_months_later'] = three_months_later
-        context['holidays_list'] = holidays_list
+        context['holidays_json'] = get_holidays_json(today, three_months_later)
         return context
 
     def form_valid(self, form) -> HttpResponse:
@@ -191,53 +386,103 @@ class BookingView(generic.CreateView):
         return redirect(reverse('pages:booking-confirm'))
 
 
-class BookingConfirmView(ReferrerRequiredMixin, generic.TemplateView):
-    """予約確認ビュー"""
-    template_name = 'pages/booking_confirm.html'
+class BookingAvailabilityView(generic.View):
+    """予約枠の空き状況API（datepicker用）"""
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        body, etag = get_availability()
+
+        # 内容が変わっていなければ 304 を返す
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
 
-    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
-        booking_data = self.request.session.get('booking_data')
-        context = super().get_context_data(**kwargs)
-        context['booking_data'] = booking_data
-        return context
 
-    def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
-        booking_data = request.session.get('booking_data')
+class BookingConfirmView(ReferrerRequiredMixin, generic.TemplateView):
+    """予約確認ビュー（非同期）"""
+    template_name = 'pages/booking_confirm.html'
+    invalid_message = '予約内容を確認できませんでした。お手数ですが、もう一度入力してください。'
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        booking_data = await request.session.aget('booking_data')
+        booking = self.get_booking(booking_data) if booking_data else None
+        if booking_data and booking is None:
+            return await self.restart(request)
+        context = self.get_context_data(booking_data=booking, **kwargs)
+        return self.render_to_response(context)
+
+    async def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        booking_data = await request.session.aget('booking_data')
         if not booking_data:
             return redirect('pages:booking')
+        booking = self.get_booking(booking_data)
+        if booking is None:
+            return await self.restart(request)
 
-        # メールの送信
+        # データの保存と確認メールの送信キュー登録
         try:
-            send_mail(
-                'WebCafeご予約内容確認メール',
-                f'ご予約者様: {booking_data["name"]}\n\n'
-                f'ご来店日: {booking_data["date"]}\n\n'
-                f'ご来店時間: {booking_data["time"]}\n\n'
-                f'ご来客人数: {booking_data["number_of_people"]}',
-                settings.EMAIL_HOST_USER,
-                [booking_data['email']],
-                fail_silently=False,
-            )
-        except Exception as e:
-            # メール送信に失敗してもデータは保存する
-            print(f"メール送信エラー: {e}")
-
-        # dateとtimeを文字列からオブジェクトに変換
-        booking_data['date'] = datetime.strptime(
-            booking_data['date'], '%Y/%m/%d'
-        ).date()
-        booking_data['time'] = datetime.strptime(
-            booking_data['time'], '%H:%M'
-        ).time()
-
-        # データの保存
-        Booking.objects.create(**booking_data)
+            await sync_to_async(self.create_booking)(booking)
+        except SlotFullError:
+            # 確認画面の表示後に満席になった場合
+            return TemplateResponse(request, self.template_name, {
+                'booking_data': booking,
+                'slot_full': True,
+            })
 
         # セッションからデータを削除
-        del request.session['booking_data']
+        await request.session.apop('booking_data')
 
         return redirect('pages:booking-complete')
 
+    async def restart(self, request: HttpRequest) -> HttpResponse:
+        """セッションの予約データが不正な場合は、入力画面からやり直してもらう"""
+        await request.session.apop('booking_data')
+        messages.error(request, self.invalid_message)
+        return redirect('pages:booking')
+
+    def get_booking(self, booking_data: dict[str, Any]) -> Booking | None:
+        """
+        セッションの予約データから保存前の予約を作成し、項目を検証する（不正な場合は None）
+
+        date / time はセッションのシリアライザーがオブジェクトとして復元するが、
+        以前のシリアライザーで保存されたセッションには文字列（yyyy/mm/dd・HH:MM）で入っている。
+        """
+        fields = {name: booking_data.get(name) for name in BookingForm.Meta.fields}
+        if isinstance(fields['date'], str):
+            try:
+                fields['date'] = datetime.strptime(fields['date'], '%Y/%m/%d').date()
+            except ValueError:
+                pass  # ISO形式などは clean_fields で変換・検証する
+        booking = Booking(**fields)
+        try:
+            booking.clean_fields()
+        except ValidationError:
+            return None
+        return booking
+
+    def create_booking(self, booking: Booking) -> Booking:
+        """
+        予約を保存し、確認メールを送信キューに登録する
+
+        予約枠の席数の更新とメールの登録を1つのトランザクションで行うため、同期処理で実行する。
+        """
+        with transaction.atomic():
+            booking.save()
+            if booking.email:
+                enqueue_mail(
+                    'WebCafeご予約内容確認メール',
+                    f'ご予約者様: {booking.name}\n\n'
+                    f'ご来店日: {booking.date:%Y/%m/%d}\n\n'
+                    f'ご来店時間: {booking.time:%H:%M}\n\n'
+                    f'ご来客人数: {booking.number_of_people}',
+                    settings.EMAIL_HOST_USER,
+                    [booking.email],
+                )
+        return booking
+
 
 class BookingCompleteView(ReferrerRequiredMixin, generic.TemplateView):
     """予約完了ビュー"""
@@ -246,6 +491,7 @@ class BookingCompleteView(ReferrerRequiredMixin, generic.TemplateView):
 
 class BookingListView(PaginationMixin, generic.ListView):
     """予約一覧ビュー"""
+    pagination_mode = 'keyset'
     template_name = 'pages/booking_list.html'
     model = Booking
     context_object_name = 'booking_list'
@@ -253,68 +499,94 @@ class BookingListView(PaginationMixin, generic.ListView):
 
 class BookingDateView(PaginationMixin, generic.ListView):
     """期間別予約一覧ビュー"""
+    pagination_mode = 'keyset'
     template_name = 'pages/booking_list.html'
     model = Booking
     context_object_name = 'booking_list'
 
     def get_queryset(self) -> QuerySet[Booking]:
-        today = datetime.today().date()
-        date = self.kwargs.get('date')
-
-        # 期間の計算
-        date_ranges = {
-            'today': (today, today),
-            'tomorrow': (today + timedelta(days=1), today + timedelta(days=1)),
-            'this_week': (today, today + timedelta(days=(6 - today.weekday()))),
-            'this_month': (
-                today,
-                datetime(
-                    today.year,
-                    today.month,
-                    calendar.monthrange(today.year, today.month)[1]
-                ).date()
-            ),
-            'next_month': self._get_next_month_range(today),
-            'past_booking': (None, today - timedelta(days=1)),
-        }
-
-        start_date, end_date = date_ranges.get(date, (today, today))
-
+        start_date, end_date = get_period_range(self.kwargs.get('date'), timezone.localdate())
         if start_date is None:
             return Booking.objects.filter(date__lte=end_date)
         return Booking.objects.filter(date__range=(start_date, end_date))
 
-    def _get_next_month_range(self, today):
-        """来月の日付範囲を取得"""
-        if today.month == 12:
-            start_date = datetime(today.year + 1, 1, 1).date()
-            end_date = datetime(
-                today.year + 1, 1,
-                calendar.monthrange(today.year + 1, 1)[1]
-            ).date()
-        else:
-            start_date = datetime(today.year, today.month + 1, 1).date()
-            end_date = datetime(
-                today.year, today.month + 1,
-                calendar.monthrange(today.year, today.month + 1)[1]
-            ).date()
-        return start_date, end_date
-
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
         context['selected_period'] = self.kwargs.get('date')
         return context
 
 
+@method_decorator(staff_member_required, name='dispatch')
+class BookingRosterView(generic.TemplateView):
+    """来店予定表ビュー（スタッフのみ、日別・時間別の予約件数と人数）"""
+    template_name = 'pages/booking_roster.html'
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        period = self.kwargs.get('period', 'this_week')
+        if period not in PERIODS:
+            raise Http404('Unknown period')
+        # 過去の予約は日ごとの表が際限なく長くならないよう、直近の BOOKING_ROSTER_PAST_DAYS 日に限る
+        start, end = get_period_range(period, timezone.localdate(), past_days=settings.BOOKING_ROSTER_PAST_DAYS)
+        days = build_roster(start, end)
+        context.update({
+            'selected_period': period,
+            'past_days': settings.BOOKING_ROSTER_PAST_DAYS,
+            'days': days,
+            'total_bookings': sum(day['bookings'] for day in days),
+            'total_covers': sum(day['covers'] for day in days),
+            'capacity': settings.BOOKING_SLOT_CAPACITY,
+            'periods': PERIOD_CHOICES,
+        })
+        return context
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class BookingExportView(generic.View):
+    """
+    予約のエクスポート（スタッフのみ、CSV または NDJSON）
+
+    ?period=today 等（期間別予約一覧と同じ期間）または ?start=YYYY-MM-DD&end=YYYY-MM-DD で
+    期間を指定する（指定しない場合は全件）。ストリーミングで返すため件数が多くてもメモリを消費しない。
+    """
+
+    def get(self, request: HttpRequest, fmt: str) -> HttpResponse:
+        if fmt not in EXPORT_FORMATS:
+            raise Http404('Unknown export format')
+
+        period = request.GET.get('period')
+        if period:
+            if period not in PERIODS:
+                return HttpResponseBadRequest(f'period must be one of: {", ".join(PERIODS)}')
+            start, end = get_period_range(period, timezone.localdate())
+            label = period
+        else:
+            try:
+                start, end = (
+                    date.fromisoformat(request.GET[name]) if request.GET.get(name) else None
+                    for name in ('start', 'end')
+                )
+            except ValueError:
+                return HttpResponseBadRequest('start and end must be dates (YYYY-MM-DD)')
+            label = f'{start or "all"}_{end or "all"}'
+
+        blocks = iter_export(get_bookings(start, end), fmt, settings.BOOKING_EXPORT_CHUNK_SIZE)
+        if isinstance(request, ASGIRequest):
+            blocks = aiter_export(blocks)
+        response = StreamingHttpResponse(blocks, content_type=EXPORT_FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="bookings-{label}.{fmt}"'
+        return response
+
+
 # お問い合わせ関連
 class ContactView(generic.View):
-    """お問い合わせビュー"""
+    """お問い合わせビュー（非同期）"""
 
-    def get(self, request: HttpRequest) -> HttpResponse:
+    async def get(self, request: HttpRequest) -> HttpResponse:
         form = ContactForm()
-        return render(request, 'pages/contact.html', {'form': form})
+        return TemplateResponse(request, 'pages/contact.html', {'form': form})
 
-    def post(self, request: HttpRequest) -> HttpResponse:
+    async def post(self, request: HttpRequest) -> HttpResponse:
         form = ContactForm(request.POST)
         if form.is_valid():
             subject = form.cleaned_data['subject']
@@ -322,24 +594,18 @@ class ContactView(generic.View):
             full_name = form.cleaned_data['full_name']
             email = form.cleaned_data['email']
 
-            # メールの送信
-            try:
-                send_mail(
-                    f'件名: {subject}',
-                    f'本文: {message}\n\n'
-                    f'お客様のお名前: {full_name}\n'
-                    f'お客様のメールアドレス: {email}',
-                    settings.EMAIL_HOST_USER,
-                    [settings.EMAIL_HOST_USER],
-                    fail_silently=False,
-                )
-            except Exception as e:
-                print(f"メール送信エラー: {e}")
-                # エラーが発生してもユーザーには成功画面を表示
-                # 実際の運用ではログに記録するなど適切な処理を行う
+            # メールは送信キューに登録し、ワーカーが送信する
+            await aenqueue_mail(
+                f'件名: {subject}',
+                f'本文: {message}\n\n'
+                f'お客様のお名前: {full_name}\n'
+                f'お客様のメールアドレス: {email}',
+                settings.EMAIL_HOST_USER,
+                [settings.EMAIL_HOST_USER],
+            )
 
             return redirect('pages:contact-complete')
-        return render(request, 'pages/contact.html', {'form': form})
+        return TemplateResponse(request, 'pages/contact.html', {'form': form})
 
 
 class ContactCompleteView(ReferrerRequiredMixin, generic.TemplateView):